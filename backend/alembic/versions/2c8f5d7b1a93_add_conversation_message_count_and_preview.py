@@ -0,0 +1,61 @@
+"""Add denormalized message count and last-message preview to conversations
+
+Revision ID: 2c8f5d7b1a93
+Revises: e7a4b9c2d615
+Create Date: 2026-10-19 12:08:51.406127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c8f5d7b1a93'
+down_revision: Union[str, Sequence[str], None] = 'e7a4b9c2d615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=200), nullable=True))
+
+    # Backfill from existing messages. Assistant replies are stored as JSON,
+    # so their preview is the extracted "message" field.
+    op.execute("""
+        UPDATE conversations c
+        SET message_count = counts.message_count,
+            last_message_preview = left(
+                regexp_replace(
+                    CASE
+                        WHEN latest.role = 'assistant' AND latest.content ~ '^\\s*\\{'
+                            THEN coalesce(substring(latest.content from '"message":\\s*"((?:[^"\\\\]|\\\\.)*)"'), '')
+                        ELSE latest.content
+                    END,
+                    '\\s+', ' ', 'g'
+                ),
+                120
+            )
+        FROM (
+            SELECT conversation_id, count(*) AS message_count
+            FROM conversation_messages
+            GROUP BY conversation_id
+        ) counts
+        CROSS JOIN LATERAL (
+            SELECT m.role, m.content
+            FROM conversation_messages m
+            WHERE m.conversation_id = counts.conversation_id
+            ORDER BY m.created_at DESC, m.id DESC
+            LIMIT 1
+        ) latest
+        WHERE c.id = counts.conversation_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'last_message_preview')
+    op.drop_column('conversations', 'message_count')
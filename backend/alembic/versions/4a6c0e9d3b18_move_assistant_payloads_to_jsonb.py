@@ -0,0 +1,61 @@
+"""Move assistant message payloads from JSON text to a JSONB column
+
+Revision ID: 4a6c0e9d3b18
+Revises: 8e1d3f6a2b57
+Create Date: 2026-10-19 13:37:12.845960
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a6c0e9d3b18'
+down_revision: Union[str, Sequence[str], None] = '8e1d3f6a2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversation_messages', sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+    # Split stored {"message": ..., "movies": [...]} replies into text and
+    # payload; rows that don't parse as JSON are left as they are
+    op.execute("""
+        DO $$
+        DECLARE
+            row record;
+            doc jsonb;
+        BEGIN
+            FOR row IN
+                SELECT id, content FROM conversation_messages
+                WHERE role = 'assistant' AND content LIKE '{%'
+            LOOP
+                BEGIN
+                    doc := row.content::jsonb;
+                EXCEPTION WHEN others THEN
+                    CONTINUE;
+                END;
+                IF jsonb_typeof(doc) = 'object' THEN
+                    UPDATE conversation_messages
+                    SET content = coalesce(doc->>'message', ''),
+                        payload = jsonb_build_object('movies', coalesce(doc->'movies', '[]'::jsonb))
+                    WHERE id = row.id;
+                END IF;
+            END LOOP;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        UPDATE conversation_messages
+        SET content = (jsonb_build_object('message', content) || payload)::text
+        WHERE payload IS NOT NULL
+    """)
+    op.drop_column('conversation_messages', 'payload')
@@ -0,0 +1,39 @@
+"""Add movie_neighbors table for precomputed embedding neighbors
+
+Revision ID: 5b1f2e8a9c47
+Revises: 3824cdd331c2
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f2e8a9c47'
+down_revision: Union[str, Sequence[str], None] = '3824cdd331c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('movie_neighbors',
+    sa.Column('movie_id', sa.Integer(), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('similarity', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['neighbor_id'], ['movies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('movie_id', 'neighbor_id')
+    )
+    op.create_index('ix_movie_neighbors_movie_id_rank', 'movie_neighbors', ['movie_id', 'rank'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movie_neighbors_movie_id_rank', table_name='movie_neighbors')
+    op.drop_table('movie_neighbors')
@@ -0,0 +1,60 @@
+"""Add keyset indexes for sorted watchlist listings
+
+Revision ID: 6d2e8b4f1c73
+Revises: b3f7a1c5e902
+Create Date: 2026-10-19 16:42:18.305127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2e8b4f1c73'
+down_revision: Union[str, Sequence[str], None] = 'b3f7a1c5e902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently so watchlists stay writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_watchlist_items_watchlist_id_created_at',
+            'watchlist_items',
+            ['watchlist_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_watchlist_items_watchlist_id_movie_title',
+            'watchlist_items',
+            ['watchlist_id', 'movie_title', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        # Matches the coalesce(rating, 0) sort key used by WatchlistService
+        op.create_index(
+            'ix_watchlist_items_watchlist_id_rating',
+            'watchlist_items',
+            ['watchlist_id', sa.text('coalesce(rating, 0)'), 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in (
+            'ix_watchlist_items_watchlist_id_rating',
+            'ix_watchlist_items_watchlist_id_movie_title',
+            'ix_watchlist_items_watchlist_id_created_at',
+        ):
+            op.drop_index(name, table_name='watchlist_items', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,46 @@
+"""Cascade message deletes from conversations and add deleted_at
+
+Revision ID: 8e1d3f6a2b57
+Revises: 2c8f5d7b1a93
+Create Date: 2026-10-19 12:51:33.270418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1d3f6a2b57'
+down_revision: Union[str, Sequence[str], None] = '2c8f5d7b1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FK_NAME = 'conversation_messages_conversation_id_fkey'
+
+
+def _replace_foreign_key(on_delete: str) -> None:
+    # Added NOT VALID, then validated in its own transaction: VALIDATE only
+    # takes a SHARE UPDATE EXCLUSIVE lock, so writes to conversation_messages
+    # continue during the scan instead of waiting on this migration's locks
+    op.execute(f"ALTER TABLE conversation_messages DROP CONSTRAINT IF EXISTS {FK_NAME}")
+    op.execute(f"""
+        ALTER TABLE conversation_messages
+        ADD CONSTRAINT {FK_NAME} FOREIGN KEY (conversation_id)
+        REFERENCES conversations (id) {on_delete} NOT VALID
+    """)
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE conversation_messages VALIDATE CONSTRAINT {FK_NAME}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    _replace_foreign_key('ON DELETE CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_foreign_key('')
+    op.drop_column('conversations', 'deleted_at')
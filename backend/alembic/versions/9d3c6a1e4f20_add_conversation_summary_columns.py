@@ -0,0 +1,32 @@
+"""Add rolling summary columns to conversations
+
+Revision ID: 9d3c6a1e4f20
+Revises: 5b1f2e8a9c47
+Create Date: 2026-10-19 10:02:17.554310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3c6a1e4f20'
+down_revision: Union[str, Sequence[str], None] = '5b1f2e8a9c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_through_id', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summary_updated_at')
+    op.drop_column('conversations', 'summary_through_id')
+    op.drop_column('conversations', 'summary')
@@ -0,0 +1,116 @@
+"""Partition conversation_messages by month and add conversation archives
+
+Revision ID: b3f7a1c5e902
+Revises: 4a6c0e9d3b18
+Create Date: 2026-10-19 14:22:40.118375
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7a1c5e902'
+down_revision: Union[str, Sequence[str], None] = '4a6c0e9d3b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months of partitions created ahead of now; archive_conversations.py keeps extending them
+MONTHS_AHEAD = 3
+
+
+def _create_indexes() -> None:
+    op.execute("CREATE INDEX ix_conversation_messages_id ON conversation_messages (id)")
+    op.execute("""
+        CREATE INDEX ix_conversation_messages_conversation_id_created_at
+        ON conversation_messages (conversation_id, created_at, id)
+    """)
+
+
+def _swap_out_messages_table() -> None:
+    """Rename the current table out of the way, keeping its id sequence."""
+    op.execute("ALTER SEQUENCE conversation_messages_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE conversation_messages RENAME TO conversation_messages_old")
+    op.execute("ALTER TABLE conversation_messages_old DROP CONSTRAINT IF EXISTS conversation_messages_conversation_id_fkey")
+    op.execute("ALTER TABLE conversation_messages_old DROP CONSTRAINT IF EXISTS conversation_messages_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_conversation_messages_id")
+    op.execute("DROP INDEX IF EXISTS ix_conversation_messages_conversation_id_created_at")
+
+
+def _copy_and_drop_old() -> None:
+    op.execute("""
+        INSERT INTO conversation_messages (id, conversation_id, role, content, payload, created_at)
+        SELECT id, conversation_id, role, content, payload, coalesce(created_at, now() AT TIME ZONE 'utc')
+        FROM conversation_messages_old
+    """)
+    op.execute("DROP TABLE conversation_messages_old")
+    op.execute("ALTER SEQUENCE conversation_messages_id_seq OWNED BY conversation_messages.id")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('archived_at', sa.DateTime(), nullable=True))
+    op.add_column('conversations', sa.Column('archive_blob', sa.LargeBinary(), nullable=True))
+
+    _swap_out_messages_table()
+    op.execute("""
+        CREATE TABLE conversation_messages (
+            id INTEGER NOT NULL DEFAULT nextval('conversation_messages_id_seq'),
+            conversation_id INTEGER REFERENCES conversations (id) ON DELETE CASCADE,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            payload JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE TABLE conversation_messages_default PARTITION OF conversation_messages DEFAULT")
+
+    # One partition per month from the oldest message to MONTHS_AHEAD months from now
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start timestamp;
+            last_month timestamp := date_trunc('month', now() AT TIME ZONE 'utc') + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(created_at), now() AT TIME ZONE 'utc'))
+            INTO month_start FROM conversation_messages_old;
+
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF conversation_messages FOR VALUES FROM (%L) TO (%L)',
+                    'conversation_messages_p' || to_char(month_start, 'YYYY_MM'),
+                    month_start,
+                    month_start + interval '1 month'
+                );
+                month_start := month_start + interval '1 month';
+            END LOOP;
+        END $$;
+    """)
+
+    _copy_and_drop_old()
+    _create_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Messages of still-archived conversations live only in archive_blob and
+    # are dropped with it; open those conversations first to restore them
+    _swap_out_messages_table()
+    op.execute("""
+        CREATE TABLE conversation_messages (
+            id INTEGER NOT NULL DEFAULT nextval('conversation_messages_id_seq') PRIMARY KEY,
+            conversation_id INTEGER REFERENCES conversations (id) ON DELETE CASCADE,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            payload JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    _copy_and_drop_old()
+    _create_indexes()
+
+    op.drop_column('conversations', 'archive_blob')
+    op.drop_column('conversations', 'archived_at')
@@ -0,0 +1,57 @@
+"""Add composite indexes for conversation lists and message history
+
+Revision ID: e7a4b9c2d615
+Revises: 9d3c6a1e4f20
+Create Date: 2026-10-19 11:24:05.912733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a4b9c2d615'
+down_revision: Union[str, Sequence[str], None] = '9d3c6a1e4f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently so existing chats keep writing during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_conversation_messages_conversation_id_created_at',
+            'conversation_messages',
+            ['conversation_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_conversations_user_id_last_message_at',
+            'conversations',
+            ['user_id', 'last_message_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_conversations_user_id_last_message_at',
+            table_name='conversations',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.drop_index(
+            'ix_conversation_messages_conversation_id_created_at',
+            table_name='conversation_messages',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,39 @@
+"""Add version counter and updated_at to watchlists
+
+Revision ID: f1a9c3e7d284
+Revises: 6d2e8b4f1c73
+Create Date: 2026-10-19 17:15:40.628391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a9c3e7d284'
+down_revision: Union[str, Sequence[str], None] = '6d2e8b4f1c73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('watchlists', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('watchlists', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing watchlists were last changed no earlier than their newest item
+    op.execute("""
+        UPDATE watchlists w
+        SET updated_at = coalesce(
+            (SELECT max(i.created_at) FROM watchlist_items i WHERE i.watchlist_id = w.id),
+            w.created_at
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('watchlists', 'updated_at')
+    op.drop_column('watchlists', 'version')
@@ -0,0 +1,78 @@
+"""
+Script to archive inactive conversations and maintain message partitions.
+
+This script:
+1. Creates the monthly conversation_messages partitions for the coming months
+2. Archives conversations inactive for conversation_archive_after_days into
+   compressed blobs, removing their messages from the hot table
+3. Drops monthly partitions older than the archive cutoff that are now empty
+4. Purges conversations still marked deleted, e.g. after a background purge
+   was interrupted
+
+Archived conversations are restored automatically when they are opened.
+Run it periodically, e.g. daily from cron.
+
+Usage:
+    python archive_conversations.py [inactive_days]
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from config import settings
+from database import SessionLocal
+from services.archive_service import ArchiveService
+from services.conversation_service import ConversationService
+
+BATCH_SIZE = 500
+
+
+def main():
+    """Main function to run archival and partition maintenance."""
+    print("=" * 60)
+    print("Conversation Archival Script")
+    print("=" * 60)
+    print()
+
+    inactive_days = int(sys.argv[1]) if len(sys.argv) > 1 else settings.conversation_archive_after_days
+    db = SessionLocal()
+
+    try:
+        created = ArchiveService.ensure_message_partitions(db, months_ahead=settings.message_partition_months_ahead)
+        print(f"Partitions created:        {', '.join(created) or 'none'}")
+
+        start_time = datetime.now()
+        archived = 0
+        while True:
+            batch = ArchiveService.archive_inactive(db, inactive_days, limit=BATCH_SIZE)
+            archived += batch
+            if batch < BATCH_SIZE:
+                break
+        duration = (datetime.now() - start_time).total_seconds()
+
+        cutoff = datetime.utcnow() - timedelta(days=inactive_days)
+        dropped = ArchiveService.drop_empty_partitions(db, before=cutoff)
+        purged = ConversationService.purge_deleted(db, batch_size=settings.conversation_delete_batch_size)
+
+        print("=" * 60)
+        print("Archival Complete!")
+        print("=" * 60)
+        print(f"Inactive after:            {inactive_days} days")
+        print(f"Conversations archived:    {archived}")
+        print(f"Empty partitions dropped:  {', '.join(dropped) or 'none'}")
+        print(f"Conversations purged:      {purged}")
+        print(f"Time taken:                {duration:.2f} seconds")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
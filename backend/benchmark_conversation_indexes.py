@@ -0,0 +1,129 @@
+"""
+Script to benchmark the conversation access-path indexes.
+
+Seeds synthetic conversations and messages, then runs EXPLAIN ANALYZE for
+the two hot queries - a conversation's messages in order and a user's
+conversation list newest first - with and without the composite indexes
+added in migration e7a4b9c2d615. The indexes are dropped inside a
+transaction that is rolled back, so the schema is left untouched.
+
+Seeded rows belong to users named "bench_user_*" and are deleted at the end.
+Run it against a development database, not production.
+
+Usage:
+    python benchmark_conversation_indexes.py [messages] [conversations]
+"""
+
+import sys
+import time
+
+from sqlalchemy import text
+
+from database import engine
+
+DEFAULT_MESSAGES = 2_000_000
+DEFAULT_CONVERSATIONS = 20_000
+USERS = 2_000
+
+MESSAGES_QUERY = """
+    SELECT * FROM conversation_messages
+    WHERE conversation_id = :conversation_id
+    ORDER BY created_at ASC
+"""
+
+CONVERSATIONS_QUERY = """
+    SELECT * FROM conversations
+    WHERE user_id = :user_id
+    ORDER BY last_message_at DESC
+"""
+
+INDEXES = {
+    "ix_conversation_messages_conversation_id_created_at": MESSAGES_QUERY,
+    "ix_conversations_user_id_last_message_at": CONVERSATIONS_QUERY,
+}
+
+
+def seed(conn, messages: int, conversations: int) -> int:
+    """Insert synthetic conversations and messages; returns a sample conversation id."""
+    first_id = conn.execute(text("""
+        INSERT INTO conversations (user_id, started_at, last_message_at)
+        SELECT 'bench_user_' || (g % :users),
+               now() - (g || ' minutes')::interval,
+               now() - (g || ' seconds')::interval
+        FROM generate_series(1, :conversations) AS g
+        RETURNING id
+    """), {"users": USERS, "conversations": conversations}).scalars().all()[0]
+
+    conn.execute(text("""
+        INSERT INTO conversation_messages (conversation_id, role, content, created_at)
+        SELECT :first_id + (g % :conversations),
+               CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END,
+               'benchmark message ' || g,
+               now() - (g || ' milliseconds')::interval
+        FROM generate_series(1, :messages) AS g
+    """), {"first_id": first_id, "conversations": conversations, "messages": messages})
+    conn.execute(text("ANALYZE conversations"))
+    conn.execute(text("ANALYZE conversation_messages"))
+    return first_id
+
+
+def explain(conn, query: str, params: dict) -> str:
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), params).scalars().all()
+    return "\n".join(plan)
+
+
+def main():
+    """Main function to run the benchmark."""
+    print("=" * 60)
+    print("Conversation Index Benchmark")
+    print("=" * 60)
+    print()
+
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MESSAGES
+    conversations = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CONVERSATIONS
+
+    with engine.connect() as conn:
+        missing = [
+            name for name in INDEXES
+            if not conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        ]
+        if missing:
+            print(f"Missing indexes {missing}; run 'alembic upgrade head' first")
+            return
+
+        print(f"Seeding {messages:,} messages across {conversations:,} conversations...")
+        start = time.time()
+        sample_conversation_id = seed(conn, messages, conversations)
+        conn.commit()
+        print(f"Seeded in {time.time() - start:.1f}s")
+        print()
+
+        params = {"conversation_id": sample_conversation_id, "user_id": "bench_user_1"}
+
+        try:
+            for label in ("with indexes", "without indexes"):
+                if label == "without indexes":
+                    for name in INDEXES:
+                        conn.execute(text(f"DROP INDEX {name}"))
+
+                for name, query in INDEXES.items():
+                    print(f"--- {name} ({label}) ---")
+                    print(explain(conn, query, params))
+                    print()
+        finally:
+            # Restores the dropped indexes
+            conn.rollback()
+
+            print("Removing benchmark rows...")
+            conn.execute(text("""
+                DELETE FROM conversation_messages
+                WHERE conversation_id IN (SELECT id FROM conversations WHERE user_id LIKE 'bench_user_%')
+            """))
+            conn.execute(text("DELETE FROM conversations WHERE user_id LIKE 'bench_user_%'"))
+            conn.commit()
+
+    print("Done. Compare the Index Scan plans above with the Seq Scan + Sort plans.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Script to benchmark bulk watchlist operations.
+
+Creates a throwaway user, then times WatchlistService.bulk_apply for each
+kind of operation - adding N movies, rating them, marking them watched and
+removing them - and reports items per second. For comparison it also times
+adding a small sample one item at a time through add_item.
+
+The benchmark user ("bench_watchlist@example.com") and its watchlist are
+deleted at the end. Run it against a development database, not production.
+
+Usage:
+    python benchmark_watchlist_bulk.py [items]
+"""
+
+import sys
+import time
+
+from sqlalchemy import delete
+
+from database import SessionLocal
+from models import User, Watchlist, WatchlistItem
+from schemas import WatchlistBulkOperation, WatchlistItemCreate
+from services import WatchlistService
+
+DEFAULT_ITEMS = 5_000
+SINGLE_SAMPLE = 200
+BENCH_EMAIL = "bench_watchlist@example.com"
+
+
+def cleanup(db) -> None:
+    """Delete the benchmark user together with its watchlists and items."""
+    user_id = db.query(User.id).filter(User.email == BENCH_EMAIL).scalar()
+    if user_id is None:
+        return
+    watchlist_ids = db.query(Watchlist.id).filter(Watchlist.user_id == user_id)
+    db.execute(delete(WatchlistItem).where(WatchlistItem.watchlist_id.in_(watchlist_ids)))
+    db.execute(delete(Watchlist).where(Watchlist.user_id == user_id))
+    db.execute(delete(User).where(User.id == user_id))
+    db.commit()
+    WatchlistService.clear_cache()
+
+
+def timed(label: str, count: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count:>7,} items in {elapsed:6.2f}s  ({count / elapsed:,.0f} items/s)")
+
+
+def main():
+    """Main function to run the benchmark."""
+    print("=" * 60)
+    print("Watchlist Bulk Operations Benchmark")
+    print("=" * 60)
+    print()
+
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITEMS
+    movie_ids = range(1, items + 1)
+
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        user = User(email=BENCH_EMAIL, hashed_password="benchmark")
+        db.add(user)
+        db.commit()
+
+        def bulk(operations):
+            return lambda: WatchlistService.bulk_apply(db, user, operations)
+
+        timed("bulk add", items, bulk([
+            WatchlistBulkOperation(op="add", movie_id=movie_id, movie_title=f"Benchmark movie {movie_id}")
+            for movie_id in movie_ids
+        ]))
+        timed("bulk rate", items, bulk([
+            WatchlistBulkOperation(op="rate", movie_id=movie_id, rating=movie_id % 5 + 1)
+            for movie_id in movie_ids
+        ]))
+        timed("bulk watched", items, bulk([
+            WatchlistBulkOperation(op="watched", movie_id=movie_id, watched=True)
+            for movie_id in movie_ids
+        ]))
+        timed("bulk remove", items, bulk([
+            WatchlistBulkOperation(op="remove", movie_id=movie_id)
+            for movie_id in movie_ids
+        ]))
+
+        def add_one_by_one():
+            for movie_id in range(1, SINGLE_SAMPLE + 1):
+                WatchlistService.add_item(
+                    db, user, WatchlistItemCreate(movie_id=movie_id, movie_title=f"Benchmark movie {movie_id}")
+                )
+
+        timed("add_item one at a time", SINGLE_SAMPLE, add_one_by_one)
+    finally:
+        print()
+        print("Removing benchmark rows...")
+        db.rollback()
+        cleanup(db)
+        db.close()
+
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 from pydantic import Field, validator
 
 
@@ -19,6 +19,75 @@ class Settings(BaseSettings):
     postman_api_key: Optional[str] = Field(None, description="Postman API key")
     # GEMINI API
     gemini_access_token: Optional[str] = Field(None, description="Gemini API key")
+    gemini_model_name: str = Field(default="models/gemini-2.5-flash", description="Gemini model used for chat")
+    gemini_embedding_model: str = Field(default="models/text-embedding-004", description="Gemini embedding model")
+
+    # Serve the static system prompt from a Gemini context cache where the model supports it
+    gemini_context_cache_enabled: bool = Field(default=False, description="Cache the system prompt with Gemini context caching")
+    gemini_context_cache_ttl_seconds: int = Field(default=3600, description="Lifetime of the Gemini context cache")
+
+    # Gemini deadlines, fallback and hedging
+    gemini_request_timeout_seconds: float = Field(default=30.0, description="Deadline for one Gemini generation call")
+    gemini_fallback_models: str = Field(
+        default="",
+        description="Comma-separated models to try in order when the primary model fails or times out"
+    )
+    gemini_hedge_enabled: bool = Field(default=False, description="Fire a duplicate request when the first token is slow")
+    gemini_hedge_after_seconds: float = Field(
+        default=8.0,
+        description="Hedge delay until enough samples exist to use the observed p95 time to first chunk"
+    )
+
+    # Gemini rate limiting (Gemini allows ~1500 embedding requests/minute on the default tier)
+    gemini_generation_rate_per_second: float = Field(default=5.0, description="Sustained Gemini generation requests per second")
+    gemini_generation_burst: int = Field(default=10, description="Gemini generation burst size")
+    gemini_generation_max_concurrency: int = Field(default=8, description="Concurrent Gemini generations")
+    gemini_embedding_rate_per_second: float = Field(default=20.0, description="Sustained Gemini embedding requests per second")
+    gemini_embedding_burst: int = Field(default=40, description="Gemini embedding burst size")
+    gemini_embedding_max_concurrency: int = Field(default=16, description="Concurrent Gemini embedding calls")
+    gemini_max_retries: int = Field(default=3, description="Retries for throttled or unavailable Gemini calls")
+    gemini_backoff_base_seconds: float = Field(default=0.5, description="Initial retry backoff")
+    gemini_backoff_max_seconds: float = Field(default=8.0, description="Maximum retry backoff")
+
+    # Chat prompt context
+    chat_history_max_turns: int = Field(default=6, description="User/assistant turns sent to Gemini verbatim")
+    chat_prompt_token_budget: int = Field(default=4000, description="Approximate token budget for a chat prompt")
+    chat_summary_every_n_turns: int = Field(
+        default=5,
+        description="Fold older turns into the conversation summary every N turns (0 disables)"
+    )
+
+    # Semantic cache for first-turn chat responses (opt-in)
+    chat_response_cache_enabled: bool = Field(default=False, description="Serve near-identical first-turn chats from cache")
+    chat_response_cache_threshold: float = Field(default=0.95, description="Cosine similarity needed for a cache hit")
+    chat_response_cache_ttl_seconds: int = Field(default=3600, description="Seconds a cached chat response stays valid")
+    chat_response_cache_max_entries: int = Field(default=256, description="Maximum cached chat responses")
+
+    # Write chat messages after the response is sent instead of on the request path
+    chat_write_behind_enabled: bool = Field(default=False, description="Persist chat turns in a background task")
+    chat_write_behind_max_attempts: int = Field(default=3, description="Flushes that may fail on a turn before it is dropped")
+
+    # Conversation deletion
+    conversation_delete_async_threshold: int = Field(
+        default=2000,
+        description="Deletions covering more messages than this run as a batched background job"
+    )
+    conversation_delete_batch_size: int = Field(default=5000, description="Messages deleted per batch by the background job")
+
+    # Archival and partitioning of conversation messages
+    conversation_archive_after_days: int = Field(
+        default=90,
+        description="Archive conversations with no new messages for this many days"
+    )
+    message_partition_months_ahead: int = Field(default=3, description="Monthly message partitions to create in advance")
+
+    # Bulk watchlist operations
+    watchlist_bulk_max_operations: int = Field(default=5000, description="Maximum operations in one bulk watchlist request")
+
+    # TMDB response cache and speculative prefetch of RAG candidates
+    tmdb_cache_ttl_seconds: int = Field(default=600, description="Seconds a cached TMDB response stays valid")
+    tmdb_cache_max_entries: int = Field(default=1000, description="Maximum cached TMDB responses")
+    tmdb_prefetch_enabled: bool = Field(default=True, description="Warm the TMDB cache for RAG candidates during generation")
 
     # JWT Authentication - REQUIRED for auth endpoints
     jwt_secret_key: str = Field(
@@ -29,6 +98,12 @@ class Settings(BaseSettings):
     jwt_algorithm: str = Field(default="HS256", description="JWT algorithm")
     jwt_access_token_expire_minutes: int = Field(default=60, description="JWT token expiration in minutes")
 
+    @property
+    def gemini_model_chain(self) -> List[str]:
+        """Primary Gemini model followed by the configured fallbacks."""
+        fallbacks = [name.strip() for name in self.gemini_fallback_models.split(",") if name.strip()]
+        return [self.gemini_model_name] + [name for name in fallbacks if name != self.gemini_model_name]
+
     @validator("jwt_secret_key")
     def validate_jwt_secret_key(cls, v):
         """Ensure JWT secret key is sufficiently strong."""
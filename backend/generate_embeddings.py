@@ -98,9 +98,8 @@ def generate_embeddings_for_all_movies(db: Session) -> tuple:
                       f"Rate: {rate:.1f} movies/sec | "
                       f"ETA: {eta:.0f}s")
 
-            # Small delay to respect API rate limits (Gemini has 1500 requests/minute limit)
-            # This gives us ~40 requests per second max
-            time.sleep(0.025)
+            # Gemini rate limits are enforced by the shared embedding limiter
+            # (gemini_embedding_rate_per_second), which also retries 429s
 
         except Exception as e:
             print(f"Error processing movie '{movie.title}' (ID: {movie.id}): {e}")
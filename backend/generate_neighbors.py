@@ -0,0 +1,69 @@
+"""
+Script to precompute "more like this" neighbors for every embedded movie.
+
+This script reads the stored overview embeddings and writes the k nearest
+neighbors of each movie into the movie_neighbors table. GET
+/movies/{movie_id}/neighbors and the thriller picks in /chat read from that
+table, so they need neither a Gemini nor a TMDB call.
+
+Prerequisites:
+    - Run populate_movies.py and generate_embeddings.py first
+
+Usage:
+    python generate_neighbors.py [k]
+"""
+
+import sys
+from datetime import datetime
+
+from database import SessionLocal
+from models import MovieEmbedding, MovieNeighbor
+from services.embedding_service import EmbeddingService
+
+DEFAULT_K = 20
+
+
+def main():
+    """Main function to rebuild the neighbor table."""
+    print("=" * 60)
+    print("Movie Neighbors Generation Script")
+    print("=" * 60)
+    print()
+
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_K
+    db = SessionLocal()
+
+    try:
+        embedding_count = db.query(MovieEmbedding).count()
+        print(f"Embeddings in database:    {embedding_count}")
+        print(f"Neighbors per movie (k):   {k}")
+        print()
+
+        if embedding_count == 0:
+            print("No embeddings found. Please run generate_embeddings.py first.")
+            sys.exit(1)
+
+        start_time = datetime.now()
+        written = EmbeddingService.refresh_movie_neighbors(db, k=k)
+        duration = (datetime.now() - start_time).total_seconds()
+
+        print("=" * 60)
+        print("Neighbor Generation Complete!")
+        print("=" * 60)
+        print(f"Neighbor rows written:     {written}")
+        print(f"Rows in movie_neighbors:   {db.query(MovieNeighbor).count()}")
+        print(f"Time taken:                {duration:.2f} seconds")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Literal, Optional, Tuple
 from datetime import datetime
+import asyncio
 
+from config import settings
 from database import get_db, engine
-from models import Base, User
+from models import Base, ConversationMessage, User
 from schemas import (
     ConversationResponse,
+    ConversationSummaryResponse,
     MessageResponse,
     ChatMessageRequest,
     ChatMessageResponse,
@@ -19,17 +22,30 @@ from schemas import (
     LoginRequest,
     WatchlistItemCreate,
     WatchlistItemResponse,
+    WatchlistBulkRequest,
+    WatchlistBulkResponse,
     RatingUpdate,
     WatchedUpdate,
 )
 from services import (
     ConversationService,
+    ContextBuilder,
     TMDBService,
     GeminiService,
     EmbeddingService,
     AuthService,
     WatchlistService,
+    SummaryService,
+    SemanticResponseCache,
+    RecommendationStreamParser,
+    IntentClassifier,
+    MessageWriteQueue,
+    ArchiveService,
+    GeminiClient,
+    GeminiRateLimitError,
+    EmbeddingError,
 )
+from services.pagination import decode_cursor, encode_cursor
 
 Base.metadata.create_all(bind=engine)
 
@@ -57,11 +73,31 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept"],
+    allow_headers=["Content-Type", "Authorization", "Accept", "If-None-Match"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Thriller picks shown with each recommended movie
+THRILLER_PICKS = 3
+
+response_cache = SemanticResponseCache(
+    max_entries=settings.chat_response_cache_max_entries,
+    ttl_seconds=settings.chat_response_cache_ttl_seconds,
+    threshold=settings.chat_response_cache_threshold,
+)
+
+message_queue = MessageWriteQueue(max_attempts=settings.chat_write_behind_max_attempts)
+
+
+@app.on_event("shutdown")
+def flush_pending_messages():
+    """Write any chat turns still queued for write-behind before exiting."""
+    written = message_queue.flush()
+    if written:
+        print(f"Flushed {written} queued chat turns on shutdown")
+
 
 def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
@@ -91,6 +127,19 @@ def health_check():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/metrics")
+def get_metrics(db: Session = Depends(get_db)):
+    """In-process performance counters for the chat pipeline"""
+    return {
+        "response_cache": response_cache.stats(),
+        "gemini": GeminiClient.stats(),
+        "gemini_latency": GeminiService.stats(),
+        "retrieval_gate": IntentClassifier.stats(),
+        "tmdb": TMDBService.stats(),
+        "write_behind": message_queue.stats(),
+        "message_partitions": ArchiveService.partition_health(db)
+    }
+
 @app.post("/conversations", response_model=ConversationResponse, status_code=201)
 def create_conversation(user_id: str, db: Session = Depends(get_db)):
     """Create a new conversation"""
@@ -106,29 +155,118 @@ def get_conversation(conversation_id: int, db: Session = Depends(get_db)):
 
     return conversation
 
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/conversations/user/{user_id}", response_model=List[ConversationResponse])
-def get_user_conversations(user_id: str, db: Session = Depends(get_db)):
-    return ConversationService.get_user_conversations(db, user_id)
+def get_user_conversations(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    before: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    List a user's conversations, most recently active first.
 
-@app.delete("/conversations/{conversation_id}", status_code=204)
-def delete_conversation(conversation_id: int, db: Session = Depends(get_db)):
-    """Delete a conversation and all its messages"""
-    deleted = ConversationService.delete_conversation(db, conversation_id)
+    With a limit, a full page sets X-Next-Cursor; pass it back as `before`
+    to get the next page.
+    """
+    conversations = ConversationService.get_user_conversations(
+        db, user_id, limit=limit, before=_parse_cursor(before)
+    )
+    if limit is not None and len(conversations) == limit:
+        last = conversations[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.last_message_at, last.id)
+    return conversations
+
+@app.get("/conversations/user/{user_id}/summary", response_model=List[ConversationSummaryResponse])
+def get_user_conversation_summaries(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    before: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    List a user's conversations with message count and last-message preview.
 
-    if not deleted:
+    The counts and previews are stored on the conversation row, so this is a
+    single query; it pages like GET /conversations/user/{user_id}.
+    """
+    return get_user_conversations(user_id, response, limit=limit, before=before, db=db)
+
+def _delete_conversations(
+    db: Session, background_tasks: BackgroundTasks,
+    conversation_id: Optional[int] = None, user_id: Optional[str] = None
+) -> Response:
+    """Hide the conversations, then purge them inline or, when large, in batches after responding."""
+    conversation_ids, message_count = ConversationService.mark_deleted(
+        db, conversation_id=conversation_id, user_id=user_id
+    )
+    if conversation_id is not None and not conversation_ids:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return None
+    if message_count > settings.conversation_delete_async_threshold:
+        background_tasks.add_task(
+            ConversationService.purge_in_background,
+            conversation_ids,
+            settings.conversation_delete_batch_size
+        )
+        return Response(status_code=202)
+
+    ConversationService.purge_conversations(db, conversation_ids)
+    return Response(status_code=204)
+
+
+@app.delete("/conversations/user/{user_id}", status_code=204)
+def delete_user_conversations(user_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Delete all of a user's conversations; 202 when the purge continues in the background"""
+    return _delete_conversations(db, background_tasks, user_id=user_id)
+
+
+@app.delete("/conversations/{conversation_id}", status_code=204)
+def delete_conversation(conversation_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Delete a conversation and all its messages; 202 when the purge continues in the background"""
+    return _delete_conversations(db, background_tasks, conversation_id=conversation_id)
 
 @app.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
-def get_conversation_messages(conversation_id: int, db: Session = Depends(get_db)):
-    """Get all messages in a conversation"""
+def get_conversation_messages(
+    conversation_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Get messages in a conversation, oldest first.
+
+    With only a limit, returns the latest messages. A full page sets
+    X-Next-Cursor: pass it back as `before` to page to older messages,
+    or as `after` when paging forward with `after`.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
     conversation = ConversationService.get_conversation_by_id(db, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return ConversationService.get_conversation_messages(db, conversation_id)
+    messages = ConversationService.get_conversation_messages(
+        db, conversation_id, limit=limit, before=_parse_cursor(before), after=_parse_cursor(after)
+    )
+    if limit is not None and len(messages) == limit:
+        edge = messages[-1] if after is not None else messages[0]
+        response.headers["X-Next-Cursor"] = encode_cursor(edge.created_at, edge.id)
+    return messages
 
 
 @app.post("/auth/register", response_model=UserResponse, status_code=201)
@@ -152,52 +290,103 @@ def login_user(request: LoginRequest, db: Session = Depends(get_db)):
 def read_current_user(current_user: User = Depends(get_current_user)):
     return current_user
 
-@app.post("/chat", response_model=ChatMessageResponse)
-async def chat(request: ChatMessageRequest, db: Session = Depends(get_db)):
-    try:
-        conversation = ConversationService.get_or_create_conversation(
-            db,
-            request.user_id,
-            request.conversation_id
-        )
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+async def _enrich_movie(db: Session, movie_data: Dict) -> Dict:
+    """Enrich a Gemini movie recommendation with TMDB details, trailer and thriller picks."""
+    movie_id = movie_data.get("id", 0)
 
-    ConversationService.add_message(
-        db,
-        conversation.id,
-        role="user",
-        content=request.message
-    )
+    # No valid ID, use what Gemini provided
+    if not movie_id or movie_id <= 0:
+        return movie_data
 
-    # Get conversation history for context
-    conversation_messages = ConversationService.get_conversation_messages(
-        db,
-        conversation.id
-    )
+    try:
+        # Get movie details
+        details = await TMDBService.get_movie_details(movie_id)
+
+        # Get thriller recommendations from precomputed local neighbors,
+        # falling back to TMDB when the neighbor table has too few
+        thrillers = [
+            {"id": n["movie_id"], "title": n["title"], "poster_path": n["poster_path"]}
+            for n in EmbeddingService.get_movie_neighbors(
+                db, movie_id, limit=THRILLER_PICKS, genre_id=TMDBService.THRILLER_GENRE_ID
+            )
+        ]
+        if len(thrillers) < THRILLER_PICKS:
+            thrillers = await TMDBService.get_thriller_recommendations(movie_id, limit=THRILLER_PICKS)
+
+        # Get trailer for this movie
+        trailer_key = await TMDBService.get_movie_videos(movie_id)
 
+        return {
+            "id": movie_id,
+            "title": details.get("title", movie_data.get("title")),
+            "reason": movie_data.get("reason", ""),
+            "poster_path": details.get("poster_path"),
+            "vote_average": details.get("vote_average"),
+            "release_date": details.get("release_date"),
+            "overview": details.get("overview"),
+            "trailer_key": trailer_key,
+            "thrillers": [
+                {"id": t.get("id"), "title": t.get("title"), "poster_path": t.get("poster_path")}
+                for t in thrillers
+            ]
+        }
+    except Exception as e:
+        print(f"Error enriching movie {movie_id}: {e}")
+        # Fallback: use data from Gemini
+        return movie_data
+
+
+async def _build_prompt_messages(
+    db: Session,
+    conversation,
+    conversation_messages: List,
+    message: str,
+    query_embedding: Optional[List[float]] = None,
+) -> Tuple[List[Dict], List[int]]:
+    """
+    Assemble summary, RAG context and recent history into a budgeted Gemini prompt.
+
+    Returns the prompt messages and the TMDB IDs of the RAG candidates.
+    """
     # Format messages for Gemini
     formatted_messages = [
-        {"role": msg.role, "content": msg.content}
+        {"role": msg.role, "content": msg.content, "movies": msg.movie_refs}
         for msg in conversation_messages
     ]
+    if conversation.summary:
+        formatted_messages.insert(0, {
+            "role": "system",
+            "content": f"Summary of the earlier conversation: {conversation.summary}"
+        })
 
-    # RAG: Search for similar movies using semantic search
-    similar_movies = EmbeddingService.search_similar_movies(
-        db,
-        request.message,
-        limit=5
-    )
+    # RAG: Search for similar movies using semantic search, unless the
+    # message is small talk that can't use movie context
+    similar_movies = []
+    if IntentClassifier.needs_retrieval(message):
+        try:
+            if query_embedding is None:
+                query_embedding = await EmbeddingService.create_embedding_async(message)
+            similar_movies = EmbeddingService.search_similar_movies(
+                db,
+                message,
+                limit=5,
+                query_embedding=query_embedding
+            )
+        except EmbeddingError:
+            # Answer without RAG context rather than failing the chat
+            similar_movies = []
 
     # If relevant movies found, augment context with movie data (including TMDB IDs)
     if similar_movies:
-        movie_context = "Relevant movies from our database (use these TMDB IDs in your response):\n\n"
+        context_lines = ["Relevant movies from our database (use these TMDB IDs in your response):", ""]
         for movie in similar_movies:
-            movie_context += f"- {movie.get('title', 'Unknown')} (TMDB ID: {movie.get('id', 'N/A')}, {movie.get('release_date', 'N/A')[:4]})\n"
-            movie_context += f"  Rating: {movie.get('vote_average', 'N/A')}/10\n"
+            context_lines.append(f"- {movie.get('title', 'Unknown')} (TMDB ID: {movie.get('movie_id', 'N/A')}, {(movie.get('release_date') or 'N/A')[:4]})")
+            context_lines.append(f"  Rating: {movie.get('vote_average', 'N/A')}/10")
             if movie.get('overview'):
-                movie_context += f"  Overview: {movie['overview']}\n"
-            movie_context += f"  Similarity: {movie.get('similarity', 0):.2f}\n\n"
+                context_lines.append(f"  Overview: {movie['overview']}")
+            context_lines.append(f"  Similarity: {movie.get('similarity', 0):.2f}")
+            context_lines.append("")
+        movie_context = "\n".join(context_lines)
 
         # Insert movie context at the beginning for Gemini to use
         formatted_messages.insert(0, {
@@ -205,64 +394,138 @@ async def chat(request: ChatMessageRequest, db: Session = Depends(get_db)):
             "content": movie_context
         })
 
-    # Generate structured AI response using Gemini with RAG-enhanced context
-    structured_response = GeminiService.generate_structured_response(formatted_messages)
-
-    # Enrich movie recommendations with TMDB data and thriller picks
-    enriched_movies = []
-    for movie_data in structured_response.get("movies", []):
-        movie_id = movie_data.get("id", 0)
-
-        # If we have a valid movie ID, fetch details from TMDB
-        if movie_id and movie_id > 0:
-            try:
-                # Get movie details
-                details = await TMDBService.get_movie_details(movie_id)
-
-                # Get thriller recommendations for this movie
-                thrillers = await TMDBService.get_thriller_recommendations(movie_id, limit=3)
-
-                # Get trailer for this movie
-                trailer_key = await TMDBService.get_movie_videos(movie_id)
-
-                enriched_movies.append({
-                    "id": movie_id,
-                    "title": details.get("title", movie_data.get("title")),
-                    "reason": movie_data.get("reason", ""),
-                    "poster_path": details.get("poster_path"),
-                    "vote_average": details.get("vote_average"),
-                    "release_date": details.get("release_date"),
-                    "overview": details.get("overview"),
-                    "trailer_key": trailer_key,
-                    "thrillers": [
-                        {"id": t.get("id"), "title": t.get("title"), "poster_path": t.get("poster_path")}
-                        for t in thrillers
-                    ]
-                })
-            except Exception as e:
-                print(f"Error enriching movie {movie_id}: {e}")
-                # Fallback: use data from Gemini
-                enriched_movies.append(movie_data)
-        else:
-            # No valid ID, use what Gemini provided
-            enriched_movies.append(movie_data)
-
-    # Save assistant message (store as JSON for future reference)
-    import json
-    assistant_content = json.dumps({
-        "message": structured_response.get("message", ""),
-        "movies": enriched_movies
-    })
-
-    ConversationService.add_message(
+    # Keep the prompt within the token budget
+    formatted_messages, prompt_tokens = ContextBuilder.build(
+        formatted_messages,
+        reserved_tokens=ContextBuilder.estimate_tokens(GeminiService.SYSTEM_PROMPT)
+    )
+    print(
+        f"Chat prompt for conversation {conversation.id}: {len(formatted_messages)} messages, "
+        f"~{prompt_tokens}/{settings.chat_prompt_token_budget} tokens"
+    )
+    return formatted_messages, [movie["movie_id"] for movie in similar_movies]
+
+
+@app.post("/chat", response_model=ChatMessageResponse)
+async def chat(
+    request: ChatMessageRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    # The turn's objects are only read back after their own commit; ids come
+    # from INSERT ... RETURNING, so re-loading them would be a wasted round-trip
+    db.expire_on_commit = False
+    try:
+        conversation = ConversationService.get_or_create_conversation(
+            db,
+            request.user_id,
+            request.conversation_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # Get the recent conversation window for context; older turns are
+    # covered by the rolling summary. The current message is written
+    # together with the reply, so it is appended here in memory.
+    user_message_at = datetime.utcnow()
+    history_limit = settings.chat_history_max_turns * 2
+    conversation_messages = ConversationService.get_recent_messages(
         db,
         conversation.id,
-        role="assistant",
-        content=assistant_content
+        limit=max(history_limit - 1, 0),
+        after_id=conversation.summary_through_id
     )
+    conversation_messages.append(ConversationMessage(
+        conversation_id=conversation.id,
+        role="user",
+        content=request.message,
+        created_at=user_message_at
+    ))
+
+    # First-turn prompts carry no context, so near-identical ones can share a response
+    query_embedding = None
+    cached_response = None
+    if settings.chat_response_cache_enabled and len(conversation_messages) == 1 and not conversation.summary:
+        try:
+            query_embedding = await EmbeddingService.create_embedding_async(request.message)
+            cached_response = response_cache.get(query_embedding)
+        except EmbeddingError:
+            query_embedding = None
+
+    if cached_response:
+        response_message = cached_response["message"]
+        enriched_movies = cached_response["movies"]
+    else:
+        formatted_messages, candidate_ids = await _build_prompt_messages(
+            db, conversation, conversation_messages, request.message, query_embedding
+        )
+
+        # Gemini is told to recommend the RAG candidates, so warm the TMDB
+        # cache for them while it generates. Thriller picks for candidates
+        # with enough local neighbors never reach TMDB's similar endpoint.
+        prefetch_tasks = []
+        if settings.tmdb_prefetch_enabled:
+            local_thrillers = EmbeddingService.movies_with_neighbors(
+                db, candidate_ids, min_count=THRILLER_PICKS, genre_id=TMDBService.THRILLER_GENRE_ID
+            )
+            prefetch_tasks = TMDBService.prefetch(candidate_ids, skip_similar=local_thrillers)
+
+        # Stream the structured Gemini response and start enriching each movie
+        # with TMDB data as soon as its JSON object is complete
+        parser = RecommendationStreamParser()
+        enrichment_tasks = []
+        try:
+            async for chunk in GeminiService.stream_structured_response(formatted_messages):
+                for movie_data in parser.feed(chunk):
+                    enrichment_tasks.append(asyncio.create_task(_enrich_movie(db, movie_data)))
+        except GeminiRateLimitError as e:
+            for task in enrichment_tasks + prefetch_tasks:
+                task.cancel()
+            raise HTTPException(
+                status_code=503,
+                detail="The recommendation service is busy, please try again shortly",
+                headers={"Retry-After": str(max(1, round(e.retry_after or 1)))}
+            )
+
+        structured_response = parser.result()
+        response_message = structured_response.get("message", "")
+        enriched_movies = list(await asyncio.gather(*enrichment_tasks))
+
+        # Prefetches for candidates Gemini didn't pick are no longer useful
+        for task in prefetch_tasks:
+            task.cancel()
+        if prefetch_tasks:
+            TMDBService.record_prefetch_usage(candidate_ids, [movie.get("id") for movie in enriched_movies])
+
+        # Only whole, successful responses are worth serving to other users
+        if (
+            query_embedding is not None
+            and parser.complete
+            and response_message.strip()
+            and response_message != GeminiService.ERROR_MESSAGE
+        ):
+            response_cache.put(query_embedding, {"message": response_message, "movies": enriched_movies})
+
+    # Write both messages and the conversation timestamp in one transaction,
+    # optionally after the response has been sent. The reply text and the
+    # enriched movies are stored separately so history reads can skip the latter.
+    turn = [
+        {"role": "user", "content": request.message, "created_at": user_message_at},
+        {"role": "assistant", "content": response_message, "payload": {"movies": enriched_movies}},
+    ]
+    if settings.chat_write_behind_enabled:
+        message_queue.enqueue(conversation.id, turn)
+        background_tasks.add_task(message_queue.flush)
+    else:
+        ConversationService.add_messages(db, conversation.id, turn, conversation=conversation)
+
+    # Once the verbatim window is full, fold older turns into the summary
+    # after the response has been sent
+    if settings.chat_summary_every_n_turns > 0 and len(conversation_messages) >= history_limit:
+        background_tasks.add_task(SummaryService.summarize_in_background, conversation.id)
 
     return ChatMessageResponse(
-        message=structured_response.get("message", ""),
+        message=response_message,
         conversation_id=conversation.id,
         movies=enriched_movies
     )
@@ -315,6 +578,20 @@ async def get_similar_movies(movie_id: int, page: int = 1):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TMDB API error: {str(e)}")
 
+@app.get("/movies/{movie_id}/neighbors")
+def get_movie_neighbors(
+    movie_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """Get movies closest to a specific movie from the precomputed embedding neighbors"""
+    neighbors = EmbeddingService.get_movie_neighbors(db, movie_id, limit=limit)
+    return {
+        "movie_id": movie_id,
+        "results": neighbors,
+        "count": len(neighbors)
+    }
+
 @app.get("/movies/{movie_id}/recommendations")
 async def get_movie_recommendations(movie_id: int, page: int = 1):
     try:
@@ -357,11 +634,16 @@ async def semantic_search_movies(request: MovieSearchRequest, db: Session = Depe
         if not request.query or len(request.query.strip()) == 0:
             raise HTTPException(status_code=400, detail="Query cannot be empty")
 
-        results = EmbeddingService.search_similar_movies(
-            db,
-            request.query,
-            limit=request.limit or 10
-        )
+        try:
+            query_embedding = await EmbeddingService.create_embedding_async(request.query)
+            results = EmbeddingService.search_similar_movies(
+                db,
+                request.query,
+                limit=request.limit or 10,
+                query_embedding=query_embedding
+            )
+        except EmbeddingError:
+            results = []
 
         return {
             "query": request.query,
@@ -372,11 +654,59 @@ async def semantic_search_movies(request: MovieSearchRequest, db: Session = Depe
         raise HTTPException(status_code=500, detail=f"Semantic search error: {str(e)}")
 
 
+WATCHLIST_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
 @app.get("/watchlist", response_model=List[WatchlistItemResponse])
 def get_watchlist_items(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    response: Response,
+    watched: Optional[bool] = None,
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    max_rating: Optional[int] = Query(None, ge=1, le=5),
+    sort: Literal["added", "rating", "title"] = "added",
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    return WatchlistService.list_items(db, current_user)
+    """
+    List the current user's watchlist items.
+
+    Filters by watched state and rating range and sorts by date added
+    (newest first), rating (highest first) or title. A full page sets
+    X-Next-Cursor: pass it back as `cursor` with the same filters and sort.
+
+    The response carries an ETag derived from the watchlist's version;
+    sending it back in If-None-Match returns 304 while nothing has changed.
+    """
+    try:
+        decoded = WatchlistService.decode_cursor(cursor, sort) if cursor is not None else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # Read before the items, so a concurrent change can only make the ETag older than the body
+    etag = WatchlistService.etag(db, current_user)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": WATCHLIST_CACHE_CONTROL})
+
+    items = WatchlistService.list_items(
+        db, current_user, watched=watched, min_rating=min_rating, max_rating=max_rating,
+        sort=sort, limit=limit, cursor=decoded
+    )
+    if limit is not None and len(items) == limit:
+        response.headers["X-Next-Cursor"] = WatchlistService.encode_cursor(items[-1], sort)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = WATCHLIST_CACHE_CONTROL
+    return items
 
 
 @app.post("/watchlist", response_model=WatchlistItemResponse, status_code=201)
@@ -388,6 +718,31 @@ def add_watchlist_item(
     return WatchlistService.add_item(db, current_user, payload)
 
 
+@app.post("/watchlist/bulk", response_model=WatchlistBulkResponse)
+def bulk_update_watchlist(
+    payload: WatchlistBulkRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Apply a batch of add/remove/rate/watched operations in one transaction.
+
+    Operations take effect in request order; the batch is written with a few
+    set-based statements. Results are returned per operation in request order.
+    """
+    # The returned items come from RETURNING; expiring them on commit would
+    # reload each one with its own SELECT while serializing the response
+    db.expire_on_commit = False
+    try:
+        results = WatchlistService.bulk_apply(db, current_user, payload.operations)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "applied": sum(1 for result in results if result["status"] == "ok"),
+        "results": results,
+    }
+
+
 @app.delete("/watchlist/{item_id}", status_code=204)
 def remove_watchlist_item(
     item_id: int,
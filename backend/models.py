@@ -1,6 +1,8 @@
 import sqlalchemy
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date, Numeric, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, ForeignKey, Date, Numeric, Boolean, Float, Index, LargeBinary, DDL, event
+)
+from sqlalchemy.orm import deferred, query_expression, relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from pgvector.sqlalchemy import Vector
 from datetime import datetime
@@ -9,14 +11,36 @@ from database import Base
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # A user's conversation list, newest first
+        Index("ix_conversations_user_id_last_message_at", "user_id", "last_message_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(100))
     started_at = Column(DateTime, default=datetime.utcnow)
     last_message_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Denormalized for the conversation list, kept up to date when messages are added
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_preview = Column(String(200), nullable=True)
+
+    # Set when deletion is requested; the rows are removed by a background purge
+    deleted_at = Column(DateTime, nullable=True)
+
+    # Inactive conversations are archived: their messages move out of the hot
+    # table into a zlib-compressed JSON blob and are restored on next access
+    archived_at = Column(DateTime, nullable=True)
+    archive_blob = deferred(Column(LargeBinary, nullable=True))
+
+    # Rolling summary of older messages, covering every message with id <= summary_through_id
+    summary = Column(Text, nullable=True)
+    summary_through_id = Column(Integer, nullable=True)
+    summary_updated_at = Column(DateTime, nullable=True)
+
     # Relationship: One conversation has many messages
-    messages = relationship("ConversationMessage", back_populates="conversation")
+    # Messages are removed by the ON DELETE CASCADE foreign key, not loaded and deleted by the ORM
+    messages = relationship("ConversationMessage", back_populates="conversation", passive_deletes=True)
 
     def __repr__(self):
         return f"<Conversation(id={self.id}, user_id={self.user_id})>"
@@ -24,20 +48,41 @@ class Conversation(Base):
 
 class ConversationMessage(Base):
     __tablename__ = "conversation_messages"
+    __table_args__ = (
+        # A conversation's messages in chronological order
+        Index("ix_conversation_messages_conversation_id_created_at", "conversation_id", "created_at", "id"),
+        # Monthly partitions are created ahead of time by ArchiveService; rows
+        # outside them land in the default partition created below
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversations.id"))
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"))
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
-    content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    content = Column(Text, nullable=False)  # Plain message text
+    # Structured extras of assistant replies, e.g. {"movies": [...enriched movies...]}
+    payload = Column(JSONB(none_as_null=True), nullable=True)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
 
     # Relationship: Each message belongs to one conversation
     conversation = relationship("Conversation", back_populates="messages")
 
+    # [{"id", "title"}] of the recommended movies, projected from payload in SQL
+    # by queries that ask for it (see ConversationService.get_recent_messages)
+    movie_refs = query_expression()
+
     def __repr__(self):
         return f"<ConversationMessage(id={self.id}, role={self.role})>"
 
 
+event.listen(
+    ConversationMessage.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS conversation_messages_default PARTITION OF conversation_messages DEFAULT")
+)
+
+
 class Movie(Base):
     __tablename__ = "movies"
 
@@ -78,6 +123,25 @@ class MovieEmbedding(Base):
         return f"<MovieEmbedding(id={self.id}, movie_id={self.movie_id})>"
 
 
+class MovieNeighbor(Base):
+    """Precomputed k-nearest neighbors over the stored overview embeddings."""
+
+    __tablename__ = "movie_neighbors"
+    __table_args__ = (
+        # Neighbors are always read for one movie in rank order
+        Index("ix_movie_neighbors_movie_id_rank", "movie_id", "rank"),
+    )
+
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, nullable=False)
+    similarity = Column(Float, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<MovieNeighbor(movie_id={self.movie_id}, neighbor_id={self.neighbor_id}, rank={self.rank})>"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -99,6 +163,9 @@ class Watchlist(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String(120), default="My Watchlist")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped by every item mutation; served as the ETag of GET /watchlist
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="watchlists")
     items = relationship("WatchlistItem", back_populates="watchlist", cascade="all, delete-orphan")
@@ -109,6 +176,9 @@ class WatchlistItem(Base):
     __table_args__ = (
         # Ensure a movie can only appear once per watchlist
         sqlalchemy.UniqueConstraint('watchlist_id', 'movie_id', name='uq_watchlist_movie'),
+        # Keyset pages of a watchlist by date added and by title
+        Index("ix_watchlist_items_watchlist_id_created_at", "watchlist_id", "created_at", "id"),
+        Index("ix_watchlist_items_watchlist_id_movie_title", "watchlist_id", "movie_title", "id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -125,3 +195,12 @@ class WatchlistItem(Base):
 
     def __repr__(self):
         return f"<WatchlistItem(id={self.id}, movie={self.movie_title})>"
+
+
+# Keyset pages of a watchlist by rating, unrated items sorting as 0
+Index(
+    "ix_watchlist_items_watchlist_id_rating",
+    WatchlistItem.watchlist_id,
+    sqlalchemy.func.coalesce(WatchlistItem.rating, 0),
+    WatchlistItem.id,
+)
@@ -1,7 +1,9 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Any, Dict, Literal, Optional, List
 from datetime import datetime
 
+from config import settings
+
 class ConversationCreate(BaseModel):
     user_id: str = Field(..., min_length=1, max_length=100)
 
@@ -15,12 +17,18 @@ class ConversationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ConversationSummaryResponse(ConversationResponse):
+    """Conversation with the counts and snippet shown in the conversation list"""
+    message_count: int
+    last_message_preview: Optional[str] = None
+
 class MessageResponse(BaseModel):
     """Schema for message response"""
     id: int
     conversation_id: int
     role: str
     content: str
+    payload: Optional[Dict[str, Any]] = None
     created_at: datetime
 
     class Config:
@@ -171,3 +179,32 @@ class RatingUpdate(BaseModel):
 
 class WatchedUpdate(BaseModel):
     watched: bool
+
+
+class WatchlistBulkOperation(BaseModel):
+    """One operation of a bulk watchlist request, keyed by movie id"""
+    op: Literal["add", "remove", "rate", "watched"]
+    movie_id: int
+    movie_title: Optional[str] = Field(None, description="Required for add")
+    poster_path: Optional[str] = None
+    notes: Optional[str] = None
+    rating: Optional[int] = Field(None, ge=1, le=5, description="Required for rate")
+    watched: Optional[bool] = Field(None, description="Required for watched")
+
+
+class WatchlistBulkRequest(BaseModel):
+    operations: List[WatchlistBulkOperation] = Field(
+        ..., min_length=1, max_length=settings.watchlist_bulk_max_operations
+    )
+
+
+class WatchlistBulkResult(BaseModel):
+    op: str
+    movie_id: int
+    status: Literal["ok", "not_found"]
+    item: Optional[WatchlistItemResponse] = Field(None, description="State of the item after the batch, if it still exists")
+
+
+class WatchlistBulkResponse(BaseModel):
+    applied: int
+    results: List[WatchlistBulkResult]
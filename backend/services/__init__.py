@@ -1,15 +1,34 @@
 from .conversation_service import ConversationService
+from .context_builder import ContextBuilder
 from .tmdb_service import TMDBService
+from .gemini_client import EmbeddingError, GeminiClient, GeminiRateLimitError, GeminiServiceError
 from .gemini_service import GeminiService
 from .embedding_service import EmbeddingService
 from .auth_service import AuthService
 from .watchlist_service import WatchlistService
+from .summary_service import SummaryService
+from .response_cache import SemanticResponseCache
+from .stream_parser import RecommendationStreamParser
+from .intent_classifier import IntentClassifier
+from .message_queue import MessageWriteQueue
+from .archive_service import ArchiveService
 
 __all__ = [
     "ConversationService",
+    "ContextBuilder",
     "TMDBService",
+    "GeminiClient",
+    "GeminiServiceError",
+    "GeminiRateLimitError",
+    "EmbeddingError",
     "GeminiService",
     "EmbeddingService",
     "AuthService",
     "WatchlistService",
+    "SummaryService",
+    "SemanticResponseCache",
+    "RecommendationStreamParser",
+    "IntentClassifier",
+    "MessageWriteQueue",
+    "ArchiveService",
 ]
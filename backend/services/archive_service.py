@@ -0,0 +1,292 @@
+import json
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import delete, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import Conversation, ConversationMessage
+
+PARTITION_PREFIX = "conversation_messages_p"
+PARTITION_NAME = re.compile(r"^conversation_messages_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "conversation_messages_default"
+DETACH_LOCK_TIMEOUT = "2s"
+
+
+def _month_start(value: datetime, offset: int = 0) -> datetime:
+    """First instant of the month `offset` months after the one containing value."""
+    month_index = value.year * 12 + value.month - 1 + offset
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+class ArchiveService:
+    """
+    Keeps the hot conversation_messages table bounded.
+
+    conversation_messages is range-partitioned by created_at into monthly
+    partitions. Conversations inactive for a while are archived into a
+    compressed blob on the conversation row and their messages deleted;
+    ConversationService restores them when the conversation is opened again.
+    Monthly partitions left empty by archiving are dropped.
+    """
+
+    @staticmethod
+    def partition_name(month: datetime) -> str:
+        return f"{PARTITION_PREFIX}{month.year:04d}_{month.month:02d}"
+
+    @staticmethod
+    def ensure_message_partitions(db: Session, months_ahead: int = 3, now: datetime = None) -> List[str]:
+        """
+        Create the monthly partitions from the current month to `months_ahead` months ahead.
+
+        Returns:
+            Names of the partitions that were created
+        """
+        now = now or datetime.utcnow()
+        existing = set(ArchiveService.list_message_partitions(db))
+        created = []
+        for offset in range(months_ahead + 1):
+            start, end = _month_start(now, offset), _month_start(now, offset + 1)
+            name = ArchiveService.partition_name(start)
+            if name in existing:
+                continue
+            try:
+                ArchiveService._create_partition(db, name, start, end)
+                db.commit()
+                created.append(name)
+            except Exception as e:
+                print(f"Error creating partition {name}: {e}")
+                db.rollback()
+        return created
+
+    @staticmethod
+    def _create_partition(db: Session, name: str, start: datetime, end: datetime) -> None:
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        params = {"start": start, "end": end}
+        in_default = db.execute(text(
+            f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end LIMIT 1"
+        ), params).first()
+        if not in_default:
+            db.execute(text(f"CREATE TABLE {name} PARTITION OF conversation_messages {bounds}"))
+            return
+        # Postgres refuses a partition whose range already has rows in the
+        # default partition, so move them into a new table and attach that
+        db.execute(text(
+            f"CREATE TABLE {name} (LIKE conversation_messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= :start AND created_at < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), params)
+        db.execute(text(f"ALTER TABLE conversation_messages ATTACH PARTITION {name} {bounds}"))
+
+    @staticmethod
+    def partition_health(db: Session, months_ahead: int = 1, now: datetime = None) -> Dict:
+        """
+        Report monthly partitions that should exist but don't.
+
+        Messages for a month without a partition land in the default
+        partition, which every query then has to scan.
+        """
+        now = now or datetime.utcnow()
+        existing = set(ArchiveService.list_message_partitions(db))
+        expected = [ArchiveService.partition_name(_month_start(now, offset)) for offset in range(months_ahead + 1)]
+        default_has_rows = db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION})")).scalar()
+        return {
+            "partitions": len(existing),
+            "missing": [name for name in expected if name not in existing],
+            "default_has_rows": bool(default_has_rows)
+        }
+
+    @staticmethod
+    def list_message_partitions(db: Session) -> List[str]:
+        """Names of the monthly partitions of conversation_messages."""
+        rows = db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'conversation_messages'
+        """)).scalars().all()
+        return sorted(name for name in rows if PARTITION_NAME.match(name))
+
+    @staticmethod
+    def drop_empty_partitions(db: Session, before: datetime) -> List[str]:
+        """
+        Drop monthly partitions that end before `before` and hold no rows.
+
+        Returns:
+            Names of the dropped partitions
+        """
+        dropped = []
+        for name in ArchiveService.list_message_partitions(db):
+            year, month = PARTITION_NAME.match(name).groups()
+            if _month_start(datetime(int(year), int(month), 1), 1) > before:
+                continue
+            if db.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first():
+                continue
+            # Dropping an attached partition takes an ACCESS EXCLUSIVE lock on
+            # conversation_messages; a detached table only locks itself.
+            try:
+                ArchiveService._detach_partition(db, name)
+            except Exception as e:
+                print(f"Error detaching partition {name}: {e}")
+                db.rollback()
+                continue
+            # Rows written between the check and the detach go back to the parent
+            db.execute(text(f"INSERT INTO conversation_messages SELECT * FROM {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            dropped.append(name)
+        return dropped
+
+    @staticmethod
+    def _detach_partition(db: Session, name: str) -> None:
+        """
+        Detach a partition from conversation_messages without blocking chat traffic.
+
+        conversation_messages always has a default partition, and Postgres
+        refuses DETACH ... CONCURRENTLY while one exists, so only a plain
+        DETACH is supported. It runs with a short lock_timeout so that it
+        gives up (and is retried on the next run) rather than queueing chat
+        queries behind it.
+        """
+        db.commit()
+        with db.get_bind().begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+            conn.execute(text(f"ALTER TABLE conversation_messages DETACH PARTITION {name}"))
+
+    @staticmethod
+    def _set_archive(db: Session, conversation: Conversation, blob, archived_at) -> None:
+        # Core UPDATE that keeps last_message_at, which the ORM would bump via onupdate
+        db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation.id)
+            .values(archive_blob=blob, archived_at=archived_at, last_message_at=Conversation.last_message_at)
+            .execution_options(synchronize_session=False)
+        )
+        set_committed_value(conversation, "archive_blob", blob)
+        set_committed_value(conversation, "archived_at", archived_at)
+
+    @staticmethod
+    def archive_conversation(db: Session, conversation: Conversation) -> int:
+        """
+        Move a conversation's messages into a compressed blob on the conversation.
+
+        The conversation row is locked first, so a turn being written waits
+        for the archive or finishes before it. Only the messages read into
+        the blob are deleted, so a message inserted in between is not lost.
+
+        Returns:
+            Number of messages archived
+        """
+        archived_at = db.query(Conversation.archived_at).filter(
+            Conversation.id == conversation.id
+        ).with_for_update(key_share=True).scalar()
+        if archived_at is not None:
+            db.commit()
+            return 0
+
+        messages = db.query(ConversationMessage).filter(
+            ConversationMessage.conversation_id == conversation.id
+        ).order_by(ConversationMessage.created_at.asc(), ConversationMessage.id.asc()).all()
+        if not messages:
+            db.commit()
+            return 0
+
+        rows = [
+            {
+                "id": message.id,
+                "role": message.role,
+                "content": message.content,
+                "payload": message.payload,
+                "created_at": message.created_at.isoformat(),
+            }
+            for message in messages
+        ]
+        ArchiveService._set_archive(db, conversation, zlib.compress(json.dumps(rows).encode()), datetime.utcnow())
+        db.execute(
+            delete(ConversationMessage)
+            .where(
+                ConversationMessage.conversation_id == conversation.id,
+                ConversationMessage.id.in_([message.id for message in messages])
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        for message in messages:
+            db.expunge(message)
+        return len(rows)
+
+    @staticmethod
+    def archive_inactive(db: Session, inactive_days: int, limit: int = 500) -> int:
+        """
+        Archive conversations with no messages for `inactive_days` days.
+
+        Each conversation is archived in its own transaction.
+
+        Returns:
+            Number of conversations archived
+        """
+        cutoff = datetime.utcnow() - timedelta(days=inactive_days)
+        conversations = db.query(Conversation).filter(
+            Conversation.last_message_at < cutoff,
+            Conversation.archived_at.is_(None),
+            Conversation.deleted_at.is_(None),
+            Conversation.message_count > 0
+        ).order_by(Conversation.last_message_at.asc()).limit(limit).all()
+
+        archived = 0
+        for conversation in conversations:
+            try:
+                if ArchiveService.archive_conversation(db, conversation):
+                    archived += 1
+            except Exception as e:
+                print(f"Error archiving conversation {conversation.id}: {e}")
+                db.rollback()
+        return archived
+
+    @staticmethod
+    def rehydrate(db: Session, conversation: Conversation) -> int:
+        """
+        Restore an archived conversation's messages to the messages table.
+
+        Messages keep their original ids and timestamps, so summaries and
+        pagination cursors stay valid. The conversation row is locked while
+        restoring, so concurrent opens restore it once: later ones find it no
+        longer archived. Inserts skip rows that already exist.
+
+        Returns:
+            Number of messages restored
+        """
+        if conversation.archived_at is None:
+            return 0
+
+        locked = db.query(Conversation.archived_at, Conversation.archive_blob).filter(
+            Conversation.id == conversation.id
+        ).with_for_update().one_or_none()
+        if locked is None or locked.archived_at is None:
+            # Restored by another request while we waited for the lock
+            db.commit()
+            set_committed_value(conversation, "archive_blob", None)
+            set_committed_value(conversation, "archived_at", None)
+            return 0
+
+        rows = json.loads(zlib.decompress(locked.archive_blob)) if locked.archive_blob else []
+        if rows:
+            db.execute(insert(ConversationMessage).on_conflict_do_nothing(), [
+                {**row, "conversation_id": conversation.id, "created_at": datetime.fromisoformat(row["created_at"])}
+                for row in rows
+            ])
+        ArchiveService._set_archive(db, conversation, None, None)
+        db.commit()
+        print(f"Rehydrated {len(rows)} archived messages of conversation {conversation.id}")
+        return len(rows)
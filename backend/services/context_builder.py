@@ -0,0 +1,116 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+
+
+class ContextBuilder:
+    """Builds a bounded Gemini prompt context from conversation history."""
+
+    # Rough heuristic for Gemini tokenizers on English text
+    CHARS_PER_TOKEN = 4
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Estimate the token count of a piece of text without calling the API."""
+        if not text:
+            return 0
+        return len(text) // ContextBuilder.CHARS_PER_TOKEN + 1
+
+    @staticmethod
+    def movie_refs(payload: Optional[Dict]) -> Optional[List[Dict]]:
+        """Reduce an assistant payload to the id and title of each recommended movie."""
+        if not isinstance(payload, dict):
+            return None
+        return [
+            {"id": movie.get("id"), "title": movie.get("title")}
+            for movie in payload.get("movies") or []
+            if isinstance(movie, dict)
+        ]
+
+    @staticmethod
+    def compact_content(role: str, content: str, movies: Optional[List[Dict]] = None) -> str:
+        """
+        Render an assistant reply for the prompt without enrichment data.
+
+        The model only needs to know what it said and which movies it
+        recommended, not the posters, overviews, trailers and thriller picks
+        shown to the client, so keep the message plus each movie's id and
+        title. Replies stored before payloads moved out of content are still
+        stored as enriched JSON text and are compacted the same way.
+
+        Args:
+            role: Message role
+            content: Stored message content
+            movies: Recommended movies as [{"id", "title"}], if any
+
+        Returns:
+            Compact content (unchanged for user messages and plain replies)
+        """
+        if role != "assistant":
+            return content
+        if movies:
+            return json.dumps({"message": content, "movies": movies})
+        if not content.lstrip().startswith("{"):
+            return content
+
+        try:
+            data = json.loads(content)
+        except (json.JSONDecodeError, TypeError):
+            return content
+        if not isinstance(data, dict):
+            return content
+
+        return json.dumps({
+            "message": data.get("message", ""),
+            "movies": ContextBuilder.movie_refs(data)
+        })
+
+    @staticmethod
+    def build(
+        messages: List[Dict],
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        reserved_tokens: int = 0
+    ) -> Tuple[List[Dict], int]:
+        """
+        Fit conversation history into a token budget.
+
+        System messages (e.g. RAG context) are always kept. Of the remaining
+        history only the last max_turns user/assistant turns are kept, with
+        assistant payloads compacted, and the oldest of those are dropped
+        until the prompt fits. The latest message is never dropped.
+
+        Args:
+            messages: Messages in chronological order with 'role', 'content'
+                and optionally 'movies' (recommended [{"id", "title"}])
+            max_turns: Turns to keep verbatim, defaults to settings.chat_history_max_turns
+            token_budget: Prompt budget, defaults to settings.chat_prompt_token_budget
+            reserved_tokens: Tokens already spent on fixed prompt parts (system prompt)
+
+        Returns:
+            Tuple of (messages to send, estimated prompt token count)
+        """
+        max_turns = max_turns if max_turns is not None else settings.chat_history_max_turns
+        token_budget = token_budget if token_budget is not None else settings.chat_prompt_token_budget
+
+        system_messages = [msg for msg in messages if msg.get("role") == "system"]
+        history = [msg for msg in messages if msg.get("role") != "system"]
+        history = history[-max_turns * 2:] if max_turns > 0 else history[-1:]
+
+        history = [
+            {
+                "role": msg.get("role"),
+                "content": ContextBuilder.compact_content(msg.get("role"), msg.get("content", ""), msg.get("movies"))
+            }
+            for msg in history
+        ]
+
+        tokens = reserved_tokens + sum(
+            ContextBuilder.estimate_tokens(msg.get("content", "")) for msg in system_messages + history
+        )
+        while len(history) > 1 and tokens > token_budget:
+            dropped = history.pop(0)
+            tokens -= ContextBuilder.estimate_tokens(dropped["content"])
+
+        return system_messages + history, tokens
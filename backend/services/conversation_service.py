@@ -1,10 +1,28 @@
-from sqlalchemy.orm import Session
+import json
+from sqlalchemy import delete, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, defer, with_expression
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from database import SessionLocal
 from models import Conversation, ConversationMessage
+from services.archive_service import ArchiveService
+
+# Keyset position: (timestamp, id) of the last row on the previous page
+Cursor = Tuple[datetime, int]
+
+# Only the id and title of each recommended movie, built in the database so
+# prompt history doesn't transfer and parse full enrichment payloads
+MOVIE_REFS = literal_column(
+    "(SELECT jsonb_agg(jsonb_build_object('id', movie->'id', 'title', movie->'title')) "
+    "FROM jsonb_array_elements(conversation_messages.payload->'movies') AS movie)",
+    JSONB
+)
 
 
 class ConversationService:
+    PREVIEW_LENGTH = 120
+
     @staticmethod
     def create_conversation(db: Session, user_id: str) -> Conversation:
         conversation = Conversation(
@@ -19,53 +37,302 @@ class ConversationService:
 
     @staticmethod
     def get_conversation_by_id(db: Session, conversation_id: int) -> Optional[Conversation]:
-        return db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        """Load a conversation, restoring its messages first if it was archived."""
+        conversation = db.query(Conversation).filter(
+            Conversation.id == conversation_id,
+            Conversation.deleted_at.is_(None)
+        ).first()
+        if conversation is not None and conversation.archived_at is not None:
+            ArchiveService.rehydrate(db, conversation)
+        return conversation
 
     @staticmethod
-    def get_user_conversations(db: Session, user_id: str) -> List[Conversation]:
-        return db.query(Conversation).filter(
-            Conversation.user_id == user_id
-        ).order_by(Conversation.last_message_at.desc()).all()
+    def get_user_conversations(
+        db: Session, user_id: str, limit: Optional[int] = None, before: Optional[Cursor] = None
+    ) -> List[Conversation]:
+        """
+        Get a user's conversations, most recently active first.
+
+        Args:
+            db: Database session
+            user_id: Owner of the conversations
+            limit: Page size; None returns every conversation
+            before: Only return conversations after this (last_message_at, id)
+                position in the list, i.e. less recently active ones
+        """
+        query = db.query(Conversation).filter(
+            Conversation.user_id == user_id,
+            Conversation.deleted_at.is_(None)
+        )
+        if before is not None:
+            query = query.filter(tuple_(Conversation.last_message_at, Conversation.id) < before)
+        query = query.order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
 
     @staticmethod
-    def delete_conversation(db: Session, conversation_id: int) -> bool:
-        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-        if not conversation:
-            return False
-        db.query(ConversationMessage).filter(ConversationMessage.conversation_id == conversation_id).delete()
+    def mark_deleted(
+        db: Session, conversation_id: Optional[int] = None, user_id: Optional[str] = None
+    ) -> Tuple[List[int], int]:
+        """
+        Hide one conversation, or all of a user's, ahead of purging them.
 
-        db.delete(conversation)
+        Args:
+            db: Database session
+            conversation_id: Conversation to delete
+            user_id: Delete every conversation of this user instead
+
+        Returns:
+            The ids of the hidden conversations and their total message count
+        """
+        statement = update(Conversation).where(Conversation.deleted_at.is_(None))
+        if conversation_id is not None:
+            statement = statement.where(Conversation.id == conversation_id)
+        else:
+            statement = statement.where(Conversation.user_id == user_id)
+
+        rows = db.execute(
+            statement.values(deleted_at=datetime.utcnow())
+            .returning(Conversation.id, Conversation.message_count)
+            .execution_options(synchronize_session=False)
+        ).all()
         db.commit()
-        return True
+        return [row.id for row in rows], sum(row.message_count for row in rows)
+
+    @staticmethod
+    def purge_conversations(db: Session, conversation_ids: List[int], batch_size: Optional[int] = None) -> int:
+        """
+        Remove conversations and their messages.
+
+        Without a batch size this is a single cascading DELETE. With one,
+        messages are deleted in bounded batches, each in its own
+        transaction, so no statement holds locks on a huge number of rows.
+
+        Returns:
+            Number of messages deleted in batches
+        """
+        if not conversation_ids:
+            return 0
+
+        deleted_messages = 0
+        if batch_size:
+            while True:
+                batch = select(ConversationMessage.id).where(
+                    ConversationMessage.conversation_id.in_(conversation_ids)
+                ).limit(batch_size)
+                result = db.execute(
+                    delete(ConversationMessage)
+                    .where(ConversationMessage.id.in_(batch))
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                deleted_messages += result.rowcount
+                if result.rowcount < batch_size:
+                    break
+
+        db.execute(
+            delete(Conversation)
+            .where(Conversation.id.in_(conversation_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return deleted_messages
+
+    @staticmethod
+    def purge_deleted(db: Session, batch_size: int) -> int:
+        """
+        Purge conversations left marked deleted, e.g. by a background purge
+        that was interrupted by a restart.
+
+        Returns:
+            Number of conversations purged
+        """
+        conversation_ids = db.execute(
+            select(Conversation.id).where(Conversation.deleted_at.isnot(None))
+        ).scalars().all()
+        ConversationService.purge_conversations(db, conversation_ids, batch_size=batch_size)
+        return len(conversation_ids)
+
+    @staticmethod
+    def purge_in_background(conversation_ids: List[int], batch_size: int) -> None:
+        """Background-task entry point: purge with a dedicated session."""
+        db = SessionLocal()
+        try:
+            deleted = ConversationService.purge_conversations(db, conversation_ids, batch_size=batch_size)
+            print(f"Purged {len(conversation_ids)} conversations ({deleted} messages)")
+        except Exception as e:
+            print(f"Error purging conversations {conversation_ids}: {e}")
+            db.rollback()
+        finally:
+            db.close()
 
     @staticmethod
-    def get_conversation_messages(db: Session, conversation_id: int) -> List[ConversationMessage]:
-        return db.query(ConversationMessage).filter(
+    def get_conversation_messages(
+        db: Session,
+        conversation_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+    ) -> List[ConversationMessage]:
+        """
+        Get a page of a conversation's messages in chronological order.
+
+        With only a limit, returns the latest `limit` messages. `before`
+        pages back to older messages and `after` forward to newer ones,
+        relative to a (created_at, id) position. Without a limit or cursor,
+        returns the whole conversation.
+        """
+        key = tuple_(ConversationMessage.created_at, ConversationMessage.id)
+        query = db.query(ConversationMessage).filter(
             ConversationMessage.conversation_id == conversation_id
-        ).order_by(ConversationMessage.created_at.asc()).all()
+        )
+
+        if after is not None:
+            query = query.filter(key > after).order_by(
+                ConversationMessage.created_at.asc(), ConversationMessage.id.asc()
+            )
+            return query.limit(limit).all() if limit is not None else query.all()
+
+        if before is not None:
+            query = query.filter(key < before)
+        if limit is None:
+            return query.order_by(ConversationMessage.created_at.asc(), ConversationMessage.id.asc()).all()
+
+        # Latest page first via the index, then back to chronological order
+        messages = query.order_by(
+            ConversationMessage.created_at.desc(), ConversationMessage.id.desc()
+        ).limit(limit).all()
+        return list(reversed(messages))
 
     @staticmethod
-    def add_message(db: Session, conversation_id: int, role: str, content: str) -> ConversationMessage:
+    def get_recent_messages(
+        db: Session, conversation_id: int, limit: int, after_id: Optional[int] = None
+    ) -> List[ConversationMessage]:
+        """
+        Get the last `limit` messages of a conversation in chronological order.
+
+        Messages with id <= after_id (e.g. already folded into the summary) are skipped.
+        Payloads are not loaded; movie_refs carries the recommended movies instead.
+        """
+        query = db.query(ConversationMessage).options(
+            defer(ConversationMessage.payload),
+            with_expression(ConversationMessage.movie_refs, MOVIE_REFS)
+        ).filter(
+            ConversationMessage.conversation_id == conversation_id
+        )
+        if after_id is not None:
+            query = query.filter(ConversationMessage.id > after_id)
+        messages = query.order_by(
+            ConversationMessage.created_at.desc(), ConversationMessage.id.desc()
+        ).limit(limit).all()
+        return list(reversed(messages))
+
+    @staticmethod
+    def add_message(
+        db: Session, conversation_id: int, role: str, content: str,
+        conversation: Optional[Conversation] = None, payload: Optional[Dict] = None
+    ) -> ConversationMessage:
+        """
+        Add a message and bump the conversation's last_message_at.
+
+        Pass the already-loaded conversation to update it in place; otherwise
+        the timestamp is set with a single UPDATE instead of loading the row.
+        """
+        now = datetime.utcnow()
         message = ConversationMessage(
             conversation_id=conversation_id,
             role=role,
             content=content,
-            created_at=datetime.utcnow()
+            payload=payload,
+            created_at=now
         )
         db.add(message)
-
-        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-        if conversation:
-            conversation.last_message_at = datetime.utcnow()
+        ConversationService._touch(db, conversation_id, [message], conversation)
 
         db.commit()
-        db.refresh(message)
         return message
 
+    @staticmethod
+    def add_messages(
+        db: Session, conversation_id: int, messages: List[Dict],
+        conversation: Optional[Conversation] = None
+    ) -> List[ConversationMessage]:
+        """
+        Write several messages and bump last_message_at in a single transaction.
+
+        Args:
+            db: Database session
+            conversation_id: Conversation the messages belong to
+            messages: Dicts with role, content and optionally payload and created_at
+            conversation: The conversation, if the caller already loaded it
+
+        Returns:
+            The inserted messages
+        """
+        now = datetime.utcnow()
+        rows = [
+            ConversationMessage(
+                conversation_id=conversation_id,
+                role=message["role"],
+                content=message["content"],
+                payload=message.get("payload"),
+                created_at=message.get("created_at") or now
+            )
+            for message in messages
+        ]
+        db.add_all(rows)
+        ConversationService._touch(db, conversation_id, rows, conversation)
+        db.commit()
+        return rows
+
+    @staticmethod
+    def preview(content: str) -> str:
+        """Short plain-text snippet of a message for conversation lists."""
+        text = content
+        if content.lstrip().startswith("{"):
+            try:
+                data = json.loads(content)
+                if isinstance(data, dict) and isinstance(data.get("message"), str):
+                    text = data["message"]
+            except (json.JSONDecodeError, TypeError):
+                pass
+        text = " ".join(text.split())
+        if len(text) > ConversationService.PREVIEW_LENGTH:
+            text = text[:ConversationService.PREVIEW_LENGTH - 1].rstrip() + "…"
+        return text
+
+    @staticmethod
+    def _touch(db: Session, conversation_id: int, messages: List[ConversationMessage],
+               conversation: Optional[Conversation] = None) -> None:
+        """
+        Update the denormalized conversation columns for newly added messages
+        without a SELECT; the caller commits.
+        """
+        if not messages:
+            return
+        # Messages of one turn often share a timestamp; the last one written wins
+        latest = max(reversed(messages), key=lambda message: message.created_at)
+        values = {
+            "last_message_at": latest.created_at,
+            # Incremented in SQL so concurrent writers don't lose counts
+            "message_count": Conversation.message_count + len(messages),
+            "last_message_preview": ConversationService.preview(latest.content),
+        }
+        if conversation is not None:
+            for name, value in values.items():
+                setattr(conversation, name, value)
+        else:
+            db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(**values)
+            )
+
     @staticmethod
     def get_or_create_conversation(db: Session, user_id: str, conversation_id: Optional[int] = None) -> Conversation:
         if conversation_id:
-            conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            conversation = ConversationService.get_conversation_by_id(db, conversation_id)
             if not conversation:
                 raise ValueError(f"Conversation {conversation_id} not found")
             return conversation
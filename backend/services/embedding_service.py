@@ -1,15 +1,16 @@
 import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 from sqlalchemy.orm import Session
 from config import settings
 from models import Movie, MovieEmbedding
+from services.gemini_client import EmbeddingError, GeminiClient
 
 
 class EmbeddingService:
     """Service for creating and searching embeddings"""
 
     # The embedding model we're using
-    EMBEDDING_MODEL = "models/text-embedding-004"
+    EMBEDDING_MODEL = settings.gemini_embedding_model
 
     @staticmethod
     def create_embedding(text: str) -> List[float]:
@@ -23,16 +24,22 @@ class EmbeddingService:
             List of 768 floats representing the text's meaning
             Example: [0.037, -0.015, -0.050, ...]
 
+        Raises:
+            EmbeddingError: If Gemini failed, including after rate-limit retries.
+                No placeholder vector is returned, so failures never end up in
+                stored embeddings or similarity searches.
+
         Example:
             embedding = EmbeddingService.create_embedding("Inception is great")
             # Returns: [0.1, 0.2, 0.3, ...]
         """
         try:
-            # Configure Gemini API
-            genai.configure(api_key=settings.gemini_access_token)
+            # Configure Gemini API (once per process)
+            GeminiClient.configure()
 
-            # Create embedding using Gemini
-            result = genai.embed_content(
+            # Create embedding using Gemini, throttled and retried by the shared limiter
+            result = GeminiClient.embedding_limiter.call(
+                genai.embed_content,
                 model=EmbeddingService.EMBEDDING_MODEL,
                 content=text
             )
@@ -44,7 +51,31 @@ class EmbeddingService:
 
         except Exception as e:
             print(f"Error creating embedding: {e}")
-            return [0.0] * 768
+            raise EmbeddingError(f"Failed to create embedding: {e}") from e
+
+    @staticmethod
+    async def create_embedding_async(text: str) -> List[float]:
+        """
+        Async version of create_embedding for use inside request handlers.
+
+        Throttling waits and retry backoff are awaited rather than slept,
+        so they never block the event loop.
+
+        Raises:
+            EmbeddingError: If Gemini failed, including after rate-limit retries
+        """
+        try:
+            GeminiClient.configure()
+            result = await GeminiClient.embedding_limiter.call_async(
+                genai.embed_content_async,
+                model=EmbeddingService.EMBEDDING_MODEL,
+                content=text
+            )
+            return result['embedding']
+
+        except Exception as e:
+            print(f"Error creating embedding: {e}")
+            raise EmbeddingError(f"Failed to create embedding: {e}") from e
 
     @staticmethod
     def store_movie_embedding(db: Session, movie_id: int, content_type: str = "overview", content: str = None) -> Optional[MovieEmbedding]:
@@ -108,7 +139,8 @@ class EmbeddingService:
             return None
 
     @staticmethod
-    def search_similar_movies(db: Session, query: str, limit: int = 5) -> List[Dict]:
+    def search_similar_movies(db: Session, query: str, limit: int = 5,
+                              query_embedding: Optional[List[float]] = None) -> List[Dict]:
         """
         Search for movies similar to the query using vector similarity
 
@@ -118,6 +150,7 @@ class EmbeddingService:
             db: Database session
             query: Search query (e.g., "mind-bending thrillers")
             limit: Maximum number of results
+            query_embedding: Precomputed embedding of the query, if the caller already has one
 
         Returns:
             List of dicts with movie info and similarity scores
@@ -141,7 +174,8 @@ class EmbeddingService:
         try:
             # Step 1: Convert query to embedding
             print(f"Searching for: '{query}'")
-            query_embedding = EmbeddingService.create_embedding(query)
+            if query_embedding is None:
+                query_embedding = EmbeddingService.create_embedding(query)
 
             # Step 2: Search database using pgvector
             # SQL: SELECT * FROM movie_embeddings
@@ -197,4 +231,164 @@ class EmbeddingService:
             print(f"Error searching similar movies: {e}")
             import traceback
             traceback.print_exc()
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def refresh_movie_neighbors(db: Session, k: int = 20) -> int:
+        """
+        Rebuild the precomputed k-nearest-neighbor table from stored embeddings
+
+        Runs one pgvector nearest-neighbor scan per movie inside a single
+        transaction, so readers keep seeing the previous table until commit.
+
+        Args:
+            db: Database session
+            k: Number of neighbors to keep per movie
+
+        Returns:
+            Number of neighbor rows written
+        """
+        from sqlalchemy import text
+
+        try:
+            db.execute(text("DELETE FROM movie_neighbors"))
+            result = db.execute(
+                text("""
+                     INSERT INTO movie_neighbors (movie_id, neighbor_id, rank, similarity, computed_at)
+                     SELECT src.movie_id,
+                            nn.movie_id,
+                            nn.rank,
+                            nn.similarity,
+                            now()
+                     FROM movie_embeddings src
+                              CROSS JOIN LATERAL (
+                         SELECT me.movie_id,
+                                1 - (me.embedding <=> src.embedding) AS similarity,
+                                row_number() OVER (ORDER BY me.embedding <=> src.embedding) AS rank
+                         FROM movie_embeddings me
+                         WHERE me.content_type = 'overview'
+                           AND me.movie_id <> src.movie_id
+                         ORDER BY me.embedding <=> src.embedding
+                         LIMIT :k
+                         ) nn
+                     WHERE src.content_type = 'overview'
+                     """),
+                {"k": k}
+            )
+            db.commit()
+            return result.rowcount
+
+        except Exception as e:
+            print(f"Error refreshing movie neighbors: {e}")
+            db.rollback()
+            raise
+
+    @staticmethod
+    def movies_with_neighbors(
+        db: Session, movie_ids: List[int], min_count: int, genre_id: Optional[int] = None
+    ) -> Set[int]:
+        """
+        Find which movies have at least `min_count` precomputed neighbors, in one query
+
+        Args:
+            db: Database session
+            movie_ids: TMDB IDs of the source movies
+            min_count: Number of neighbors a movie needs
+            genre_id: Only count neighbors tagged with this TMDB genre
+
+        Returns:
+            The subset of movie_ids with enough neighbors
+        """
+        from sqlalchemy import bindparam, text
+
+        movie_ids = [movie_id for movie_id in movie_ids if movie_id]
+        if not movie_ids:
+            return set()
+
+        genre_filter = "AND m.genres @> CAST(:genres AS jsonb)" if genre_id is not None else ""
+        params = {"movie_ids": movie_ids, "min_count": min_count}
+        if genre_id is not None:
+            params["genres"] = f"[{int(genre_id)}]"
+
+        try:
+            result = db.execute(
+                text(f"""
+                     SELECT mn.movie_id
+                     FROM movie_neighbors mn
+                              JOIN movies m ON mn.neighbor_id = m.id
+                     WHERE mn.movie_id IN :movie_ids
+                     {genre_filter}
+                     GROUP BY mn.movie_id
+                     HAVING COUNT(*) >= :min_count
+                     """).bindparams(bindparam("movie_ids", expanding=True)),
+                params
+            )
+            return {row.movie_id for row in result}
+        except Exception as e:
+            print(f"Error counting movie neighbors: {e}")
+            # Callers share the request's session; don't leave its transaction aborted
+            db.rollback()
+            return set()
+
+    @staticmethod
+    def get_movie_neighbors(db: Session, movie_id: int, limit: int = 10, genre_id: Optional[int] = None) -> List[Dict]:
+        """
+        Get the precomputed nearest neighbors of a movie
+
+        Reads from movie_neighbors only, so no embedding call or TMDB call
+        is made. Run generate_neighbors.py to (re)build the table.
+
+        Args:
+            db: Database session
+            movie_id: TMDB ID of the source movie
+            limit: Maximum number of neighbors
+            genre_id: Only return neighbors tagged with this TMDB genre (e.g. 53 for thrillers)
+
+        Returns:
+            List of dicts in the same shape as search_similar_movies, closest first
+        """
+        from sqlalchemy import text
+
+        genre_filter = "AND m.genres @> CAST(:genres AS jsonb)" if genre_id is not None else ""
+        params = {"movie_id": movie_id, "limit": limit}
+        if genre_id is not None:
+            params["genres"] = f"[{int(genre_id)}]"
+
+        try:
+            result = db.execute(
+                text(f"""
+                     SELECT mn.neighbor_id AS movie_id,
+                            m.title,
+                            m.overview,
+                            m.release_date,
+                            m.vote_average,
+                            m.poster_path,
+                            mn.similarity
+                     FROM movie_neighbors mn
+                              JOIN movies m ON mn.neighbor_id = m.id
+                     WHERE mn.movie_id = :movie_id
+                     {genre_filter}
+                     ORDER BY mn.rank
+                     LIMIT :limit
+                     """),
+                params
+            )
+
+            return [
+                {
+                    "movie_id": row.movie_id,
+                    "title": row.title,
+                    "overview": row.overview,
+                    "release_date": str(row.release_date) if row.release_date else None,
+                    "vote_average": float(row.vote_average) if row.vote_average else 0,
+                    "poster_path": row.poster_path,
+                    "similarity": float(row.similarity)
+                }
+                for row in result
+            ]
+
+        except Exception as e:
+            print(f"Error loading neighbors for movie {movie_id}: {e}")
+            # Callers share the request's session; don't leave its transaction aborted
+            db.rollback()
+            return []
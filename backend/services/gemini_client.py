@@ -0,0 +1,186 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+import google.generativeai as genai
+
+from config import settings
+from services.rate_limiter import RateLimiter
+
+
+class GeminiServiceError(Exception):
+    """Base error for failed Gemini calls."""
+
+
+class GeminiRateLimitError(GeminiServiceError):
+    """Gemini kept rejecting requests with rate-limit errors after all retries."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class EmbeddingError(GeminiServiceError):
+    """An embedding could not be created."""
+
+
+class GeminiClient:
+    """
+    Process-wide Gemini SDK configuration and GenerativeModel registry.
+
+    The SDK is configured once, on first use, and each model is constructed
+    once per process and then reused, so requests skip the per-call setup and
+    the SDK transport can keep its connections alive.
+    """
+
+    _configured = False
+    _models: Dict[str, genai.GenerativeModel] = {}
+    _expires_at: Dict[str, Optional[float]] = {}
+    _cached_contents: Dict[str, Any] = {}
+    _building: Set[str] = set()
+    _lock = threading.Lock()
+
+    # Separate buckets so embedding bursts (RAG, batch jobs) can't starve chat generation
+    generation_limiter = RateLimiter(
+        "generation",
+        rate_per_second=settings.gemini_generation_rate_per_second,
+        burst=settings.gemini_generation_burst,
+        max_concurrency=settings.gemini_generation_max_concurrency,
+        max_retries=settings.gemini_max_retries,
+        backoff_base_seconds=settings.gemini_backoff_base_seconds,
+        backoff_max_seconds=settings.gemini_backoff_max_seconds,
+    )
+    embedding_limiter = RateLimiter(
+        "embedding",
+        rate_per_second=settings.gemini_embedding_rate_per_second,
+        burst=settings.gemini_embedding_burst,
+        max_concurrency=settings.gemini_embedding_max_concurrency,
+        max_retries=settings.gemini_max_retries,
+        backoff_base_seconds=settings.gemini_backoff_base_seconds,
+        backoff_max_seconds=settings.gemini_backoff_max_seconds,
+    )
+
+    @staticmethod
+    def configure() -> None:
+        """Configure the Gemini SDK with our API key (no-op after the first call)."""
+        if GeminiClient._configured:
+            return
+        with GeminiClient._lock:
+            if not GeminiClient._configured:
+                genai.configure(api_key=settings.gemini_access_token)
+                GeminiClient._configured = True
+
+    @staticmethod
+    def _build_model(name: str, model_kwargs: Dict) -> Tuple[genai.GenerativeModel, Optional[float], Optional[Any]]:
+        """
+        Construct a GenerativeModel, serving its system instruction from a
+        Gemini context cache when enabled.
+
+        Returns:
+            Tuple of (model, monotonic time after which the model must be
+            rebuilt or None, the CachedContent backing it or None)
+        """
+        system_instruction = model_kwargs.get("system_instruction")
+        if settings.gemini_context_cache_enabled and system_instruction:
+            try:
+                ttl = settings.gemini_context_cache_ttl_seconds
+                cached_content = genai.caching.CachedContent.create(
+                    model=name,
+                    system_instruction=system_instruction,
+                    ttl=timedelta(seconds=ttl)
+                )
+                cached_kwargs = {k: v for k, v in model_kwargs.items() if k != "system_instruction"}
+                model = genai.GenerativeModel.from_cached_content(cached_content=cached_content, **cached_kwargs)
+                # Rebuild a little before the cache expires on the server
+                return model, time.monotonic() + ttl * 0.9, cached_content
+            except Exception as e:
+                # e.g. the prefix is below the model's minimum cacheable size
+                print(f"Gemini context cache unavailable for {name}, using system_instruction: {e}")
+
+        return genai.GenerativeModel(name, **model_kwargs), None, None
+
+    @staticmethod
+    def _delete_cached_content(cached_content) -> None:
+        """Delete a context cache that no model uses any more, instead of paying for it until its TTL."""
+        if cached_content is None:
+            return
+        try:
+            cached_content.delete()
+        except Exception as e:
+            print(f"Error deleting Gemini context cache: {e}")
+
+    @staticmethod
+    def get_model(model_name: Optional[str] = None, variant: str = "default", **model_kwargs) -> genai.GenerativeModel:
+        """
+        Get the shared GenerativeModel for a model name and configuration variant.
+
+        Building a model can mean a CachedContent.create round-trip, so it
+        happens outside the lock. While one caller rebuilds an expiring
+        model, the others keep using the current one.
+
+        Args:
+            model_name: Gemini model name, defaults to settings.gemini_model_name
+            variant: Name of the configuration; models are cached per (model_name, variant)
+            **model_kwargs: GenerativeModel arguments (e.g. generation_config,
+                system_instruction), used when the variant is built
+
+        Returns:
+            Cached GenerativeModel instance
+        """
+        name = model_name or settings.gemini_model_name
+        key = f"{name}:{variant}"
+        model = GeminiClient._models.get(key)
+        expires_at = GeminiClient._expires_at.get(key)
+        if model is not None and (expires_at is None or time.monotonic() < expires_at):
+            return model
+
+        GeminiClient.configure()
+        with GeminiClient._lock:
+            model = GeminiClient._models.get(key)
+            expires_at = GeminiClient._expires_at.get(key)
+            if model is not None and (expires_at is None or time.monotonic() < expires_at):
+                return model
+            if model is not None and key in GeminiClient._building:
+                # Still valid on the server for the rest of its TTL
+                return model
+            GeminiClient._building.add(key)
+        stale = model
+
+        try:
+            model, expires_at, cached_content = GeminiClient._build_model(name, model_kwargs)
+        finally:
+            with GeminiClient._lock:
+                GeminiClient._building.discard(key)
+
+        with GeminiClient._lock:
+            current = GeminiClient._models.get(key)
+            if current is not None and current is not stale:
+                # Another caller built this variant first; keep theirs
+                superseded, model = cached_content, current
+            else:
+                superseded = GeminiClient._cached_contents.pop(key, None)
+                GeminiClient._models[key] = model
+                GeminiClient._expires_at[key] = expires_at
+                if cached_content is not None:
+                    GeminiClient._cached_contents[key] = cached_content
+        GeminiClient._delete_cached_content(superseded)
+        return model
+
+    @staticmethod
+    def reset() -> None:
+        """Forget the configuration and cached models (used by tests)."""
+        with GeminiClient._lock:
+            GeminiClient._configured = False
+            GeminiClient._models.clear()
+            GeminiClient._expires_at.clear()
+            GeminiClient._cached_contents.clear()
+            GeminiClient._building.clear()
+
+    @staticmethod
+    def stats() -> Dict:
+        """Limiter counters for both buckets."""
+        return {
+            "generation": GeminiClient.generation_limiter.stats(),
+            "embedding": GeminiClient.embedding_limiter.stats()
+        }
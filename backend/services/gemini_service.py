@@ -1,8 +1,11 @@
-import google.generativeai as genai
-from typing import List, Dict, Optional
+from collections import deque
+from typing import AsyncIterator, Deque, List, Dict, Optional, Tuple
+import asyncio
 import json
-import re
+
 from config import settings
+from services.gemini_client import GeminiClient, GeminiRateLimitError
+from services.rate_limiter import RateLimiter
 
 class GeminiService:
     """Service for generating AI responses using Google Gemini."""
@@ -21,34 +24,71 @@ class GeminiService:
     - Conversational and warm, not robotic
     - Knowledgeable but approachable, not pretentious
 
-    IMPORTANT - Response Format:
-    When recommending movies, ALWAYS respond in this exact JSON format:
-
-    ```json
-    {
-      "message": "Your conversational response here (2-3 sentences introducing the recommendations)",
-      "movies": [
-        {
-          "id": 550,
-          "title": "Fight Club",
-          "reason": "Brief explanation why this matches user preferences (1-2 sentences)",
-          "thrillers": [
-            {"id": 680, "title": "Pulp Fiction"},
-            {"id": 13, "title": "Forrest Gump"}
-          ]
-        }
-      ]
-    }
-    ```
+    Response format:
+    Your reply is returned as JSON matching the response schema:
+    - "message": your conversational response (2-3 sentences introducing the recommendations)
+    - "movies": the recommended movies, each with "id", "title", "reason" and "thrillers"
 
     Guidelines:
-    - ALWAYS include the JSON code block with ```json markers
     - Use actual TMDB movie IDs when available from context
     - If you don't have movie IDs, use 0 as placeholder
-    - Include 2-3 thriller recommendations per movie when they make sense
+    - Include 2-3 thriller recommendations per movie (id and title) when they make sense
     - Keep "reason" concise (1-2 sentences per movie)
     - "message" should be conversational and warm
-    - If the user is just chatting without asking for recommendations, respond normally in JSON format with empty "movies" array
+    - If the user is just chatting without asking for recommendations, return an empty "movies" array
+    """
+
+    # Gemini response schema mirroring the fields of schemas.MovieRecommendation
+    # that the model fills in; TMDB enrichment adds the rest
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "message": {"type": "string"},
+            "movies": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "title": {"type": "string"},
+                        "reason": {"type": "string"},
+                        "thrillers": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "id": {"type": "integer"},
+                                    "title": {"type": "string"}
+                                },
+                                "required": ["id", "title"]
+                            }
+                        }
+                    },
+                    "required": ["id", "title", "reason"]
+                }
+            }
+        },
+        "required": ["message", "movies"]
+    }
+
+    STRUCTURED_GENERATION_CONFIG = {
+        "response_mime_type": "application/json",
+        "response_schema": RESPONSE_SCHEMA
+    }
+
+    ERROR_MESSAGE = (
+        "I apologize, but I'm having trouble processing your request right now. "
+        "Please try again! I'm here to help with movie recommendations."
+    )
+
+    # Hedging uses the observed p95 time to first chunk once this many samples exist
+    HEDGE_MIN_SAMPLES = 20
+    _first_chunk_latencies: Deque[float] = deque(maxlen=500)
+    _stats = {"hedges": 0, "hedge_wins": 0, "fallbacks": 0, "deadline_exceeded": 0}
+
+    SUMMARY_PROMPT = """Summarize the earlier part of this movie recommendation chat in at most 150 words.
+    Keep the user's stated tastes, dislikes and constraints, and the titles already recommended.
+    Write plain prose, no JSON.
     """
 
     @staticmethod
@@ -56,33 +96,34 @@ class GeminiService:
         """
         Format conversation history for Gemini API.
 
+        The static SYSTEM_PROMPT is not included; it is sent as the model's
+        system_instruction so the constant prefix stays identical (and
+        cacheable) across requests.
+
         Args:
             messages: List of message dictionaries with 'role' and 'content'
 
         Returns:
-            Formatted string combining system prompt and conversation history
+            Formatted string with the variable part of the prompt
         """
-        formatted = f"{GeminiService.SYSTEM_PROMPT}\n\n"
-        formatted += "--- Conversation History ---\n\n"
+        labels = {"system": "Context", "user": "User", "assistant": "Assistant"}
+        parts = ["--- Conversation History ---"]
 
         for msg in messages:
-            role = msg.get('role', 'user')
-            content = msg.get('content', '')
-
-            if role == 'user':
-                formatted += f"User: {content}\n\n"
-            elif role == 'assistant':
-                formatted += f"Assistant: {content}\n\n"
+            label = labels.get(msg.get('role', 'user'))
+            if label:
+                parts.append(f"{label}: {msg.get('content', '')}")
 
-        return formatted
+        return "\n\n".join(parts) + "\n\n"
 
     @staticmethod
     def parse_structured_response(response_text: str) -> Dict:
         """
         Parse structured JSON response from Gemini.
 
-        Extracts JSON from markdown code blocks and returns parsed structure.
-        Falls back to plain text response if JSON parsing fails.
+        Structured generation returns bare JSON matching RESPONSE_SCHEMA, so
+        this is a single json.loads. Falls back to a plain text response if
+        the text is not JSON (e.g. the apology returned on API errors).
 
         Args:
             response_text: Raw response text from Gemini
@@ -91,20 +132,13 @@ class GeminiService:
             Dict with 'message' and 'movies' keys, or fallback structure
         """
         try:
-            # Try to extract JSON from markdown code block
-            json_pattern = r'```json\s*(\{.*?\})\s*```'
-            match = re.search(json_pattern, response_text, re.DOTALL)
-
-            if match:
-                json_str = match.group(1)
-                parsed = json.loads(json_str)
-                return parsed
-
-            # Try to parse the entire response as JSON
             parsed = json.loads(response_text)
+            if not isinstance(parsed, dict):
+                raise ValueError("Structured response is not a JSON object")
+            parsed.setdefault("movies", [])
             return parsed
 
-        except (json.JSONDecodeError, AttributeError) as e:
+        except (json.JSONDecodeError, TypeError, ValueError) as e:
             print(f"Failed to parse structured response: {e}")
             # Fallback: return plain text response
             return {
@@ -113,35 +147,263 @@ class GeminiService:
             }
 
     @staticmethod
-    def generate_response(messages: List[Dict]) -> str:
+    def _log_usage(response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            print(
+                f"Gemini usage: prompt_tokens={getattr(usage, 'prompt_token_count', None)}, "
+                f"output_tokens={getattr(usage, 'candidates_token_count', None)}"
+            )
+
+    @staticmethod
+    def _get_chat_model(model_name: Optional[str] = None):
+        return GeminiClient.get_model(
+            model_name,
+            variant="chat",
+            system_instruction=GeminiService.SYSTEM_PROMPT
+        )
+
+    @staticmethod
+    def _get_structured_model(model_name: Optional[str] = None):
+        return GeminiClient.get_model(
+            model_name,
+            variant="structured",
+            system_instruction=GeminiService.SYSTEM_PROMPT,
+            generation_config=GeminiService.STRUCTURED_GENERATION_CONFIG
+        )
+
+    @staticmethod
+    def generate_response(messages: List[Dict], structured: bool = False) -> str:
         """
         Generate AI response using Gemini.
 
+        Each model in settings.gemini_model_chain is tried in order with a
+        deadline of gemini_request_timeout_seconds.
+
         Args:
             messages: Full conversation history with role and content for each message
+            structured: Request JSON output constrained to RESPONSE_SCHEMA
 
         Returns:
             AI-generated response as string
 
         Raises:
-            Returns user-friendly error message on failure instead of raising exceptions
+            GeminiRateLimitError: If Gemini is still throttling after all retries.
+            Other failures return a user-friendly error message instead of raising.
         """
+        prompt = GeminiService._format_conversation(messages)
+        last_error = None
+
+        for model_name in settings.gemini_model_chain:
+            try:
+                if structured:
+                    model = GeminiService._get_structured_model(model_name)
+                else:
+                    model = GeminiService._get_chat_model(model_name)
+                response = GeminiClient.generation_limiter.call(
+                    model.generate_content,
+                    prompt,
+                    request_options={"timeout": settings.gemini_request_timeout_seconds}
+                )
+                GeminiService._log_usage(response)
+                return response.text
+
+            except Exception as e:
+                print(f"\nGemini API Error ({model_name}): {type(e).__name__} - {str(e)}")
+                last_error = e
+
+        if isinstance(last_error, RateLimiter.RETRYABLE_ERRORS):
+            raise GeminiRateLimitError(
+                f"Gemini unavailable after retries: {last_error}", retry_after=RateLimiter.retry_after(last_error)
+            ) from last_error
+        return GeminiService.ERROR_MESSAGE
+
+    @staticmethod
+    async def _open_stream(model_name: str, prompt: str) -> Tuple:
+        """
+        Start a streamed generation and wait for its first chunk.
+
+        Throttled attempts are retried with backoff. On success the caller
+        owns a generation limiter slot and must release it with
+        GeminiClient.generation_limiter.release_async().
+
+        Returns:
+            Tuple of (response, chunk iterator, first chunk text)
+        """
+        limiter = GeminiClient.generation_limiter
+        model = GeminiService._get_structured_model(model_name)
+        attempt = 0
+        while True:
+            await limiter.acquire_async()
+            try:
+                response = await model.generate_content_async(prompt, stream=True)
+                chunks = response.__aiter__()
+                try:
+                    first = await chunks.__anext__()
+                    first_text = first.text
+                except StopAsyncIteration:
+                    first_text = ""
+                return response, chunks, first_text
+            except BaseException as e:
+                limiter.release_async()
+                if not isinstance(e, Exception) or not RateLimiter.is_retryable(e) or attempt >= limiter.max_retries:
+                    raise
+                delay = limiter.backoff_delay(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def hedge_delay() -> Optional[float]:
+        """
+        Seconds to wait for a first chunk before firing a hedged duplicate request.
+
+        Uses the observed p95 time to first chunk once enough samples exist,
+        otherwise gemini_hedge_after_seconds. None when hedging is disabled.
+        """
+        if not settings.gemini_hedge_enabled:
+            return None
+        samples = sorted(GeminiService._first_chunk_latencies)
+        if len(samples) < GeminiService.HEDGE_MIN_SAMPLES:
+            return settings.gemini_hedge_after_seconds
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    @staticmethod
+    async def _first_stream(model_name: str, prompt: str, timeout: float) -> Tuple:
+        """
+        Open a stream within `timeout`, hedging with a duplicate request if it is slow.
+
+        Whichever request produces a first chunk first wins; the other is
+        cancelled (or released, if it also finished).
+
+        Raises:
+            asyncio.TimeoutError: If no request produced a chunk in time
+            The last request error if every request failed
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        hedge_after = GeminiService.hedge_delay()
+        primary = asyncio.create_task(GeminiService._open_stream(model_name, prompt))
+        tasks = [primary]
+        hedged = False
+        error = None
+
         try:
-            genai.configure(api_key=settings.gemini_access_token)
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            prompt = GeminiService._format_conversation(messages)
-            response = model.generate_content(prompt)
-            return response.text
+            while tasks:
+                elapsed = loop.time() - started
+                if elapsed >= timeout:
+                    raise asyncio.TimeoutError(f"No response from {model_name} within {timeout}s")
 
-        except Exception as e:
-            import traceback
-            print(f"\nGemini API Error: {type(e).__name__} - {str(e)}")
-            traceback.print_exc()
+                wait_for = timeout - elapsed
+                if hedge_after is not None and not hedged:
+                    wait_for = max(0.0, min(wait_for, hedge_after - elapsed))
 
-            return (
-                "I apologize, but I'm having trouble processing your request right now. "
-                "Please try again! I'm here to help with movie recommendations."
-            )
+                done, _ = await asyncio.wait(tasks, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_after is not None and not hedged and loop.time() - started >= hedge_after:
+                        hedged = True
+                        GeminiService._stats["hedges"] += 1
+                        print(f"Hedging Gemini request to {model_name} after {hedge_after:.2f}s")
+                        tasks.append(asyncio.create_task(GeminiService._open_stream(model_name, prompt)))
+                    continue
+
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            GeminiService._stats["hedge_wins"] += 1
+                        GeminiService._first_chunk_latencies.append(loop.time() - started)
+                        return task.result()
+                    error = task.exception()
+
+            raise error
+
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    GeminiClient.generation_limiter.release_async()
+                else:
+                    task.cancel()
+
+    @staticmethod
+    async def stream_structured_response(messages: List[Dict]) -> AsyncIterator[str]:
+        """
+        Stream a structured AI response as it is generated.
+
+        Yields raw JSON text chunks matching RESPONSE_SCHEMA; feed them to a
+        RecommendationStreamParser to act on each movie as soon as it is
+        complete. Each model in settings.gemini_model_chain gets a deadline
+        of gemini_request_timeout_seconds; a model that fails or times out
+        before its first chunk is skipped for the next one, and a stream
+        that overruns the deadline is cut off with what it produced so far.
+        The chunks then end mid-object; RecommendationStreamParser.result()
+        keeps the message and movies that did complete and never returns
+        the partial JSON. A generation limiter slot is held for the whole stream.
+
+        If every model fails, yields the same apology text as
+        generate_response so callers fall back to a plain message.
+
+        Args:
+            messages: Full conversation history with role and content for each message
+
+        Yields:
+            Text chunks of the response
+
+        Raises:
+            GeminiRateLimitError: If Gemini is still throttling after all retries
+        """
+        loop = asyncio.get_running_loop()
+        prompt = GeminiService._format_conversation(messages)
+        timeout = settings.gemini_request_timeout_seconds
+        last_error = None
+
+        for index, model_name in enumerate(settings.gemini_model_chain):
+            deadline = loop.time() + timeout
+            try:
+                response, chunks, first_text = await GeminiService._first_stream(model_name, prompt, timeout)
+            except Exception as e:
+                print(f"\nGemini API Error ({model_name}): {type(e).__name__} - {str(e)}")
+                if isinstance(e, asyncio.TimeoutError):
+                    GeminiService._stats["deadline_exceeded"] += 1
+                last_error = e
+                continue
+
+            if index > 0:
+                GeminiService._stats["fallbacks"] += 1
+
+            try:
+                if first_text:
+                    yield first_text
+                while True:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                    if chunk.text:
+                        yield chunk.text
+            except StopAsyncIteration:
+                GeminiService._log_usage(response)
+            except asyncio.TimeoutError:
+                GeminiService._stats["deadline_exceeded"] += 1
+                print(f"Gemini stream from {model_name} exceeded {timeout}s, returning partial response")
+            except Exception as e:
+                print(f"\nGemini stream error ({model_name}): {type(e).__name__} - {str(e)}")
+            finally:
+                GeminiClient.generation_limiter.release_async()
+            return
+
+        if isinstance(last_error, RateLimiter.RETRYABLE_ERRORS):
+            raise GeminiRateLimitError(
+                f"Gemini unavailable after retries: {last_error}", retry_after=RateLimiter.retry_after(last_error)
+            ) from last_error
+        yield GeminiService.ERROR_MESSAGE
+
+    @staticmethod
+    def stats() -> Dict:
+        """Latency-control counters: hedges, fallbacks, deadlines and first-chunk latency."""
+        samples = sorted(GeminiService._first_chunk_latencies)
+        return {
+            **GeminiService._stats,
+            "first_chunk_p50_ms": samples[len(samples) // 2] * 1000 if samples else None,
+            "first_chunk_p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000 if samples else None,
+            "hedge_delay_s": GeminiService.hedge_delay()
+        }
 
     @staticmethod
     def generate_structured_response(messages: List[Dict]) -> Dict:
@@ -167,5 +429,37 @@ class GeminiService:
                 ]
             }
         """
-        response_text = GeminiService.generate_response(messages)
+        response_text = GeminiService.generate_response(messages, structured=True)
         return GeminiService.parse_structured_response(response_text)
+
+
+    @staticmethod
+    def summarize_conversation(messages: List[Dict], previous_summary: Optional[str] = None) -> Optional[str]:
+        """
+        Condense conversation messages into a short rolling summary.
+
+        Args:
+            messages: Messages to fold in, chronological, with role and content
+            previous_summary: Summary of everything before these messages, if any
+
+        Returns:
+            Updated summary text, or None if Gemini failed
+        """
+        lines = [GeminiService.SUMMARY_PROMPT]
+        if previous_summary:
+            lines.append(f"Summary so far: {previous_summary}")
+        lines.append("--- Messages to add ---")
+        for msg in messages:
+            speaker = "User" if msg.get("role") == "user" else "Assistant"
+            lines.append(f"{speaker}: {msg.get('content', '')}")
+
+        try:
+            response = GeminiClient.generation_limiter.call(
+                GeminiClient.get_model().generate_content,
+                "\n\n".join(lines),
+                request_options={"timeout": settings.gemini_request_timeout_seconds}
+            )
+            return response.text.strip()
+        except Exception as e:
+            print(f"Gemini summary error: {type(e).__name__} - {str(e)}")
+            return None
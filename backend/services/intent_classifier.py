@@ -0,0 +1,69 @@
+import re
+from typing import Dict
+
+
+class IntentClassifier:
+    """
+    Cheap local check for whether a chat message is worth a RAG lookup.
+
+    Only clear small talk ("hi", "thanks!", "ok cool"), made up entirely of
+    small-talk words, skips the query embedding and the vector scan. Anything
+    else retrieves, including short messages such as a bare title
+    ("Inception") or a name ("Tom Hanks").
+    """
+
+    SMALL_TALK = {
+        "hi", "hello", "hey", "yo", "hiya", "thanks", "thank", "you", "thx", "ty", "cheers",
+        "ok", "okay", "k", "cool", "nice", "great", "awesome", "perfect", "sure", "yes", "yeah",
+        "yep", "no", "nope", "nah", "bye", "goodbye", "good", "morning", "evening", "night",
+        "lol", "haha", "wow", "much", "so", "a", "lot", "again", "got", "it", "sounds", "that",
+    }
+
+    RETRIEVAL_KEYWORDS = {
+        "recommend", "recommendation", "recommendations", "suggest", "suggestion", "suggestions",
+        "movie", "movies", "film", "films", "watch", "watching", "similar", "like", "genre",
+        "actor", "actress", "director", "starring", "plot", "about", "more", "another", "other",
+        "action", "adventure", "animated", "animation", "comedy", "comedies", "crime", "documentary",
+        "drama", "dramas", "family", "fantasy", "horror", "mystery", "romance", "romantic",
+        "scifi", "sci", "fi", "thriller", "thrillers", "war", "western", "musical", "anime",
+    }
+
+    _stats = {"checked": 0, "skipped": 0}
+
+    @staticmethod
+    def needs_retrieval(message: str) -> bool:
+        """
+        Decide whether semantic movie retrieval is worth doing for a message.
+
+        Args:
+            message: The user's chat message
+
+        Returns:
+            False for small talk, True otherwise
+        """
+        words = re.findall(r"[a-z0-9]+", message.lower())
+        IntentClassifier._stats["checked"] += 1
+
+        if any(word in IntentClassifier.RETRIEVAL_KEYWORDS for word in words):
+            return True
+
+        needs = bool(words) and not all(word in IntentClassifier.SMALL_TALK for word in words)
+
+        if not needs:
+            IntentClassifier._stats["skipped"] += 1
+            stats = IntentClassifier.stats()
+            print(
+                f"Skipping retrieval for small talk ({stats['skipped']}/{stats['checked']} "
+                f"skipped, {stats['skip_rate']:.0%})"
+            )
+        return needs
+
+    @staticmethod
+    def stats() -> Dict:
+        checked = IntentClassifier._stats["checked"]
+        skipped = IntentClassifier._stats["skipped"]
+        return {
+            "checked": checked,
+            "skipped": skipped,
+            "skip_rate": skipped / checked if checked else 0.0
+        }
@@ -0,0 +1,102 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from services.conversation_service import ConversationService
+
+
+class MessageWriteQueue:
+    """
+    Write-behind buffer for chat messages.
+
+    The chat endpoint enqueues each turn and returns; flush() then writes
+    pending turns after the response is sent, one transaction per turn. A
+    turn that fails to write is retried by later flushes up to max_attempts
+    times, without holding up the turns queued behind it; a turn that can
+    never be written (an integrity error, e.g. its conversation was deleted)
+    is dropped at once. Dropped turns are kept in a small dead-letter buffer
+    for inspection. The app flushes on shutdown, so only a hard crash
+    between response and flush can lose a turn.
+    """
+
+    DEAD_LETTER_SIZE = 100
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, max_attempts: int = 3):
+        self.session_factory = session_factory
+        self.max_attempts = max_attempts
+        self._pending: Deque[Tuple[int, List[Dict], int]] = deque()
+        self._dead_letter: Deque[Tuple[int, List[Dict], str]] = deque(maxlen=self.DEAD_LETTER_SIZE)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._written = 0
+        self._failed = 0
+        self._dropped = 0
+
+    def enqueue(self, conversation_id: int, messages: List[Dict]) -> None:
+        """Queue one turn's messages for a later flush."""
+        with self._lock:
+            self._pending.append((conversation_id, messages, 0))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def dead_letter(self) -> List[Tuple[int, List[Dict], str]]:
+        """Dropped turns as (conversation_id, messages, error), oldest first."""
+        with self._lock:
+            return list(self._dead_letter)
+
+    def _drop(self, conversation_id: int, messages: List[Dict], error: Exception) -> None:
+        print(f"Dropping messages for conversation {conversation_id}: {error}")
+        with self._lock:
+            self._dead_letter.append((conversation_id, messages, str(error)))
+            self._dropped += 1
+
+    def flush(self) -> int:
+        """
+        Write all queued turns to the database.
+
+        Returns:
+            Number of turns written
+        """
+        written = 0
+        retry = []
+        with self._flush_lock:
+            db = self.session_factory()
+            try:
+                while True:
+                    with self._lock:
+                        if not self._pending:
+                            break
+                        conversation_id, messages, attempts = self._pending.popleft()
+                    try:
+                        ConversationService.add_messages(db, conversation_id, messages)
+                        written += 1
+                    except Exception as e:
+                        print(f"Error writing messages for conversation {conversation_id}: {e}")
+                        db.rollback()
+                        self._failed += 1
+                        attempts += 1
+                        if isinstance(e, IntegrityError) or attempts >= self.max_attempts:
+                            self._drop(conversation_id, messages, e)
+                        else:
+                            retry.append((conversation_id, messages, attempts))
+            finally:
+                db.close()
+                # Retry on the next flush, ahead of turns queued since
+                with self._lock:
+                    self._pending.extendleft(reversed(retry))
+        self._written += written
+        return written
+
+    def stats(self) -> Dict:
+        return {
+            "pending": self.pending(),
+            "written": self._written,
+            "failed": self._failed,
+            "dropped": self._dropped
+        }
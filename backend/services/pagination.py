@@ -0,0 +1,54 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Build an opaque keyset cursor from a row's sort timestamp and id.
+
+    The id breaks ties between rows written in the same microsecond.
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Parse a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def encode_key_cursor(sort_key: Any, row_id: int) -> str:
+    """
+    Build an opaque keyset cursor from a JSON-serializable sort key and a row id.
+
+    Used where pages can be sorted by keys other than a timestamp.
+    """
+    raw = json.dumps([sort_key, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_key_cursor(cursor: str) -> Tuple[Any, int]:
+    """
+    Parse a cursor produced by encode_key_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_key, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_key, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
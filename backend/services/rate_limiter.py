@@ -0,0 +1,198 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+
+class RateLimiter:
+    """
+    Token bucket plus bounded concurrency for calls to an external API.
+
+    Use `with limiter:` from sync code or `async with limiter:` from async
+    code; entering waits for a concurrency slot and a token, and the time
+    spent waiting is recorded. The bucket is shared by sync and async
+    callers, the concurrency bound applies to each of them separately.
+
+    The sync path sleeps the calling thread, so coroutines must only use
+    the async path (`async with limiter:` or call_async()).
+    """
+
+    RETRYABLE_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+    )
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_second: float,
+        burst: int,
+        max_concurrency: int,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0,
+    ):
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = asyncio.Semaphore(max_concurrency)
+
+        self._acquired = 0
+        self._retries = 0
+        self._throttled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    def _record_wait(self, waited: float) -> None:
+        with self._lock:
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    def __enter__(self):
+        started = time.monotonic()
+        self._sync_slots.acquire()
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+        self._record_wait(time.monotonic() - started)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._sync_slots.release()
+        return False
+
+    async def acquire_async(self) -> None:
+        """Wait for a concurrency slot and a token; pair with release_async()."""
+        started = time.monotonic()
+        await self._async_slots.acquire()
+        try:
+            delay = self._reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._async_slots.release()
+            raise
+        self._record_wait(time.monotonic() - started)
+
+    def release_async(self) -> None:
+        self._async_slots.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release_async()
+        return False
+
+    @staticmethod
+    def is_retryable(exc: Exception) -> bool:
+        return isinstance(exc, RateLimiter.RETRYABLE_ERRORS)
+
+    @staticmethod
+    def retry_after(exc: Exception) -> Optional[float]:
+        """Extract a server-provided retry delay (RetryInfo or Retry-After header), if any."""
+        for detail in getattr(exc, "details", None) or []:
+            delay = getattr(detail, "retry_delay", None)
+            if delay is not None:
+                return getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+            return float(value) if value is not None else None
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def backoff_delay(self, attempt: int, exc: Exception) -> float:
+        """
+        Delay before retry number `attempt` (0-based).
+
+        Honors the server's retry hint when present, otherwise uses full-range
+        jittered exponential backoff capped at backoff_max_seconds.
+        """
+        with self._lock:
+            self._retries += 1
+            if isinstance(exc, google_exceptions.ResourceExhausted):
+                self._throttled += 1
+
+        hinted = RateLimiter.retry_after(exc)
+        if hinted is not None:
+            return min(hinted, self.backoff_max_seconds)
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call `func` under the limiter, retrying retryable errors with backoff.
+
+        Raises:
+            The last error once retries are exhausted or for non-retryable errors
+        """
+        attempt = 0
+        while True:
+            try:
+                with self:
+                    return func(*args, **kwargs)
+            except Exception as e:
+                if not RateLimiter.is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                time.sleep(self.backoff_delay(attempt, e))
+                attempt += 1
+
+    async def call_async(self, func: Callable[..., Awaitable], *args, **kwargs):
+        """
+        Await `func` under the limiter, retrying retryable errors with backoff.
+
+        Waits with asyncio.sleep, so the event loop keeps serving other requests.
+
+        Raises:
+            The last error once retries are exhausted or for non-retryable errors
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self:
+                    return await func(*args, **kwargs)
+            except Exception as e:
+                if not RateLimiter.is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict:
+        """Counters for monitoring queue wait and throttling."""
+        with self._lock:
+            return {
+                "acquired": self._acquired,
+                "retries": self._retries,
+                "throttled": self._throttled,
+                "queue_wait_avg_ms": (self._wait_total / self._acquired * 1000) if self._acquired else 0.0,
+                "queue_wait_max_ms": self._wait_max * 1000
+            }
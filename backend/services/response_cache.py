@@ -0,0 +1,100 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class SemanticResponseCache:
+    """
+    In-process cache of chat responses keyed by query embedding.
+
+    A lookup returns the stored response of the most similar cached query
+    when its cosine similarity reaches the threshold. Entries expire after
+    ttl_seconds and the least recently used entry is evicted beyond
+    max_entries, so a scan stays bounded.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, Tuple[List[float], Dict, float]]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> Optional[List[float]]:
+        norm = math.sqrt(sum(x * x for x in vector))
+        if norm == 0:
+            return None
+        return [x / norm for x in vector]
+
+    def get(self, embedding: List[float]) -> Optional[Dict]:
+        """
+        Find a cached response for a semantically equivalent query.
+
+        Args:
+            embedding: Query embedding
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        query = self._normalize(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_score = None, -1.0
+            for key in list(self._entries):
+                vector, _, expires_at = self._entries[key]
+                if expires_at <= now:
+                    del self._entries[key]
+                    self._evictions += 1
+                    continue
+                if query is None:
+                    continue
+                score = sum(a * b for a, b in zip(query, vector))
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self._hits += 1
+                return self._entries[best_key][1]
+
+            self._misses += 1
+            return None
+
+    def put(self, embedding: List[float], response: Dict) -> None:
+        """Cache a response for a query embedding."""
+        vector = self._normalize(embedding)
+        if vector is None or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[self._next_key] = (vector, response, time.monotonic() + self.ttl_seconds)
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
+
+    def clear(self) -> None:
+        """Drop all entries and counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
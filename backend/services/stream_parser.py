@@ -0,0 +1,147 @@
+import json
+from typing import Dict, List
+
+from services.gemini_service import GeminiService
+
+
+class RecommendationStreamParser:
+    """
+    Incremental parser for streamed structured Gemini responses.
+
+    Feed it text chunks as they arrive; every time a `movies[i]` object of
+    the top-level response closes, feed() returns it, so enrichment can start
+    while the model is still writing the remaining movies.
+
+    A stream can end before the top-level object closes (deadline or
+    mid-stream error). result() then keeps the message and movies parsed so
+    far and never surfaces the raw partial JSON; `complete` tells callers
+    whether the response arrived whole.
+    """
+
+    # Shown when a truncated response had movies but no complete message
+    PARTIAL_MESSAGE = "Here are a few movies you might like."
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._after_colon = False
+        self._message = None
+        self._started = False
+        self._closed = False
+        self._in_movies = False
+        self._movie_start = None
+        self.movies: List[Dict] = []
+        self.complete = False
+
+    @property
+    def text(self) -> str:
+        """Everything received so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """
+        Consume a chunk of streamed text.
+
+        Args:
+            chunk: Next piece of the JSON response
+
+        Returns:
+            Movie objects completed by this chunk, in order
+        """
+        self._text += chunk
+        completed = []
+
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    # Remember keys of the top-level object to spot "movies",
+                    # and keep the message once its value string is complete
+                    if len(self._stack) == 1:
+                        value = json.loads(text[self._string_start:i + 1])
+                        if not self._after_colon:
+                            self._last_key = value
+                        elif self._last_key == "message":
+                            self._message = value
+                        self._after_colon = False
+                continue
+
+            if len(self._stack) == 1 and char in ":,":
+                self._after_colon = char == ":"
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                if not self._stack and char == "{":
+                    self._started = True
+                if len(self._stack) == 1:
+                    self._after_colon = False
+                if char == "[" and len(self._stack) == 1 and self._last_key == "movies":
+                    self._in_movies = True
+                elif char == "{" and self._in_movies and len(self._stack) == 2:
+                    self._movie_start = i
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                    if not self._stack and self._started:
+                        self._closed = True
+                if char == "}" and self._in_movies and len(self._stack) == 2 and self._movie_start is not None:
+                    movie = self._decode(text[self._movie_start:i + 1])
+                    if movie is not None:
+                        self.movies.append(movie)
+                        completed.append(movie)
+                    self._movie_start = None
+                elif char == "]" and self._in_movies and len(self._stack) == 1:
+                    self._in_movies = False
+
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str):
+        try:
+            movie = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        return movie if isinstance(movie, dict) else None
+
+    def result(self) -> Dict:
+        """
+        Parse the response once the stream has ended.
+
+        Returns:
+            Dict with 'message' and 'movies'; movies are the ones already
+            yielded by feed(), so callers never see a movie twice. If the
+            JSON object never closed, the message is the one parsed so far,
+            or a generic one (the error apology when nothing usable arrived).
+        """
+        if not self._started:
+            # Not JSON at all, e.g. the apology yielded when every model failed
+            parsed = GeminiService.parse_structured_response(self._text)
+        else:
+            parsed = self._decode(self._text) if self._closed else None
+            self.complete = parsed is not None
+            if parsed is None:
+                print(f"Structured response ended incomplete after {len(self._text)} chars, {len(self.movies)} movies")
+                if self._message:
+                    message = self._message
+                elif self.movies:
+                    message = RecommendationStreamParser.PARTIAL_MESSAGE
+                else:
+                    message = GeminiService.ERROR_MESSAGE
+                parsed = {"message": message}
+        parsed["movies"] = list(self.movies)
+        return parsed
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Conversation, ConversationMessage
+from services.context_builder import ContextBuilder
+from services.gemini_service import GeminiService
+
+
+class SummaryService:
+    """Rolling summaries that keep per-turn prompt size roughly constant."""
+
+    @staticmethod
+    def summarize_conversation(db: Session, conversation_id: int) -> Optional[str]:
+        """
+        Fold older unsummarized messages into the conversation summary.
+
+        The last chat_history_max_turns turns stay verbatim for the prompt;
+        anything older that is not yet summarized is condensed once at least
+        chat_summary_every_n_turns turns have piled up beyond that window.
+
+        Args:
+            db: Database session
+            conversation_id: Conversation to summarize
+
+        Returns:
+            The new summary, or None if nothing was summarized
+        """
+        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        if not conversation:
+            return None
+
+        keep_recent = settings.chat_history_max_turns * 2
+        fold_every = settings.chat_summary_every_n_turns * 2
+
+        query = db.query(ConversationMessage).filter(
+            ConversationMessage.conversation_id == conversation_id
+        )
+        if conversation.summary_through_id is not None:
+            query = query.filter(ConversationMessage.id > conversation.summary_through_id)
+        pending = query.order_by(ConversationMessage.id.asc()).all()
+
+        if fold_every <= 0 or len(pending) < keep_recent + fold_every:
+            return None
+
+        to_fold = pending[:len(pending) - keep_recent]
+        summary = GeminiService.summarize_conversation(
+            [
+                {
+                    "role": msg.role,
+                    "content": ContextBuilder.compact_content(
+                        msg.role, msg.content, ContextBuilder.movie_refs(msg.payload)
+                    )
+                }
+                for msg in to_fold
+            ],
+            previous_summary=conversation.summary
+        )
+        if not summary:
+            return None
+
+        conversation.summary = summary
+        conversation.summary_through_id = to_fold[-1].id
+        conversation.summary_updated_at = datetime.utcnow()
+        db.commit()
+
+        print(f"Summarized {len(to_fold)} messages of conversation {conversation_id}")
+        return summary
+
+    @staticmethod
+    def summarize_in_background(conversation_id: int) -> None:
+        """Background-task entry point: summarize with a dedicated session."""
+        db = SessionLocal()
+        try:
+            SummaryService.summarize_conversation(db, conversation_id)
+        except Exception as e:
+            print(f"Error summarizing conversation {conversation_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
@@ -1,11 +1,114 @@
+import asyncio
+import time
 import httpx
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Dict, Iterable, Optional, Tuple
 from config import settings
 
 
 class TMDBService:
     BASE_URL = "https://api.themoviedb.org/3"
     IMAGE_BASE_URL = "https://image.tmdb.org/t/p"
+    THRILLER_GENRE_ID = 53
+
+    # Per-movie responses (details, videos, similar) cached for a short TTL.
+    # Concurrent requests for the same key share one in-flight fetch, so an
+    # enrichment that starts while a prefetch is running waits for it instead
+    # of calling TMDB again.
+    _cache: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+    _inflight: Dict[Tuple, asyncio.Task] = {}
+    _stats = {"hits": 0, "misses": 0, "prefetched": 0, "prefetch_used": 0}
+
+    @staticmethod
+    async def _cached(key: Tuple, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return a cached TMDB response, fetching it once on a miss.
+
+        Failed fetches are not cached.
+        """
+        now = time.monotonic()
+        entry = TMDBService._cache.get(key)
+        if entry is not None and entry[1] > now:
+            TMDBService._cache.move_to_end(key)
+            TMDBService._stats["hits"] += 1
+            return entry[0]
+
+        task = TMDBService._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            TMDBService._stats["hits"] += 1
+        else:
+            TMDBService._stats["misses"] += 1
+            task = asyncio.ensure_future(fetch())
+            TMDBService._inflight[key] = task
+            task.add_done_callback(lambda done: TMDBService._store(key, done))
+
+        # Shield so a cancelled prefetch doesn't cancel a fetch others await
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _store(key: Tuple, task: asyncio.Task) -> None:
+        if TMDBService._inflight.get(key) is task:
+            del TMDBService._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        TMDBService._cache[key] = (task.result(), time.monotonic() + settings.tmdb_cache_ttl_seconds)
+        TMDBService._cache.move_to_end(key)
+        while len(TMDBService._cache) > settings.tmdb_cache_max_entries:
+            TMDBService._cache.popitem(last=False)
+
+    @staticmethod
+    def clear_cache() -> None:
+        TMDBService._cache.clear()
+        TMDBService._inflight.clear()
+        for name in TMDBService._stats:
+            TMDBService._stats[name] = 0
+
+    @staticmethod
+    def prefetch(movie_ids: Iterable[int], skip_similar: Iterable[int] = ()) -> List[asyncio.Task]:
+        """
+        Warm the cache with everything enrichment needs for each movie.
+
+        Runs in the background while Gemini generates, so enriching the
+        RAG candidates it recommends is mostly cache hits.
+
+        Args:
+            movie_ids: TMDB IDs likely to be recommended
+            skip_similar: IDs whose similar movies enrichment won't need,
+                e.g. because they come from the local neighbor table
+
+        Returns:
+            The prefetch tasks; cancel them once they are no longer useful
+        """
+        skip_similar = set(skip_similar)
+
+        async def warm(movie_id: int) -> None:
+            fetches = [TMDBService.get_movie_details(movie_id), TMDBService.get_movie_videos(movie_id)]
+            if movie_id not in skip_similar:
+                fetches.append(TMDBService.get_similar_movies(movie_id))
+            try:
+                await asyncio.gather(*fetches)
+            except Exception as e:
+                print(f"Error prefetching TMDB data for movie {movie_id}: {e}")
+
+        movie_ids = list(dict.fromkeys(movie_id for movie_id in movie_ids if movie_id))
+        TMDBService._stats["prefetched"] += len(movie_ids)
+        return [asyncio.create_task(warm(movie_id)) for movie_id in movie_ids]
+
+    @staticmethod
+    def record_prefetch_usage(prefetched_ids: Iterable[int], used_ids: Iterable[int]) -> None:
+        """Count how many prefetched movies ended up in the response."""
+        TMDBService._stats["prefetch_used"] += len(set(prefetched_ids) & set(used_ids))
+
+    @staticmethod
+    def stats() -> Dict:
+        stats = TMDBService._stats
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "cache_size": len(TMDBService._cache),
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "prefetch_use_rate": stats["prefetch_used"] / stats["prefetched"] if stats["prefetched"] else 0.0
+        }
 
     @staticmethod
     def _get_headers() -> dict:
@@ -60,25 +163,31 @@ class TMDBService:
 
     @staticmethod
     async def get_movie_details(movie_id: int) -> Dict:
-        async with httpx.AsyncClient(timeout=None) as client:
-            response = await client.get(
-                f"{TMDBService.BASE_URL}/movie/{movie_id}",
-                headers=TMDBService._get_headers(),
-                params={"language": "en-US"}
-            )
-            response.raise_for_status()
-            return response.json()
+        async def fetch() -> Dict:
+            async with httpx.AsyncClient(timeout=None) as client:
+                response = await client.get(
+                    f"{TMDBService.BASE_URL}/movie/{movie_id}",
+                    headers=TMDBService._get_headers(),
+                    params={"language": "en-US"}
+                )
+                response.raise_for_status()
+                return response.json()
+
+        return await TMDBService._cached(("details", movie_id), fetch)
 
     @staticmethod
     async def get_similar_movies(movie_id: int, page: int = 1) -> Dict:
-        async with httpx.AsyncClient(timeout=None) as client:
-            response = await client.get(
-                f"{TMDBService.BASE_URL}/movie/{movie_id}/similar",
-                headers=TMDBService._get_headers(),
-                params={"language": "en-US", "page": page}
-            )
-            response.raise_for_status()
-            return response.json()
+        async def fetch() -> Dict:
+            async with httpx.AsyncClient(timeout=None) as client:
+                response = await client.get(
+                    f"{TMDBService.BASE_URL}/movie/{movie_id}/similar",
+                    headers=TMDBService._get_headers(),
+                    params={"language": "en-US", "page": page}
+                )
+                response.raise_for_status()
+                return response.json()
+
+        return await TMDBService._cached(("similar", movie_id, page), fetch)
 
     @staticmethod
     async def get_movie_recommendations(movie_id: int, page: int = 1) -> Dict:
@@ -169,7 +278,7 @@ class TMDBService:
         Returns:
             List of thriller movie dictionaries with id, title, and other TMDB fields
         """
-        THRILLER_GENRE_ID = 53
+        THRILLER_GENRE_ID = TMDBService.THRILLER_GENRE_ID
 
         try:
             if movie_id:
@@ -231,7 +340,7 @@ class TMDBService:
         Returns:
             YouTube video key (e.g., "dQw4w9WgXcQ") or None if not found
         """
-        try:
+        async def fetch() -> Optional[str]:
             async with httpx.AsyncClient(timeout=None) as client:
                 response = await client.get(
                     f"{TMDBService.BASE_URL}/movie/{movie_id}/videos",
@@ -253,6 +362,9 @@ class TMDBService:
                         return video.get("key")
 
                 return None
+
+        try:
+            return await TMDBService._cached(("videos", movie_id), fetch)
         except Exception as e:
             print(f"Error fetching movie videos: {e}")
-            return None
\ No newline at end of file
+            return None
@@ -1,136 +1,396 @@
-from typing import List
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import Boolean, Integer, column, delete, func, literal_column, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from models import Watchlist, WatchlistItem, User
-from schemas import WatchlistItemCreate
+from schemas import WatchlistBulkOperation, WatchlistItemCreate
+from services.pagination import decode_key_cursor, encode_key_cursor
+
+# Sort key expression and whether it sorts descending; each is backed by a
+# (watchlist_id, key, id) index on watchlist_items
+SORTS = {
+    "added": (WatchlistItem.created_at, True),
+    "rating": (func.coalesce(WatchlistItem.rating, 0), True),
+    "title": (WatchlistItem.movie_title, False),
+}
 
 
 class WatchlistService:
     """CRUD helpers for watchlists and items."""
 
+    # Process-local map of user id -> default watchlist id. A user's default
+    # watchlist is the oldest one and never changes once it is committed.
+    _default_ids: Dict[int, int] = {}
+
+    @staticmethod
+    def clear_cache() -> None:
+        WatchlistService._default_ids.clear()
+
+    @staticmethod
+    def _find_default_watchlist_id(db: Session, user_id: int) -> Optional[int]:
+        return db.query(Watchlist.id).filter(
+            Watchlist.user_id == user_id
+        ).order_by(Watchlist.created_at.asc(), Watchlist.id.asc()).limit(1).scalar()
+
     @staticmethod
-    def _get_default_watchlist(db: Session, user: User) -> Watchlist:
+    def _default_watchlist_id(db: Session, user: User, create: bool = True) -> Optional[int]:
         """
-        Get or create the default watchlist for a user.
+        Resolve the id of the user's default watchlist, creating it if needed.
+
+        Read paths pass create=False and get None when the user has no
+        watchlist yet.
 
-        This method handles race conditions by using SELECT FOR UPDATE
-        and proper exception handling to ensure thread-safety.
+        Ids found in the database are cached for the life of the process, so
+        most calls issue no query. A newly created watchlist is only flushed:
+        it is committed together with the caller's write, and cached by the
+        next call that finds it committed.
         """
-        # Try to get existing watchlist with lock to prevent race conditions
-        watchlist = (
-            db.query(Watchlist)
-            .filter(Watchlist.user_id == user.id)
-            .order_by(Watchlist.created_at.asc())
-            .first()
-        )
-        if watchlist:
-            return watchlist
+        watchlist_id = WatchlistService._default_ids.get(user.id)
+        if watchlist_id is not None:
+            return watchlist_id
 
-        # Create new watchlist if doesn't exist
-        # Handle potential race condition where another request created it
+        watchlist_id = WatchlistService._find_default_watchlist_id(db, user.id)
+        if watchlist_id is not None:
+            WatchlistService._default_ids[user.id] = watchlist_id
+            return watchlist_id
+        if not create:
+            return None
+
+        # Create new watchlist if doesn't exist, inside a savepoint so a
+        # failure does not discard the caller's pending work
         try:
-            watchlist = Watchlist(user_id=user.id, title="My Watchlist")
-            db.add(watchlist)
-            db.commit()
-            db.refresh(watchlist)
-            return watchlist
+            with db.begin_nested():
+                watchlist = Watchlist(user_id=user.id, title="My Watchlist")
+                db.add(watchlist)
+            return watchlist.id
         except IntegrityError:
-            # Another request created the watchlist, rollback and fetch it
-            db.rollback()
-            watchlist = (
-                db.query(Watchlist)
-                .filter(Watchlist.user_id == user.id)
-                .order_by(Watchlist.created_at.asc())
-                .first()
-            )
-            if watchlist:
-                return watchlist
-            # If still not found, re-raise the error
+            watchlist_id = WatchlistService._find_default_watchlist_id(db, user.id)
+            if watchlist_id is not None:
+                return watchlist_id
             raise
 
     @staticmethod
-    def list_items(db: Session, user: User) -> List[WatchlistItem]:
-        watchlist = WatchlistService._get_default_watchlist(db, user)
-        return watchlist.items
+    def _bump_version(db: Session, watchlist_id: int) -> None:
+        """Mark the watchlist as changed so cached listings are revalidated."""
+        db.execute(
+            update(Watchlist)
+            .where(Watchlist.id == watchlist_id)
+            .values(version=Watchlist.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def etag(db: Session, user: User) -> str:
+        """
+        Entity tag of the user's watchlist, derived from its version counter.
+
+        A primary-key lookup of one column, so conditional requests can be
+        answered without loading any items.
+        """
+        watchlist_id = WatchlistService._default_watchlist_id(db, user, create=False)
+        if watchlist_id is None:
+            return '"0-0"'
+        version = db.query(Watchlist.version).filter(Watchlist.id == watchlist_id).scalar()
+        return f'"{watchlist_id}-{version or 0}"'
+
+    @staticmethod
+    def list_items(
+        db: Session,
+        user: User,
+        watched: Optional[bool] = None,
+        min_rating: Optional[int] = None,
+        max_rating: Optional[int] = None,
+        sort: str = "added",
+        limit: Optional[int] = None,
+        cursor: Optional[Tuple[Any, int]] = None,
+    ) -> List[WatchlistItem]:
+        """
+        List the items of the user's default watchlist.
+
+        Args:
+            watched: Only watched (True) or unwatched (False) items
+            min_rating: Only items rated at least this
+            max_rating: Only items rated at most this
+            sort: "added" (newest first), "rating" (highest first, unrated
+                last) or "title" (A to Z); ties are broken by item id
+            limit: Page size; None returns every matching item
+            cursor: Decoded cursor of the last item of the previous page
+
+        Raises:
+            ValueError: If the sort key is unknown
+        """
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort '{sort}'")
+        sort_key, descending = SORTS[sort]
+
+        watchlist_id = WatchlistService._default_watchlist_id(db, user, create=False)
+        if watchlist_id is None:
+            return []
+        query = db.query(WatchlistItem).filter(WatchlistItem.watchlist_id == watchlist_id)
+        if watched is not None:
+            query = query.filter(WatchlistItem.watched == watched)
+        if min_rating is not None:
+            query = query.filter(WatchlistItem.rating >= min_rating)
+        if max_rating is not None:
+            query = query.filter(WatchlistItem.rating <= max_rating)
+
+        if cursor is not None:
+            position = tuple_(sort_key, WatchlistItem.id)
+            bound = tuple_(*cursor)
+            query = query.filter(position < bound if descending else position > bound)
+
+        if descending:
+            query = query.order_by(sort_key.desc(), WatchlistItem.id.desc())
+        else:
+            query = query.order_by(sort_key.asc(), WatchlistItem.id.asc())
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    @staticmethod
+    def encode_cursor(item: WatchlistItem, sort: str) -> str:
+        """Cursor pointing after `item` in a listing sorted by `sort`."""
+        if sort == "added":
+            sort_key = item.created_at.isoformat()
+        elif sort == "rating":
+            sort_key = item.rating or 0
+        else:
+            sort_key = item.movie_title
+        return encode_key_cursor(sort_key, item.id)
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+        """
+        Parse a cursor produced by encode_cursor for the same sort.
+
+        Raises:
+            ValueError: If the cursor is malformed or was built for another sort
+        """
+        sort_key, row_id = decode_key_cursor(cursor)
+        try:
+            if sort == "added":
+                return datetime.fromisoformat(sort_key), row_id
+            if sort == "rating" and isinstance(sort_key, int):
+                return sort_key, row_id
+            if sort == "title" and isinstance(sort_key, str):
+                return sort_key, row_id
+        except (TypeError, ValueError):
+            pass
+        raise ValueError("Invalid cursor")
+
+    @staticmethod
+    def _upsert_stmt(rows: List[Dict[str, Any]]):
+        """
+        INSERT ... ON CONFLICT that returns (item, inserted) for each row: the
+        new or already stored item, and whether the row is new. xmax is 0
+        only for rows this statement inserted.
+        """
+        stmt = insert(WatchlistItem).values(rows)
+        return stmt.on_conflict_do_update(
+            constraint="uq_watchlist_movie",
+            set_={"movie_id": stmt.excluded.movie_id},
+        ).returning(WatchlistItem, literal_column("xmax = 0").label("inserted"))
 
     @staticmethod
     def add_item(db: Session, user: User, payload: WatchlistItemCreate) -> WatchlistItem:
-        watchlist = WatchlistService._get_default_watchlist(db, user)
+        """
+        Add a movie to the user's default watchlist, or return it if already there.
 
-        existing = (
-            db.query(WatchlistItem)
-            .filter(
-                WatchlistItem.watchlist_id == watchlist.id,
-                WatchlistItem.movie_id == payload.movie_id,
-            )
-            .first()
-        )
-        if existing:
-            return existing
-
-        item = WatchlistItem(
-            watchlist_id=watchlist.id,
-            movie_id=payload.movie_id,
-            movie_title=payload.movie_title,
-            poster_path=payload.poster_path,
-            notes=payload.notes,
-        )
-        db.add(item)
+        A single INSERT ... ON CONFLICT DO UPDATE ... RETURNING. The update is a
+        no-op so that RETURNING yields the existing row on conflict, which keeps
+        concurrent adds of the same movie race-free. Re-adding a movie leaves
+        the watchlist version, and so its ETag, unchanged.
+        """
+        watchlist_id = WatchlistService._default_watchlist_id(db, user)
+        item, inserted = db.execute(WatchlistService._upsert_stmt([{
+            "watchlist_id": watchlist_id,
+            "movie_id": payload.movie_id,
+            "movie_title": payload.movie_title,
+            "poster_path": payload.poster_path,
+            "notes": payload.notes,
+        }])).one()
+        if inserted:
+            WatchlistService._bump_version(db, watchlist_id)
         db.commit()
-        db.refresh(item)
         return item
 
     @staticmethod
     def delete_item(db: Session, user: User, item_id: int) -> bool:
-        watchlist = WatchlistService._get_default_watchlist(db, user)
-        item = (
-            db.query(WatchlistItem)
-            .filter(
-                WatchlistItem.watchlist_id == watchlist.id,
-                WatchlistItem.id == item_id,
-            )
-            .first()
-        )
-        if not item:
-            return False
-        db.delete(item)
+        watchlist_id = WatchlistService._default_watchlist_id(db, user)
+        deleted = db.execute(
+            delete(WatchlistItem)
+            .where(WatchlistItem.watchlist_id == watchlist_id, WatchlistItem.id == item_id)
+            .returning(WatchlistItem.id)
+        ).first()
+        if deleted is not None:
+            WatchlistService._bump_version(db, watchlist_id)
         db.commit()
-        return True
+        return deleted is not None
 
     @staticmethod
-    def update_rating(db: Session, user: User, item_id: int, rating: int) -> WatchlistItem:
-        watchlist = WatchlistService._get_default_watchlist(db, user)
-        item = (
-            db.query(WatchlistItem)
-            .filter(
-                WatchlistItem.watchlist_id == watchlist.id,
-                WatchlistItem.id == item_id,
-            )
-            .first()
-        )
+    def _update_item(db: Session, user: User, item_id: int, **values) -> WatchlistItem:
+        """Apply values to one item with a single UPDATE ... RETURNING."""
+        watchlist_id = WatchlistService._default_watchlist_id(db, user)
+        item = db.scalars(
+            update(WatchlistItem)
+            .where(WatchlistItem.watchlist_id == watchlist_id, WatchlistItem.id == item_id)
+            .values(**values)
+            .returning(WatchlistItem)
+        ).first()
+        if item is not None:
+            WatchlistService._bump_version(db, watchlist_id)
+        db.commit()
         if not item:
             raise ValueError("Watchlist item not found")
-        item.rating = rating
-        db.commit()
-        db.refresh(item)
         return item
 
+    @staticmethod
+    def update_rating(db: Session, user: User, item_id: int, rating: int) -> WatchlistItem:
+        return WatchlistService._update_item(db, user, item_id, rating=rating)
+
     @staticmethod
     def toggle_watched(db: Session, user: User, item_id: int, watched: bool) -> WatchlistItem:
-        watchlist = WatchlistService._get_default_watchlist(db, user)
-        item = (
-            db.query(WatchlistItem)
-            .filter(
-                WatchlistItem.watchlist_id == watchlist.id,
-                WatchlistItem.id == item_id,
-            )
-            .first()
+        return WatchlistService._update_item(db, user, item_id, watched=watched)
+
+    @staticmethod
+    def _bulk_update(db: Session, watchlist_id: int, field: str, column_type, changes: Dict[int, Any]) -> Dict[int, WatchlistItem]:
+        """Set one field for many movies with a single UPDATE ... FROM (VALUES ...) RETURNING."""
+        if not changes:
+            return {}
+        rows = values(
+            column("movie_id", Integer), column(field, column_type), name="changes"
+        ).data(list(changes.items()))
+        stmt = (
+            update(WatchlistItem)
+            .where(WatchlistItem.watchlist_id == watchlist_id, WatchlistItem.movie_id == rows.c.movie_id)
+            .values({field: rows.c[field]})
+            .returning(WatchlistItem)
+            .execution_options(synchronize_session=False, populate_existing=True)
         )
-        if not item:
-            raise ValueError("Watchlist item not found")
-        item.watched = watched
+        return {item.movie_id: item for item in db.scalars(stmt)}
+
+    @staticmethod
+    def bulk_apply(db: Session, user: User, operations: List[WatchlistBulkOperation]) -> List[Dict[str, Any]]:
+        """
+        Apply a batch of watchlist operations in one transaction.
+
+        Each movie's operations are folded in request order into its final
+        state, so e.g. [remove 42, add 42] leaves movie 42 on the list as a
+        fresh item. The batch then runs as at most one statement per kind of
+        change: a DELETE, an INSERT and one UPDATE per changed field.
+
+        Returns:
+            One result per operation, in request order, with the item's state
+            after the whole batch (None if it was removed or never existed)
+
+        Raises:
+            ValueError: If an operation lacks the field its kind requires
+        """
+        for operation in operations:
+            if operation.op == "add" and not operation.movie_title:
+                raise ValueError(f"movie_title is required to add movie {operation.movie_id}")
+            if operation.op == "rate" and operation.rating is None:
+                raise ValueError(f"rating is required to rate movie {operation.movie_id}")
+            if operation.op == "watched" and operation.watched is None:
+                raise ValueError(f"watched is required to mark movie {operation.movie_id}")
+
+        watchlist_id = WatchlistService._default_watchlist_id(db, user)
+        movie_ids = {operation.movie_id for operation in operations}
+        # Locked so a concurrent request can't change them between the fold and the writes
+        existing: Dict[int, WatchlistItem] = {
+            item.movie_id: item
+            for item in db.scalars(
+                select(WatchlistItem)
+                .where(WatchlistItem.watchlist_id == watchlist_id, WatchlistItem.movie_id.in_(movie_ids))
+                .with_for_update()
+            )
+        }
+
+        # Stored items to delete, items to insert, and field updates of stored items
+        present = {movie_id: movie_id in existing for movie_id in movie_ids}
+        removes = set()
+        new_rows: Dict[int, Dict[str, Any]] = {}
+        ratings: Dict[int, int] = {}
+        watched: Dict[int, bool] = {}
+        statuses = []
+        for operation in operations:
+            movie_id = operation.movie_id
+            if operation.op == "add":
+                if not present[movie_id]:
+                    present[movie_id] = True
+                    new_rows[movie_id] = {
+                        "movie_id": movie_id,
+                        "movie_title": operation.movie_title,
+                        "poster_path": operation.poster_path,
+                        "notes": operation.notes,
+                        "rating": None,
+                        "watched": False,
+                    }
+                statuses.append("ok")
+            elif not present[movie_id]:
+                statuses.append("not_found")
+            elif operation.op == "remove":
+                present[movie_id] = False
+                if new_rows.pop(movie_id, None) is None:
+                    removes.add(movie_id)
+                ratings.pop(movie_id, None)
+                watched.pop(movie_id, None)
+                statuses.append("ok")
+            elif operation.op == "rate":
+                if movie_id in new_rows:
+                    new_rows[movie_id]["rating"] = operation.rating
+                else:
+                    ratings[movie_id] = operation.rating
+                statuses.append("ok")
+            else:
+                if movie_id in new_rows:
+                    new_rows[movie_id]["watched"] = operation.watched
+                else:
+                    watched[movie_id] = operation.watched
+                statuses.append("ok")
+
+        items: Dict[int, Optional[WatchlistItem]] = {
+            movie_id: item for movie_id, item in existing.items() if movie_id not in removes
+        }
+
+        if removes:
+            db.execute(
+                delete(WatchlistItem)
+                .where(WatchlistItem.watchlist_id == watchlist_id, WatchlistItem.movie_id.in_(removes))
+                .execution_options(synchronize_session=False)
+            )
+
+        inserted = 0
+        if new_rows:
+            rows = [{"watchlist_id": watchlist_id, **row} for row in new_rows.values()]
+            stmt = WatchlistService._upsert_stmt(rows).execution_options(populate_existing=True)
+            for item, is_new in db.execute(stmt):
+                items[item.movie_id] = item
+                inserted += is_new
+
+        rated = WatchlistService._bulk_update(db, watchlist_id, "rating", Integer, ratings)
+        items.update(rated)
+        marked = WatchlistService._bulk_update(db, watchlist_id, "watched", Boolean, watched)
+        items.update(marked)
+
+        if removes or inserted or rated or marked:
+            WatchlistService._bump_version(db, watchlist_id)
         db.commit()
-        db.refresh(item)
-        return item
+
+        print(
+            f"Bulk watchlist update for user {user.id}: {inserted} added, {len(rated)} rated, "
+            f"{len(marked)} marked, {len(removes)} removed"
+        )
+        return [
+            {
+                "op": operation.op,
+                "movie_id": operation.movie_id,
+                "status": status,
+                "item": items.get(operation.movie_id) if present[operation.movie_id] else None,
+            }
+            for operation, status in zip(operations, statuses)
+        ]
@@ -17,7 +17,7 @@ from database import Base, get_db
 from main import app
 from models import Conversation, ConversationMessage, Movie, MovieEmbedding, User
 from config import settings
-from services import AuthService
+from services import AuthService, GeminiClient, TMDBService, WatchlistService
 
 
 # Use PostgreSQL test database (same as dev but different name)
@@ -47,6 +47,18 @@ def test_db():
         Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def reset_gemini_client():
+    """Drop cached Gemini configuration, TMDB responses and watchlist ids so each test starts clean."""
+    GeminiClient.reset()
+    TMDBService.clear_cache()
+    WatchlistService.clear_cache()
+    yield
+    GeminiClient.reset()
+    TMDBService.clear_cache()
+    WatchlistService.clear_cache()
+
+
 @pytest.fixture(scope="function")
 def client(test_db):
     """
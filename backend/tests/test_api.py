@@ -4,10 +4,14 @@ Integration coverage for FastAPI endpoints.
 Exercises conversation, chat, TMDB proxy, and semantic-search endpoints.
 """
 
+import asyncio
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
+from config import settings
+from services import ConversationService
+
 
 @pytest.mark.integration
 class TestHealthEndpoints:
@@ -21,6 +25,12 @@ class TestHealthEndpoints:
         assert response.status_code == 200
         assert "timestamp" in response.json()
 
+    def test_metrics(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "hit_rate" in response.json()["response_cache"]
+        assert "missing" in response.json()["message_partitions"]
+
 
 @pytest.mark.integration
 class TestConversationEndpoints:
@@ -45,26 +55,182 @@ class TestConversationEndpoints:
         response = client.delete(f"/conversations/{sample_conversation.id}")
         assert response.status_code == 204
 
+    def test_delete_all_for_user(self, client):
+        client.post("/conversations?user_id=leaver")
+        client.post("/conversations?user_id=leaver")
+        response = client.delete("/conversations/user/leaver")
+        assert response.status_code == 204
+        assert client.get("/conversations/user/leaver").json() == []
+
+    def test_large_delete_runs_in_background(self, client, test_db, sample_conversation, sample_messages):
+        with patch("main.settings.conversation_delete_async_threshold", 1), \
+                patch("main.ConversationService.purge_in_background") as purge:
+            ConversationService.add_messages(test_db, sample_conversation.id, [
+                {"role": "user", "content": "one"}, {"role": "assistant", "content": "two"}
+            ])
+            response = client.delete(f"/conversations/{sample_conversation.id}")
+
+        assert response.status_code == 202
+        purge.assert_called_once_with([sample_conversation.id], 5000)
+        assert client.get(f"/conversations/{sample_conversation.id}").status_code == 404
+
     def test_messages(self, client, sample_conversation, sample_messages):
         response = client.get(f"/conversations/{sample_conversation.id}/messages")
         assert response.status_code == 200
         assert len(response.json()) == len(sample_messages)
 
+    def test_conversation_list_pages(self, client):
+        created = [client.post("/conversations?user_id=pager").json()["id"] for _ in range(3)]
+
+        first = client.get("/conversations/user/pager?limit=2")
+        assert [c["id"] for c in first.json()] == created[::-1][:2]
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = client.get(f"/conversations/user/pager?limit=2&before={cursor}")
+        assert [c["id"] for c in second.json()] == [created[0]]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_messages_latest_then_older(self, client, sample_conversation, sample_messages):
+        latest = client.get(f"/conversations/{sample_conversation.id}/messages?limit=1")
+        assert [m["id"] for m in latest.json()] == [sample_messages[1].id]
+
+        cursor = latest.headers["X-Next-Cursor"]
+        older = client.get(f"/conversations/{sample_conversation.id}/messages?limit=1&before={cursor}")
+        assert [m["id"] for m in older.json()] == [sample_messages[0].id]
+
+        newer = client.get(f"/conversations/{sample_conversation.id}/messages?after={older.headers['X-Next-Cursor']}")
+        assert [m["id"] for m in newer.json()] == [sample_messages[1].id]
+
+    def test_conversation_summaries(self, client, test_db, sample_conversation):
+        ConversationService.add_message(test_db, sample_conversation.id, "user", "Any heist movies?")
+        response = client.get(f"/conversations/user/{sample_conversation.user_id}/summary")
+        assert response.status_code == 200
+        summary = response.json()[0]
+        assert summary["message_count"] == 1
+        assert summary["last_message_preview"] == "Any heist movies?"
+
+    def test_messages_rejects_bad_cursor(self, client, sample_conversation):
+        response = client.get(f"/conversations/{sample_conversation.id}/messages?before=nope")
+        assert response.status_code == 400
+
+
+class FakeGeminiStream:
+    """Async iterable standing in for a streamed Gemini response."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.usage_metadata = None
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield Mock(text=chunk)
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+class StallingGeminiStream(FakeGeminiStream):
+    """Streamed response that stops producing chunks, so the deadline cuts it off."""
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield Mock(text=chunk)
+        await asyncio.sleep(60)
+
 
 @pytest.mark.integration
 class TestChatEndpoint:
-    @patch("services.gemini_service.genai")
+    @patch("services.gemini_client.genai")
     @patch("services.embedding_service.genai")
     def test_chat_flow(self, mock_embed_genai, mock_gemini_genai, client):
         mock_model = Mock()
-        mock_model.generate_content.return_value = Mock(text="AI reply")
+        mock_model.generate_content_async = AsyncMock(
+            return_value=FakeGeminiStream(['{"message": "AI ', 'reply", "movies": []}'])
+        )
         mock_gemini_genai.GenerativeModel.return_value = mock_model
-        mock_embed_genai.embed_content.return_value = {"embedding": [0.1] * 768}
+        mock_embed_genai.embed_content_async = AsyncMock(return_value={"embedding": [0.1] * 768})
 
         payload = {"user_id": "chat_user", "message": "Suggest a movie", "conversation_id": None}
         response = client.post("/chat", json=payload)
         assert response.status_code == 200
-        assert "response" in response.json()
+        assert response.json()["message"] == "AI reply"
+
+    @patch("main._enrich_movie", new_callable=AsyncMock)
+    @patch("services.gemini_client.genai")
+    @patch("services.embedding_service.genai")
+    def test_chat_enriches_streamed_movies(self, mock_embed_genai, mock_gemini_genai, mock_enrich, client):
+        chunks = [
+            '{"message": "Twisty picks", "movies": [{"id": 550, "title": "Fight Club", "reason": "Twists"}',
+            ', {"id": 680, "title": "Pulp Fiction", "reason": "Cult"}]}',
+        ]
+        mock_model = Mock()
+        mock_model.generate_content_async = AsyncMock(return_value=FakeGeminiStream(chunks))
+        mock_gemini_genai.GenerativeModel.return_value = mock_model
+        mock_embed_genai.embed_content_async = AsyncMock(return_value={"embedding": [0.1] * 768})
+        mock_enrich.side_effect = lambda db, movie: {**movie, "overview": "enriched"}
+
+        payload = {"user_id": "chat_user", "message": "Suggest twisty movies", "conversation_id": None}
+        response = client.post("/chat", json=payload)
+
+        assert response.status_code == 200
+        movies = response.json()["movies"]
+        assert [movie["id"] for movie in movies] == [550, 680]
+        assert movies[0]["overview"] == "enriched"
+
+        history = client.get(f"/conversations/{response.json()['conversation_id']}/messages").json()
+        assert history[-1]["content"] == "Twisty picks"
+        assert [movie["id"] for movie in history[-1]["payload"]["movies"]] == [550, 680]
+
+    @patch("services.gemini_client.genai")
+    @patch("services.embedding_service.genai")
+    def test_response_cache_skips_incomplete_responses(self, mock_embed_genai, mock_gemini_genai, client):
+        import main
+
+        mock_model = Mock()
+        mock_model.generate_content_async = AsyncMock(side_effect=[
+            FakeGeminiStream(['{"message": "Cut off', ' mid-sentence']),
+            FakeGeminiStream(['{"message": "Try Heat", "movies": []}']),
+        ])
+        mock_gemini_genai.GenerativeModel.return_value = mock_model
+        mock_embed_genai.embed_content_async = AsyncMock(return_value={"embedding": [0.1] * 768})
+        main.response_cache.clear()
+
+        payload = {"user_id": "cache_user", "message": "Suggest a heist movie", "conversation_id": None}
+        with patch.object(settings, "chat_response_cache_enabled", True):
+            truncated = client.post("/chat", json=payload)
+            assert main.response_cache.stats()["size"] == 0
+            complete = client.post("/chat", json=payload)
+
+        assert truncated.json()["message"] != '{"message": "Cut off mid-sentence'
+        assert complete.json()["message"] == "Try Heat"
+        assert main.response_cache.stats()["size"] == 1
+        main.response_cache.clear()
+
+    @patch("main._enrich_movie", new_callable=AsyncMock)
+    @patch("services.gemini_client.genai")
+    @patch("services.embedding_service.genai")
+    def test_chat_stores_parsed_parts_of_truncated_stream(self, mock_embed_genai, mock_gemini_genai, mock_enrich, client):
+        chunks = [
+            '{"message": "Here are some picks", "movies": [{"id": 550, "title": "Fight Club", "reason": "Twists"}',
+            ', {"id"',
+        ]
+        mock_model = Mock()
+        mock_model.generate_content_async = AsyncMock(return_value=StallingGeminiStream(chunks))
+        mock_gemini_genai.GenerativeModel.return_value = mock_model
+        mock_embed_genai.embed_content_async = AsyncMock(return_value={"embedding": [0.1] * 768})
+        mock_enrich.side_effect = lambda db, movie: movie
+
+        payload = {"user_id": "chat_user", "message": "Suggest twisty movies", "conversation_id": None}
+        with patch.object(settings, "gemini_request_timeout_seconds", 0.5):
+            response = client.post("/chat", json=payload)
+
+        assert response.status_code == 200
+        assert response.json()["message"] == "Here are some picks"
+        assert [movie["id"] for movie in response.json()["movies"]] == [550]
+
+        history = client.get(f"/conversations/{response.json()['conversation_id']}/messages").json()
+        assert history[-1]["content"] == "Here are some picks"
+        assert [movie["id"] for movie in history[-1]["payload"]["movies"]] == [550]
 
 
 @pytest.mark.integration
@@ -118,7 +284,7 @@ class TestMovieEndpoints:
 class TestSemanticSearch:
     @patch("services.embedding_service.genai")
     def test_semantic_search_success(self, mock_genai, client, sample_embedding):
-        mock_genai.embed_content.return_value = {"embedding": [0.1] * 768}
+        mock_genai.embed_content_async = AsyncMock(return_value={"embedding": [0.1] * 768})
         response = client.post("/movies/semantic-search", json={"query": "thrillers", "limit": 2})
         assert response.status_code == 200
         payload = response.json()
@@ -130,6 +296,21 @@ class TestSemanticSearch:
         assert response.status_code == 400
 
 
+@pytest.mark.integration
+class TestMovieNeighbors:
+    def test_neighbors_from_precomputed_table(self, client):
+        neighbors = [{"movie_id": 680, "title": "Pulp Fiction", "similarity": 0.8}]
+        with patch("main.EmbeddingService.get_movie_neighbors", return_value=neighbors) as mock_neighbors:
+            response = client.get("/movies/550/neighbors", params={"limit": 5})
+        assert response.status_code == 200
+        assert response.json()["results"][0]["movie_id"] == 680
+        assert mock_neighbors.call_args.kwargs["limit"] == 5
+
+    def test_neighbors_limit_validation(self, client):
+        response = client.get("/movies/550/neighbors", params={"limit": 0})
+        assert response.status_code == 422
+
+
 @pytest.mark.integration
 class TestAuthEndpoints:
     def test_register_login_flow(self, client):
@@ -181,3 +362,89 @@ class TestWatchlistEndpoints:
 
         delete = client.delete(f"/watchlist/{item_id}", headers=auth_headers)
         assert delete.status_code == 204
+
+    def test_bulk_operations(self, client, auth_headers):
+        operations = [
+            {"op": "add", "movie_id": movie_id, "movie_title": f"Movie {movie_id}"}
+            for movie_id in range(1, 6)
+        ] + [
+            {"op": "watched", "movie_id": 2, "watched": True},
+            {"op": "rate", "movie_id": 3, "rating": 5},
+            {"op": "remove", "movie_id": 4},
+            {"op": "remove", "movie_id": 42},
+        ]
+        resp = client.post("/watchlist/bulk", json={"operations": operations}, headers=auth_headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["applied"] == 8
+        assert data["results"][-1]["status"] == "not_found"
+        assert data["results"][1]["item"]["watched"] is True
+
+        listing = client.get("/watchlist", headers=auth_headers).json()
+        assert sorted(item["movie_id"] for item in listing) == [1, 2, 3, 5]
+
+    def test_list_pages_with_cursor(self, client, auth_headers):
+        operations = [
+            {"op": "add", "movie_id": movie_id, "movie_title": title}
+            for movie_id, title in [(1, "Heat"), (2, "Alien"), (3, "Brazil")]
+        ]
+        client.post("/watchlist/bulk", json={"operations": operations}, headers=auth_headers)
+
+        first = client.get("/watchlist", params={"sort": "title", "limit": 2}, headers=auth_headers)
+        assert [item["movie_title"] for item in first.json()] == ["Alien", "Brazil"]
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = client.get(
+            "/watchlist", params={"sort": "title", "limit": 2, "cursor": cursor}, headers=auth_headers
+        )
+        assert [item["movie_title"] for item in second.json()] == ["Heat"]
+        assert "X-Next-Cursor" not in second.headers
+
+        bad = client.get("/watchlist", params={"sort": "added", "cursor": cursor}, headers=auth_headers)
+        assert bad.status_code == 400
+
+    def test_conditional_get(self, client, auth_headers):
+        payload = {"movie_id": 11, "movie_title": "Cached Movie"}
+        client.post("/watchlist", json=payload, headers=auth_headers)
+
+        first = client.get("/watchlist", headers=auth_headers)
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "private, no-cache"
+
+        unchanged = client.get("/watchlist", headers={**auth_headers, "If-None-Match": etag})
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+
+        item_id = first.json()[0]["id"]
+        client.patch(f"/watchlist/{item_id}/watched", json={"watched": True}, headers=auth_headers)
+        changed = client.get("/watchlist", headers={**auth_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+
+    def test_re_adding_keeps_etag(self, client, auth_headers):
+        payload = {"movie_id": 12, "movie_title": "Listed Movie"}
+        client.post("/watchlist", json=payload, headers=auth_headers)
+        etag = client.get("/watchlist", headers=auth_headers).headers["ETag"]
+
+        client.post("/watchlist", json=payload, headers=auth_headers)
+        bulk = [{"op": "add", "movie_id": 12, "movie_title": "Listed Movie"}]
+        client.post("/watchlist/bulk", json={"operations": bulk}, headers=auth_headers)
+
+        unchanged = client.get("/watchlist", headers={**auth_headers, "If-None-Match": etag})
+        assert unchanged.status_code == 304
+
+    def test_bulk_rejects_incomplete_operation(self, client, auth_headers):
+        resp = client.post(
+            "/watchlist/bulk",
+            json={"operations": [{"op": "add", "movie_id": 1}]},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 400
+
+    def test_bulk_rejects_too_many_operations(self, client, auth_headers):
+        operations = [
+            {"op": "remove", "movie_id": movie_id}
+            for movie_id in range(settings.watchlist_bulk_max_operations + 1)
+        ]
+        resp = client.post("/watchlist/bulk", json={"operations": operations}, headers=auth_headers)
+        assert resp.status_code == 422
@@ -4,20 +4,37 @@ Aggregate unit tests for service layer modules.
 Includes coverage for conversation, embedding, Gemini, and TMDB services.
 """
 
-from datetime import datetime
+import asyncio
+import json
+from datetime import datetime, timedelta
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models import ConversationMessage
+from schemas import WatchlistBulkOperation, WatchlistItemCreate
+from google.api_core import exceptions as google_exceptions
 
-from schemas import WatchlistItemCreate
 from services import (
+    ArchiveService,
+    ContextBuilder,
     ConversationService,
+    EmbeddingError,
     EmbeddingService,
+    GeminiClient,
+    GeminiRateLimitError,
     GeminiService,
+    IntentClassifier,
+    MessageWriteQueue,
+    RecommendationStreamParser,
+    SemanticResponseCache,
+    SummaryService,
     TMDBService,
     WatchlistService,
 )
+from services.rate_limiter import RateLimiter
 
 
 @pytest.mark.unit
@@ -46,6 +63,51 @@ class TestConversationService:
         refreshed = ConversationService.get_conversation_by_id(test_db, sample_conversation.id)
         assert refreshed.last_message_at >= before
 
+    def test_add_message_with_loaded_conversation(self, test_db, sample_conversation):
+        message = ConversationService.add_message(
+            test_db, sample_conversation.id, "user", "Pong", conversation=sample_conversation
+        )
+        assert message.id is not None
+        assert sample_conversation.last_message_at == message.created_at
+
+    def test_add_messages_updates_count_and_preview(self, test_db, sample_conversation):
+        ConversationService.add_messages(test_db, sample_conversation.id, [
+            {"role": "user", "content": "Something  tense"},
+            {"role": "assistant", "content": json.dumps({"message": "Try Heat", "movies": []})},
+        ])
+        test_db.refresh(sample_conversation)
+        assert sample_conversation.message_count == 2
+        assert sample_conversation.last_message_preview == "Try Heat"
+
+    def test_preview_truncates(self):
+        preview = ConversationService.preview("word " * 100)
+        assert len(preview) == ConversationService.PREVIEW_LENGTH
+        assert preview.endswith("…")
+
+    def test_purge_in_batches(self, test_db, sample_conversation):
+        conversation_id = sample_conversation.id
+        ConversationService.add_messages(test_db, conversation_id, [
+            {"role": "user", "content": str(i)} for i in range(5)
+        ])
+        ids, message_count = ConversationService.mark_deleted(test_db, conversation_id=conversation_id)
+        assert ids == [conversation_id]
+        assert message_count == 5
+        assert ConversationService.get_conversation_by_id(test_db, conversation_id) is None
+
+        assert ConversationService.purge_conversations(test_db, ids, batch_size=2) == 5
+        assert ConversationService.get_conversation_messages(test_db, conversation_id) == []
+
+    def test_purge_deleted_sweeps_leftovers(self, test_db, sample_conversation):
+        conversation_id = sample_conversation.id
+        ConversationService.add_messages(test_db, conversation_id, [
+            {"role": "user", "content": str(i)} for i in range(3)
+        ])
+        ConversationService.mark_deleted(test_db, conversation_id=conversation_id)
+
+        assert ConversationService.purge_deleted(test_db, batch_size=2) == 1
+        assert ConversationService.get_conversation_messages(test_db, conversation_id) == []
+        assert ConversationService.purge_deleted(test_db, batch_size=2) == 0
+
     def test_get_user_conversations_sorted(self, test_db):
         convo1 = ConversationService.create_conversation(test_db, "sort_user")
         convo2 = ConversationService.create_conversation(test_db, "sort_user")
@@ -53,6 +115,485 @@ class TestConversationService:
         assert conversations[0].id == convo2.id  # newest first
         assert conversations[1].id == convo1.id
 
+    def test_get_recent_messages_chronological(self, test_db, sample_conversation):
+        for text in ("one", "two", "three"):
+            ConversationService.add_message(test_db, sample_conversation.id, "user", text)
+        recent = ConversationService.get_recent_messages(test_db, sample_conversation.id, limit=2)
+        assert [msg.content for msg in recent] == ["two", "three"]
+
+    def test_recent_messages_project_movie_refs(self, test_db, sample_conversation):
+        conversation_id = sample_conversation.id
+        ConversationService.add_message(
+            test_db, conversation_id, "assistant", "Try this",
+            payload={"movies": [{"id": 550, "title": "Fight Club", "overview": "Long text"}]}
+        )
+        test_db.expunge_all()
+        recent = ConversationService.get_recent_messages(test_db, conversation_id, limit=1)
+        assert recent[0].movie_refs == [{"id": 550, "title": "Fight Club"}]
+
+    def test_add_messages_writes_turn(self, test_db, sample_conversation):
+        # As in chat(), the question carries its own, earlier time and the reply defaults to now
+        asked_at = datetime.utcnow() - timedelta(seconds=5)
+        ConversationService.add_messages(test_db, sample_conversation.id, [
+            {"role": "user", "content": "Any thrillers?", "created_at": asked_at},
+            {"role": "assistant", "content": "Try Se7en"},
+        ])
+        messages = ConversationService.get_conversation_messages(test_db, sample_conversation.id)
+        assert [(m.role, m.content) for m in messages][-2:] == [("user", "Any thrillers?"), ("assistant", "Try Se7en")]
+        test_db.refresh(sample_conversation)
+        assert sample_conversation.last_message_at >= asked_at
+
+
+@pytest.mark.unit
+class TestArchiveService:
+    """Archival into compressed blobs and monthly message partitions."""
+
+    def test_archive_and_rehydrate(self, test_db, sample_conversation):
+        ConversationService.add_messages(test_db, sample_conversation.id, [
+            {"role": "user", "content": "Old question"},
+            {"role": "assistant", "content": "Old answer", "payload": {"movies": [{"id": 1, "title": "A"}]}},
+        ])
+        last_active = sample_conversation.last_message_at
+
+        assert ArchiveService.archive_conversation(test_db, sample_conversation) == 2
+        assert ConversationService.get_recent_messages(test_db, sample_conversation.id, limit=10) == []
+
+        conversation = ConversationService.get_conversation_by_id(test_db, sample_conversation.id)
+        assert conversation.archived_at is None
+        assert conversation.last_message_at == last_active
+        messages = ConversationService.get_conversation_messages(test_db, sample_conversation.id)
+        assert [m.content for m in messages] == ["Old question", "Old answer"]
+        assert messages[1].payload == {"movies": [{"id": 1, "title": "A"}]}
+
+    def test_archive_keeps_messages_written_meanwhile(self, test_db, sample_conversation):
+        conversation_id = sample_conversation.id
+        ConversationService.add_messages(test_db, conversation_id, [{"role": "user", "content": "Old question"}])
+        other = sessionmaker(bind=test_db.get_bind())()
+        set_archive = ArchiveService._set_archive
+
+        def write_then_archive(*args):
+            # A message committed after the archive read the conversation's messages
+            other.add(ConversationMessage(
+                conversation_id=conversation_id, role="user", content="Late", created_at=datetime.utcnow()
+            ))
+            other.commit()
+            set_archive(*args)
+
+        try:
+            with patch.object(ArchiveService, "_set_archive", side_effect=write_then_archive):
+                assert ArchiveService.archive_conversation(test_db, sample_conversation) == 1
+        finally:
+            other.close()
+
+        messages = ConversationService.get_conversation_messages(test_db, conversation_id)
+        assert [m.content for m in messages] == ["Old question", "Late"]
+
+    def test_rehydrate_once_when_opened_twice(self, test_db, sample_conversation):
+        ConversationService.add_messages(test_db, sample_conversation.id, [
+            {"role": "user", "content": "Old question"},
+            {"role": "assistant", "content": "Old answer"},
+        ])
+        ArchiveService.archive_conversation(test_db, sample_conversation)
+        assert sample_conversation.archived_at is not None
+
+        other = sessionmaker(bind=test_db.get_bind())()
+        try:
+            assert ConversationService.get_conversation_by_id(other, sample_conversation.id).archived_at is None
+        finally:
+            other.close()
+
+        # This session still holds the conversation as archived
+        assert ArchiveService.rehydrate(test_db, sample_conversation) == 0
+        assert sample_conversation.archived_at is None
+        messages = ConversationService.get_conversation_messages(test_db, sample_conversation.id)
+        assert [m.content for m in messages] == ["Old question", "Old answer"]
+
+    def test_archive_inactive_skips_recent(self, test_db, sample_conversation):
+        ConversationService.add_message(test_db, sample_conversation.id, "user", "Fresh")
+        assert ArchiveService.archive_inactive(test_db, inactive_days=30) == 0
+
+    def test_monthly_partitions(self, test_db):
+        created = ArchiveService.ensure_message_partitions(test_db, months_ahead=1, now=datetime(2031, 12, 15))
+        assert created == ["conversation_messages_p2031_12", "conversation_messages_p2032_01"]
+        assert ArchiveService.drop_empty_partitions(test_db, before=datetime(2032, 1, 1)) == [
+            "conversation_messages_p2031_12"
+        ]
+
+    def test_partition_created_over_rows_in_default(self, test_db, sample_conversation):
+        test_db.add(ConversationMessage(
+            conversation_id=sample_conversation.id, role="user", content="Early", created_at=datetime(2033, 5, 2)
+        ))
+        test_db.commit()
+        assert ArchiveService.partition_health(test_db, now=datetime(2033, 5, 15))["default_has_rows"]
+
+        created = ArchiveService.ensure_message_partitions(test_db, months_ahead=0, now=datetime(2033, 5, 15))
+        assert created == ["conversation_messages_p2033_05"]
+        health = ArchiveService.partition_health(test_db, months_ahead=0, now=datetime(2033, 5, 15))
+        assert health["missing"] == []
+        assert not health["default_has_rows"]
+        messages = ConversationService.get_conversation_messages(test_db, sample_conversation.id)
+        assert [m.content for m in messages] == ["Early"]
+
+
+@pytest.mark.unit
+class TestMessageWriteQueue:
+    """Write-behind persistence of chat turns."""
+
+    def test_flush_writes_queued_turns(self, test_db, sample_conversation):
+        queue = MessageWriteQueue(session_factory=sessionmaker(bind=test_db.get_bind()))
+        queue.enqueue(sample_conversation.id, [{"role": "user", "content": "Queued"}])
+        assert queue.pending() == 1
+
+        assert queue.flush() == 1
+        assert queue.pending() == 0
+        contents = [m.content for m in ConversationService.get_conversation_messages(test_db, sample_conversation.id)]
+        assert "Queued" in contents
+
+    def test_unwritable_turn_is_dropped_and_later_turns_written(self, test_db, sample_conversation):
+        queue = MessageWriteQueue(session_factory=sessionmaker(bind=test_db.get_bind()))
+        queue.enqueue(987654, [{"role": "user", "content": "Orphan"}])
+        queue.enqueue(sample_conversation.id, [{"role": "user", "content": "After orphan"}])
+
+        assert queue.flush() == 1
+        assert queue.stats() == {"pending": 0, "written": 1, "failed": 1, "dropped": 1}
+        assert queue.dead_letter()[0][0] == 987654
+        contents = [m.content for m in ConversationService.get_conversation_messages(test_db, sample_conversation.id)]
+        assert "After orphan" in contents
+
+    def test_transient_failure_retried_up_to_cap(self, test_db, sample_conversation):
+        queue = MessageWriteQueue(session_factory=sessionmaker(bind=test_db.get_bind()), max_attempts=2)
+        queue.enqueue(sample_conversation.id, [{"role": "user", "content": "Flaky"}])
+        queue.enqueue(sample_conversation.id, [{"role": "user", "content": "Steady"}])
+
+        original = ConversationService.add_messages
+
+        def flaky(db, conversation_id, messages, conversation=None):
+            if messages[0]["content"] == "Flaky":
+                raise RuntimeError("connection reset")
+            return original(db, conversation_id, messages, conversation)
+
+        with patch.object(ConversationService, "add_messages", side_effect=flaky):
+            assert queue.flush() == 1
+            assert queue.pending() == 1
+            assert queue.flush() == 0
+        assert queue.stats() == {"pending": 0, "written": 1, "failed": 2, "dropped": 1}
+
+
+@pytest.mark.unit
+class TestContextBuilder:
+    """Prompt context windowing and budgeting."""
+
+    def test_compact_content_strips_enrichment(self):
+        stored = json.dumps({
+            "message": "Try these",
+            "movies": [{"id": 550, "title": "Fight Club", "overview": "x" * 500, "poster_path": "/p.jpg"}],
+        })
+        compact = json.loads(ContextBuilder.compact_content("assistant", stored))
+        assert compact == {"message": "Try these", "movies": [{"id": 550, "title": "Fight Club"}]}
+        assert ContextBuilder.compact_content("user", "{not json") == "{not json"
+
+    def test_compact_content_with_movie_refs(self):
+        compact = json.loads(ContextBuilder.compact_content("assistant", "Try these", [{"id": 1, "title": "A"}]))
+        assert compact == {"message": "Try these", "movies": [{"id": 1, "title": "A"}]}
+        assert ContextBuilder.compact_content("assistant", "Plain reply") == "Plain reply"
+
+    def test_build_keeps_last_turns_and_system(self):
+        messages = [{"role": "system", "content": "RAG"}] + [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg {i}"} for i in range(10)
+        ]
+        kept, tokens = ContextBuilder.build(messages, max_turns=2, token_budget=10_000)
+        assert kept[0]["content"] == "RAG"
+        assert [msg["content"] for msg in kept[1:]] == ["msg 6", "msg 7", "msg 8", "msg 9"]
+        assert tokens > 0
+
+    def test_build_respects_token_budget(self):
+        messages = [{"role": "user", "content": "x" * 400} for _ in range(5)]
+        kept, tokens = ContextBuilder.build(messages, max_turns=10, token_budget=250)
+        assert len(kept) == 2
+        assert tokens <= 250
+
+        # The latest message survives even when it alone exceeds the budget
+        kept, _ = ContextBuilder.build(messages, max_turns=10, token_budget=10)
+        assert len(kept) == 1
+
+
+@pytest.mark.unit
+class TestSummaryService:
+    """Rolling conversation summaries."""
+
+    def _add_turns(self, db, conversation_id, turns):
+        for i in range(turns):
+            ConversationService.add_message(db, conversation_id, "user", f"question {i}")
+            ConversationService.add_message(db, conversation_id, "assistant", f"answer {i}")
+
+    @patch("services.summary_service.GeminiService.summarize_conversation", return_value="Likes thrillers")
+    def test_folds_messages_beyond_recent_window(self, mock_summarize, test_db, sample_conversation):
+        with patch("services.summary_service.settings") as mock_settings:
+            mock_settings.chat_history_max_turns = 2
+            mock_settings.chat_summary_every_n_turns = 2
+            self._add_turns(test_db, sample_conversation.id, 4)
+
+            summary = SummaryService.summarize_conversation(test_db, sample_conversation.id)
+
+        assert summary == "Likes thrillers"
+        folded = mock_summarize.call_args[0][0]
+        assert [msg["content"] for msg in folded] == ["question 0", "answer 0", "question 1", "answer 1"]
+
+        recent = ConversationService.get_recent_messages(
+            test_db, sample_conversation.id, limit=10, after_id=sample_conversation.summary_through_id
+        )
+        assert [msg.content for msg in recent] == ["question 2", "answer 2", "question 3", "answer 3"]
+
+    @patch("services.summary_service.GeminiService.summarize_conversation")
+    def test_skips_short_conversations(self, mock_summarize, test_db, sample_conversation):
+        self._add_turns(test_db, sample_conversation.id, 1)
+        assert SummaryService.summarize_conversation(test_db, sample_conversation.id) is None
+        mock_summarize.assert_not_called()
+
+
+@pytest.mark.unit
+class TestSemanticResponseCache:
+    """Embedding-keyed chat response cache."""
+
+    def test_hit_above_threshold(self):
+        cache = SemanticResponseCache(threshold=0.95)
+        cache.put([1.0, 0.0, 0.0], {"message": "horror picks"})
+
+        assert cache.get([0.99, 0.05, 0.0]) == {"message": "horror picks"}
+        assert cache.get([0.0, 1.0, 0.0]) is None
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(0.5)
+
+    def test_ttl_and_size_bounds(self):
+        cache = SemanticResponseCache(max_entries=1, ttl_seconds=60)
+        cache.put([1.0, 0.0], {"message": "first"})
+        cache.put([0.0, 1.0], {"message": "second"})
+        assert cache.stats()["size"] == 1
+        assert cache.get([1.0, 0.0]) is None
+
+        with patch("services.response_cache.time.monotonic", return_value=10**9):
+            assert cache.get([0.0, 1.0]) is None
+        assert cache.stats()["size"] == 0
+
+    def test_zero_vector_is_never_cached(self):
+        cache = SemanticResponseCache()
+        cache.put([0.0, 0.0], {"message": "nope"})
+        assert cache.stats()["size"] == 0
+
+
+@pytest.mark.unit
+class TestRecommendationStreamParser:
+    """Incremental parsing of streamed structured responses."""
+
+    def test_yields_movies_as_they_close(self):
+        response = json.dumps({
+            "message": "Here are {some} \"films\"",
+            "movies": [
+                {"id": 1, "title": "A {tricky} title", "reason": "brackets ] in text", "thrillers": [{"id": 2, "title": "B"}]},
+                {"id": 3, "title": "C", "reason": "", "thrillers": []},
+            ],
+        })
+        first_close = response.index("}]}") + 3
+
+        parser = RecommendationStreamParser()
+        assert parser.feed(response[:first_close - 1]) == []
+        assert [m["id"] for m in parser.feed(response[first_close - 1:first_close])] == [1]
+        assert [m["id"] for m in parser.feed(response[first_close:])] == [3]
+
+        result = parser.result()
+        assert result["message"] == 'Here are {some} "films"'
+        assert [m["id"] for m in result["movies"]] == [1, 3]
+
+    def test_character_by_character(self):
+        response = '{"movies": [{"id": 7, "title": "X"}], "message": "ok"}'
+        parser = RecommendationStreamParser()
+        movies = [movie for char in response for movie in parser.feed(char)]
+        assert movies == [{"id": 7, "title": "X"}]
+
+    def test_plain_text_falls_back(self):
+        parser = RecommendationStreamParser()
+        assert parser.feed("Sorry, try again") == []
+        assert parser.result() == {"message": "Sorry, try again", "movies": []}
+        assert parser.complete is False
+
+    def test_truncated_object_keeps_parsed_parts(self):
+        parser = RecommendationStreamParser()
+        parser.feed('{"message": "Here are some picks", "movies": [{"id": 1, "title": "A"}, {"id"')
+        result = parser.result()
+        assert result == {"message": "Here are some picks", "movies": [{"id": 1, "title": "A"}]}
+        assert parser.complete is False
+
+    def test_truncated_message_never_surfaces_raw_text(self):
+        parser = RecommendationStreamParser()
+        parser.feed('{"message": "Here are some')
+        assert parser.result()["message"] == GeminiService.ERROR_MESSAGE
+
+        parser = RecommendationStreamParser()
+        parser.feed('{"movies": [{"id": 1, "title": "A"}], "message": "Cut o')
+        assert parser.result()["message"] == RecommendationStreamParser.PARTIAL_MESSAGE
+
+    def test_complete_object_is_flagged(self):
+        parser = RecommendationStreamParser()
+        parser.feed('{"message": "movies", "movies": []}')
+        assert parser.result()["message"] == "movies"
+        assert parser.complete is True
+
+
+@pytest.mark.unit
+class TestIntentClassifier:
+    """Heuristic gate in front of RAG retrieval."""
+
+    @pytest.mark.parametrize("message", ["hi", "Thanks!", "ok cool", "thank you so much", ""])
+    def test_small_talk_skips_retrieval(self, message):
+        assert IntentClassifier.needs_retrieval(message) is False
+
+    @pytest.mark.parametrize("message", [
+        "recommend a movie",
+        "horror?",
+        "something like Alien",
+        "I want to see people solve a puzzle in space",
+        "Inception",
+        "Tom Hanks",
+        "Tom Hanks movies",
+    ])
+    def test_requests_need_retrieval(self, message):
+        assert IntentClassifier.needs_retrieval(message) is True
+
+    def test_stats_count_skips(self):
+        before = IntentClassifier.stats()
+        IntentClassifier.needs_retrieval("hello")
+        IntentClassifier.needs_retrieval("suggest a thriller")
+        after = IntentClassifier.stats()
+        assert after["checked"] == before["checked"] + 2
+        assert after["skipped"] == before["skipped"] + 1
+
+
+@pytest.mark.unit
+class TestRateLimiter:
+    """Token bucket, retry and backoff behavior."""
+
+    def test_burst_then_waits_for_tokens(self):
+        limiter = RateLimiter("test", rate_per_second=10, burst=2, max_concurrency=4)
+        with patch("services.rate_limiter.time.sleep") as mock_sleep:
+            for _ in range(3):
+                with limiter:
+                    pass
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args[0][0] == pytest.approx(0.1, abs=0.02)
+        assert limiter.stats()["acquired"] == 3
+
+    def test_call_retries_throttled_errors(self):
+        limiter = RateLimiter("test", rate_per_second=100, burst=10, max_concurrency=4, max_retries=2)
+        func = Mock(side_effect=[google_exceptions.ResourceExhausted("429"), "ok"])
+        with patch("services.rate_limiter.time.sleep"):
+            assert limiter.call(func) == "ok"
+        stats = limiter.stats()
+        assert stats["retries"] == 1 and stats["throttled"] == 1
+
+    def test_call_gives_up_and_skips_non_retryable(self):
+        limiter = RateLimiter("test", rate_per_second=100, burst=10, max_concurrency=4, max_retries=1)
+        with patch("services.rate_limiter.time.sleep"):
+            with pytest.raises(google_exceptions.ResourceExhausted):
+                limiter.call(Mock(side_effect=google_exceptions.ResourceExhausted("429")))
+            bad_request = Mock(side_effect=ValueError("bad"))
+            with pytest.raises(ValueError):
+                limiter.call(bad_request)
+        assert bad_request.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_call_async_backs_off_without_blocking(self):
+        limiter = RateLimiter("test", rate_per_second=100, burst=10, max_concurrency=4, max_retries=2)
+        func = AsyncMock(side_effect=[google_exceptions.ResourceExhausted("429"), "ok"])
+        with patch("services.rate_limiter.time.sleep") as blocking_sleep, \
+                patch("services.rate_limiter.asyncio.sleep", AsyncMock()) as async_sleep:
+            assert await limiter.call_async(func) == "ok"
+        blocking_sleep.assert_not_called()
+        async_sleep.assert_awaited_once()
+        assert limiter.stats()["retries"] == 1
+
+    def test_backoff_respects_retry_hint(self):
+        limiter = RateLimiter("test", rate_per_second=1, burst=1, max_concurrency=1, backoff_max_seconds=30)
+        error = google_exceptions.ResourceExhausted(
+            "429", details=[SimpleNamespace(retry_delay=SimpleNamespace(seconds=7, nanos=500_000_000))]
+        )
+        assert limiter.backoff_delay(0, error) == pytest.approx(7.5)
+        assert 0.25 <= limiter.backoff_delay(0, RuntimeError()) <= 0.5
+
+
+class DelayedStream:
+    """Streamed Gemini response whose first chunk arrives after a delay."""
+
+    def __init__(self, chunks, delay=0.0):
+        self._chunks = chunks
+        self._delay = delay
+        self.usage_metadata = None
+
+    async def _iterate(self):
+        await asyncio.sleep(self._delay)
+        for chunk in self._chunks:
+            yield Mock(text=chunk)
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+async def collect_stream():
+    return [chunk async for chunk in GeminiService.stream_structured_response([{"role": "user", "content": "Hi"}])]
+
+
+@pytest.mark.unit
+class TestGeminiLatencyControls:
+    """Deadlines, fallback models and hedged requests for streamed generation."""
+
+    def _settings(self, mock_settings, hedge_after=None, timeout=5.0):
+        mock_settings.gemini_model_chain = ["models/primary", "models/backup"]
+        mock_settings.gemini_request_timeout_seconds = timeout
+        mock_settings.gemini_hedge_enabled = hedge_after is not None
+        mock_settings.gemini_hedge_after_seconds = hedge_after
+
+    @pytest.mark.asyncio
+    @patch("services.gemini_service.settings")
+    @patch("services.gemini_client.genai")
+    async def test_falls_back_to_next_model(self, mock_genai, mock_settings):
+        self._settings(mock_settings)
+        primary, backup = Mock(), Mock()
+        primary.generate_content_async = AsyncMock(side_effect=RuntimeError("model overloaded"))
+        backup.generate_content_async = AsyncMock(return_value=DelayedStream(['{"message": "ok"', ', "movies": []}']))
+        mock_genai.GenerativeModel.side_effect = lambda name, **kwargs: primary if name == "models/primary" else backup
+
+        assert "".join(await collect_stream()) == '{"message": "ok", "movies": []}'
+        backup.generate_content_async.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch("services.gemini_service.settings")
+    @patch("services.gemini_client.genai")
+    async def test_deadline_moves_to_fallback(self, mock_genai, mock_settings):
+        self._settings(mock_settings, timeout=0.1)
+        primary, backup = Mock(), Mock()
+        primary.generate_content_async = AsyncMock(return_value=DelayedStream(["late"], delay=5))
+        backup.generate_content_async = AsyncMock(return_value=DelayedStream(["fast"]))
+        mock_genai.GenerativeModel.side_effect = lambda name, **kwargs: primary if name == "models/primary" else backup
+
+        assert await collect_stream() == ["fast"]
+
+    @pytest.mark.asyncio
+    @patch("services.gemini_service.settings")
+    @patch("services.gemini_client.genai")
+    async def test_hedged_request_wins(self, mock_genai, mock_settings):
+        self._settings(mock_settings, hedge_after=0.05)
+        primary = Mock()
+        primary.generate_content_async = AsyncMock(side_effect=[
+            DelayedStream(["slow"], delay=5),
+            DelayedStream(["hedged"]),
+        ])
+        mock_genai.GenerativeModel.return_value = primary
+        hedge_wins = GeminiService.stats()["hedge_wins"]
+
+        assert await collect_stream() == ["hedged"]
+        assert primary.generate_content_async.await_count == 2
+        assert GeminiService.stats()["hedge_wins"] == hedge_wins + 1
+
 
 @pytest.mark.unit
 class TestGeminiService:
@@ -64,8 +605,57 @@ class TestGeminiService:
         )
         assert "User: Hello" in formatted
         assert "Assistant: Hi!" in formatted
+        assert GeminiService.SYSTEM_PROMPT not in formatted
+
+    @patch("services.gemini_client.genai")
+    def test_system_prompt_sent_as_system_instruction(self, mock_genai):
+        mock_genai.GenerativeModel.return_value = Mock(generate_content=Mock(return_value=Mock(text="{}")))
+        GeminiService.generate_structured_response([{"role": "user", "content": "Hi"}])
+        kwargs = mock_genai.GenerativeModel.call_args.kwargs
+        assert kwargs["system_instruction"] == GeminiService.SYSTEM_PROMPT
+
+    @patch("services.gemini_client.settings")
+    @patch("services.gemini_client.genai")
+    def test_context_cache_used_when_enabled(self, mock_genai, mock_settings):
+        mock_settings.gemini_context_cache_enabled = True
+        mock_settings.gemini_context_cache_ttl_seconds = 600
+        cached_model = Mock()
+        mock_genai.GenerativeModel.from_cached_content.return_value = cached_model
+
+        model = GeminiClient.get_model("models/x", variant="chat", system_instruction="Be brief")
+
+        assert model is cached_model
+        assert mock_genai.caching.CachedContent.create.call_args.kwargs["system_instruction"] == "Be brief"
+        assert GeminiClient.get_model("models/x", variant="chat", system_instruction="Be brief") is cached_model
+
+    @patch("services.gemini_client.settings")
+    @patch("services.gemini_client.genai")
+    def test_context_cache_failure_falls_back(self, mock_genai, mock_settings):
+        mock_settings.gemini_context_cache_enabled = True
+        mock_settings.gemini_context_cache_ttl_seconds = 600
+        mock_genai.caching.CachedContent.create.side_effect = RuntimeError("prefix too small to cache")
+
+        GeminiClient.get_model("models/x", variant="chat", system_instruction="Be brief")
+
+        mock_genai.GenerativeModel.assert_called_once_with("models/x", system_instruction="Be brief")
+
+    @patch("services.gemini_client.settings")
+    @patch("services.gemini_client.genai")
+    def test_context_cache_rebuild_deletes_superseded_cache(self, mock_genai, mock_settings):
+        mock_settings.gemini_context_cache_enabled = True
+        mock_settings.gemini_context_cache_ttl_seconds = 600
+        old_cache, new_cache = Mock(), Mock()
+        mock_genai.caching.CachedContent.create.side_effect = [old_cache, new_cache]
+        mock_genai.GenerativeModel.from_cached_content.side_effect = lambda cached_content, **kwargs: cached_content
 
-    @patch("services.gemini_service.genai")
+        assert GeminiClient.get_model("models/x", variant="chat", system_instruction="Be brief") is old_cache
+        GeminiClient._expires_at["models/x:chat"] = 0
+
+        assert GeminiClient.get_model("models/x", variant="chat", system_instruction="Be brief") is new_cache
+        old_cache.delete.assert_called_once()
+        new_cache.delete.assert_not_called()
+
+    @patch("services.gemini_client.genai")
     def test_generate_response_success(self, mock_genai):
         mock_model = Mock()
         mock_model.generate_content.return_value = Mock(text="Response")
@@ -75,7 +665,52 @@ class TestGeminiService:
         assert response == "Response"
         mock_genai.configure.assert_called_once()
 
-    @patch("services.gemini_service.genai")
+    @patch("services.gemini_client.genai")
+    def test_generate_response_reuses_client(self, mock_genai):
+        mock_model = Mock()
+        mock_model.generate_content.return_value = Mock(text="Response")
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        GeminiService.generate_response([{"role": "user", "content": "Hi"}])
+        GeminiService.generate_response([{"role": "user", "content": "Again"}])
+
+        mock_genai.configure.assert_called_once()
+        mock_genai.GenerativeModel.assert_called_once()
+        assert mock_model.generate_content.call_count == 2
+
+    def test_parse_structured_response_single_pass(self):
+        parsed = GeminiService.parse_structured_response(
+            '{"message": "Try this", "movies": [{"id": 550, "title": "Fight Club", "reason": "Twists"}]}'
+        )
+        assert parsed["movies"][0]["id"] == 550
+
+        fallback = GeminiService.parse_structured_response("Sorry, something went wrong")
+        assert fallback == {"message": "Sorry, something went wrong", "movies": []}
+
+    @patch("services.gemini_client.genai")
+    def test_generate_structured_response_uses_json_mode(self, mock_genai):
+        mock_model = Mock()
+        mock_model.generate_content.return_value = Mock(text='{"message": "Hi", "movies": []}')
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        result = GeminiService.generate_structured_response([{"role": "user", "content": "Hi"}])
+
+        assert result == {"message": "Hi", "movies": []}
+        generation_config = mock_genai.GenerativeModel.call_args.kwargs["generation_config"]
+        assert generation_config["response_mime_type"] == "application/json"
+        assert generation_config["response_schema"] is GeminiService.RESPONSE_SCHEMA
+
+    @patch("services.gemini_client.genai")
+    def test_generate_response_raises_when_throttled(self, mock_genai):
+        mock_model = Mock()
+        mock_model.generate_content.side_effect = google_exceptions.ResourceExhausted("429")
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        with patch("services.rate_limiter.time.sleep"):
+            with pytest.raises(GeminiRateLimitError):
+                GeminiService.generate_response([{"role": "user", "content": "Hi"}])
+
+    @patch("services.gemini_client.genai")
     def test_generate_response_handles_error(self, mock_genai):
         mock_genai.configure.side_effect = RuntimeError("Boom")
         response = GeminiService.generate_response([])
@@ -86,6 +721,23 @@ class TestGeminiService:
 class TestEmbeddingService:
     """Embedding service coverage."""
 
+    @patch("services.gemini_client.genai")
+    @patch("services.embedding_service.genai")
+    def test_create_embedding_configures_once(self, mock_embed_genai, mock_client_genai):
+        mock_embed_genai.embed_content.return_value = {"embedding": [0.4] * 768}
+
+        EmbeddingService.create_embedding("first")
+        EmbeddingService.create_embedding("second")
+
+        mock_client_genai.configure.assert_called_once()
+        assert mock_embed_genai.embed_content.call_count == 2
+
+    @patch("services.embedding_service.genai")
+    def test_create_embedding_raises_instead_of_zero_vector(self, mock_embed_genai):
+        mock_embed_genai.embed_content.side_effect = RuntimeError("quota")
+        with pytest.raises(EmbeddingError):
+            EmbeddingService.create_embedding("anything")
+
     @patch("services.embedding_service.EmbeddingService.create_embedding", return_value=[0.2] * 768)
     def test_store_movie_embedding_creates_record(self, mock_create, test_db, sample_movie):
         embedding = EmbeddingService.store_movie_embedding(test_db, sample_movie.id, "overview")
@@ -130,6 +782,42 @@ class TestEmbeddingService:
             results = EmbeddingService.search_similar_movies(mock_db, "query")
         assert results == []
 
+    def test_get_movie_neighbors_filters_by_genre(self):
+        mock_db = MagicMock()
+        mock_db.execute.return_value = [
+            SimpleNamespace(
+                movie_id=680,
+                title="Pulp Fiction",
+                overview="Overview",
+                release_date=datetime(1994, 9, 10),
+                vote_average=8.5,
+                poster_path="/pulp.jpg",
+                similarity=0.81,
+            )
+        ]
+
+        results = EmbeddingService.get_movie_neighbors(mock_db, 550, limit=3, genre_id=53)
+
+        assert results[0]["movie_id"] == 680
+        assert results[0]["similarity"] == pytest.approx(0.81)
+        params = mock_db.execute.call_args[0][1]
+        assert params == {"movie_id": 550, "limit": 3, "genres": "[53]"}
+
+    def test_get_movie_neighbors_handles_failure(self):
+        mock_db = MagicMock()
+        mock_db.execute.side_effect = RuntimeError("DB down")
+        assert EmbeddingService.get_movie_neighbors(mock_db, 550) == []
+        mock_db.rollback.assert_called_once()
+
+    def test_movies_with_neighbors(self):
+        mock_db = MagicMock()
+        mock_db.execute.return_value = [SimpleNamespace(movie_id=550)]
+
+        assert EmbeddingService.movies_with_neighbors(mock_db, [550, 680], min_count=3, genre_id=53) == {550}
+        assert mock_db.execute.call_args.args[1]["genres"] == "[53]"
+        assert EmbeddingService.movies_with_neighbors(mock_db, [], min_count=3) == set()
+        assert mock_db.execute.call_count == 1
+
 
 @pytest.mark.unit
 class TestTMDBService:
@@ -183,6 +871,49 @@ class TestTMDBService:
         assert data["results"][0]["id"] == 1
         client_instance.get.assert_awaited()
 
+    @pytest.mark.asyncio
+    async def test_movie_details_are_cached(self):
+        mock_response = Mock()
+        mock_response.json.return_value = {"id": 123}
+        mock_response.raise_for_status.return_value = None
+
+        client_instance = AsyncMock()
+        client_instance.__aenter__.return_value = client_instance
+        client_instance.get.return_value = mock_response
+
+        with patch("services.tmdb_service.httpx.AsyncClient", return_value=client_instance):
+            first, second = await asyncio.gather(
+                TMDBService.get_movie_details(123),
+                TMDBService.get_movie_details(123)
+            )
+            third = await TMDBService.get_movie_details(123)
+
+        assert first == second == third == {"id": 123}
+        assert client_instance.get.await_count == 1
+        assert TMDBService.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_prefetch_warms_cache_and_tracks_usage(self):
+        with patch.object(TMDBService, "get_movie_details", AsyncMock()) as details, \
+                patch.object(TMDBService, "get_movie_videos", AsyncMock()), \
+                patch.object(TMDBService, "get_similar_movies", AsyncMock()):
+            await asyncio.gather(*TMDBService.prefetch([1, 2, 2, 3, 4]))
+
+        assert details.await_count == 4
+        TMDBService.record_prefetch_usage([1, 2, 3, 4], [2, 99])
+        stats = TMDBService.stats()
+        assert stats["prefetched"] == 4
+        assert stats["prefetch_use_rate"] == 0.25
+
+    @pytest.mark.asyncio
+    async def test_prefetch_skips_similar_for_local_neighbors(self):
+        with patch.object(TMDBService, "get_movie_details", AsyncMock()), \
+                patch.object(TMDBService, "get_movie_videos", AsyncMock()), \
+                patch.object(TMDBService, "get_similar_movies", AsyncMock()) as similar:
+            await asyncio.gather(*TMDBService.prefetch([1, 2, 3], skip_similar={1, 3}))
+
+        similar.assert_awaited_once_with(2)
+
 
 @pytest.mark.unit
 class TestWatchlistService:
@@ -197,6 +928,17 @@ class TestWatchlistService:
         items = WatchlistService.list_items(test_db, auth_user)
         assert len(items) == 1
 
+    def test_add_item_twice_returns_existing(self, test_db, auth_user):
+        payload = WatchlistItemCreate(movie_id=1, movie_title="Sample", poster_path=None, notes="first")
+        first = WatchlistService.add_item(test_db, auth_user, payload)
+        second = WatchlistService.add_item(
+            test_db, auth_user, payload.model_copy(update={"notes": "second"})
+        )
+
+        assert second.id == first.id
+        assert second.notes == "first"
+        assert len(WatchlistService.list_items(test_db, auth_user)) == 1
+
     def test_toggle_and_rate(self, test_db, auth_user):
         item = WatchlistService.add_item(
             test_db,
@@ -207,3 +949,123 @@ class TestWatchlistService:
         assert updated.watched is True
         rated = WatchlistService.update_rating(test_db, auth_user, item.id, 5)
         assert rated.rating == 5
+
+    def test_default_watchlist_id_is_cached(self, test_db, auth_user):
+        item = WatchlistService.add_item(
+            test_db,
+            auth_user,
+            WatchlistItemCreate(movie_id=3, movie_title="Cached", poster_path=None, notes=None),
+        )
+        WatchlistService.list_items(test_db, auth_user)
+        assert WatchlistService._default_ids[auth_user.id] == item.watchlist_id
+
+        with patch.object(WatchlistService, "_find_default_watchlist_id") as find:
+            assert WatchlistService.delete_item(test_db, auth_user, item.id) is True
+            assert WatchlistService.delete_item(test_db, auth_user, item.id) is False
+        find.assert_not_called()
+
+    def test_update_missing_item_raises(self, test_db, auth_user):
+        with pytest.raises(ValueError):
+            WatchlistService.toggle_watched(test_db, auth_user, 999, True)
+
+    def test_bulk_apply_runs_each_kind_once(self, test_db, auth_user):
+        WatchlistService.add_item(
+            test_db,
+            auth_user,
+            WatchlistItemCreate(movie_id=1, movie_title="Existing", poster_path=None, notes=None),
+        )
+        operations = [
+            WatchlistBulkOperation(op="add", movie_id=1, movie_title="Existing again"),
+            WatchlistBulkOperation(op="add", movie_id=2, movie_title="New"),
+            WatchlistBulkOperation(op="add", movie_id=3, movie_title="Short-lived"),
+            WatchlistBulkOperation(op="rate", movie_id=1, rating=4),
+            WatchlistBulkOperation(op="watched", movie_id=2, watched=True),
+            WatchlistBulkOperation(op="rate", movie_id=99, rating=2),
+            WatchlistBulkOperation(op="remove", movie_id=3),
+        ]
+
+        results = WatchlistService.bulk_apply(test_db, auth_user, operations)
+
+        assert [result["status"] for result in results] == ["ok", "ok", "ok", "ok", "ok", "not_found", "ok"]
+        assert results[0]["item"].movie_title == "Existing"
+        assert results[0]["item"].rating == 4
+        assert results[1]["item"].watched is True
+        assert results[2]["item"] is None
+        items = {item.movie_id: item for item in WatchlistService.list_items(test_db, auth_user)}
+        assert set(items) == {1, 2}
+        assert items[1].rating == 4
+
+    def test_bulk_apply_follows_request_order(self, test_db, auth_user):
+        stored = WatchlistService.add_item(
+            test_db,
+            auth_user,
+            WatchlistItemCreate(movie_id=42, movie_title="Stored", poster_path=None, notes=None),
+        )
+        stored_id = stored.id
+        WatchlistService.update_rating(test_db, auth_user, stored_id, 5)
+
+        results = WatchlistService.bulk_apply(test_db, auth_user, [
+            WatchlistBulkOperation(op="remove", movie_id=42),
+            WatchlistBulkOperation(op="rate", movie_id=42, rating=1),
+            WatchlistBulkOperation(op="add", movie_id=42, movie_title="Re-added"),
+            WatchlistBulkOperation(op="watched", movie_id=42, watched=True),
+            WatchlistBulkOperation(op="add", movie_id=43, movie_title="Gone again"),
+            WatchlistBulkOperation(op="remove", movie_id=43),
+        ])
+
+        assert [result["status"] for result in results] == ["ok", "not_found", "ok", "ok", "ok", "ok"]
+        item = results[0]["item"]
+        assert (item.movie_title, item.rating, item.watched) == ("Re-added", None, True)
+        assert item.id != stored_id
+        assert results[-1]["item"] is None
+        items = WatchlistService.list_items(test_db, auth_user)
+        assert [(item.movie_id, item.movie_title) for item in items] == [(42, "Re-added")]
+
+    def test_bulk_apply_requires_fields_per_kind(self, test_db, auth_user):
+        with pytest.raises(ValueError):
+            WatchlistService.bulk_apply(test_db, auth_user, [WatchlistBulkOperation(op="rate", movie_id=1)])
+
+    def test_list_items_filters_sorts_and_pages(self, test_db, auth_user):
+        WatchlistService.bulk_apply(test_db, auth_user, [
+            WatchlistBulkOperation(op="add", movie_id=movie_id, movie_title=title)
+            for movie_id, title in [(1, "Heat"), (2, "Alien"), (3, "Brazil"), (4, "Clue")]
+        ] + [
+            WatchlistBulkOperation(op="rate", movie_id=1, rating=5),
+            WatchlistBulkOperation(op="rate", movie_id=3, rating=2),
+            WatchlistBulkOperation(op="watched", movie_id=3, watched=True),
+        ])
+
+        by_title = WatchlistService.list_items(test_db, auth_user, sort="title", limit=2)
+        assert [item.movie_title for item in by_title] == ["Alien", "Brazil"]
+        cursor = WatchlistService.decode_cursor(WatchlistService.encode_cursor(by_title[-1], "title"), "title")
+        rest = WatchlistService.list_items(test_db, auth_user, sort="title", limit=2, cursor=cursor)
+        assert [item.movie_title for item in rest] == ["Clue", "Heat"]
+
+        by_rating = WatchlistService.list_items(test_db, auth_user, sort="rating")
+        assert [item.movie_id for item in by_rating][:2] == [1, 3]
+        rated = WatchlistService.list_items(test_db, auth_user, min_rating=2, max_rating=4)
+        assert [item.movie_id for item in rated] == [3]
+        unwatched = WatchlistService.list_items(test_db, auth_user, watched=False)
+        assert {item.movie_id for item in unwatched} == {1, 2, 4}
+
+    def test_mutations_bump_etag(self, test_db, auth_user):
+        assert WatchlistService.etag(test_db, auth_user) == '"0-0"'
+        item = WatchlistService.add_item(
+            test_db,
+            auth_user,
+            WatchlistItemCreate(movie_id=7, movie_title="Versioned", poster_path=None, notes=None),
+        )
+        after_add = WatchlistService.etag(test_db, auth_user)
+        WatchlistService.update_rating(test_db, auth_user, item.id, 3)
+        after_rate = WatchlistService.etag(test_db, auth_user)
+        assert WatchlistService.delete_item(test_db, auth_user, 999) is False
+
+        assert after_add != after_rate
+        assert WatchlistService.etag(test_db, auth_user) == after_rate
+
+    def test_decode_cursor_rejects_other_sort(self):
+        cursor = WatchlistService.encode_cursor(
+            SimpleNamespace(id=1, movie_title="Heat", rating=None, created_at=datetime(2030, 1, 1)), "title"
+        )
+        with pytest.raises(ValueError):
+            WatchlistService.decode_cursor(cursor, "rating")
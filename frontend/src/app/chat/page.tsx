@@ -60,7 +60,7 @@ const ChatPage = () => {
 
   const conversations = useMemo(() => {
     if (!conversationsQuery.data) return [];
-    return [...conversationsQuery.data].sort(
+    return conversationsQuery.data.pages.flatMap((page) => page.items).sort(
       (a, b) => new Date(b.last_message_at).getTime() - new Date(a.last_message_at).getTime()
     );
   }, [conversationsQuery.data]);
@@ -119,6 +119,9 @@ const ChatPage = () => {
         onSelectConversation={handleSelectConversation}
         onCreateConversation={handleNewConversation}
         onDeleteConversation={handleDeleteConversation}
+        hasMoreConversations={conversationsQuery.hasNextPage}
+        isLoadingMoreConversations={conversationsQuery.isFetchingNextPage}
+        onLoadMoreConversations={() => void conversationsQuery.fetchNextPage()}
       />
 
       {/* Chat Window - takes remaining space */}
@@ -4,20 +4,23 @@ import { useState } from "react";
 import clsx from "clsx";
 import { Loader2, Plus, Trash2, ListVideo, ChevronDown, ChevronLeft, ChevronRight, User } from "lucide-react";
 import { formatRelativeTime } from "@/lib/utils";
-import type { ConversationSummary } from "@/types";
+import type { ConversationOverview } from "@/types";
 import { useWatchlist } from "@/hooks/useWatchlist";
 import { useAuth } from "@/providers/auth-provider";
 import { useRouter } from "next/navigation";
 
 interface ChatSidebarProps {
   conversationId?: number;
-  conversations: ConversationSummary[];
+  conversations: ConversationOverview[];
   isSending: boolean;
   isLoadingConversations: boolean;
   error?: string;
   onSelectConversation: (conversationId?: number) => void;
   onCreateConversation: () => void;
   onDeleteConversation: (conversationId: number) => void;
+  hasMoreConversations?: boolean;
+  isLoadingMoreConversations?: boolean;
+  onLoadMoreConversations?: () => void;
 }
 
 const ChatSidebar = ({
@@ -28,7 +31,10 @@ const ChatSidebar = ({
   error,
   onSelectConversation,
   onCreateConversation,
-  onDeleteConversation
+  onDeleteConversation,
+  hasMoreConversations,
+  isLoadingMoreConversations,
+  onLoadMoreConversations
 }: ChatSidebarProps) => {
   const { user, logout } = useAuth();
   const { data: watchlistItems } = useWatchlist();
@@ -114,9 +120,13 @@ const ChatSidebar = ({
               )}
             >
               <div className="flex-1 overflow-hidden">
-                <p className="truncate text-sm font-medium">Chat #{conversation.id}</p>
+                <p className="truncate text-sm font-medium">
+                  {conversation.last_message_preview || `Chat #${conversation.id}`}
+                </p>
                 <p className="truncate text-xs text-[color:var(--text-muted)]">
                   {formatRelativeTime(conversation.last_message_at)}
+                  {conversation.message_count > 0 &&
+                    ` · ${conversation.message_count} ${conversation.message_count === 1 ? "message" : "messages"}`}
                 </p>
               </div>
               <button
@@ -134,6 +144,18 @@ const ChatSidebar = ({
             </div>
           ))}
 
+        {!isLoadingConversations && hasMoreConversations && (
+          <button
+            type="button"
+            onClick={onLoadMoreConversations}
+            disabled={isLoadingMoreConversations}
+            className="mt-1 flex w-full items-center justify-center gap-2 rounded-lg px-3 py-2 text-xs text-[color:var(--text-secondary)] transition hover:bg-[color:var(--surface-2)] disabled:cursor-not-allowed disabled:opacity-60"
+          >
+            {isLoadingMoreConversations && <Loader2 className="h-3.5 w-3.5 animate-spin" />}
+            Load older chats
+          </button>
+        )}
+
         {error && (
           <p className="mt-2 rounded-lg border border-red-200 bg-red-50 px-3 py-2 text-xs text-red-600 dark:border-red-500/40 dark:bg-red-500/10 dark:text-red-100">
             {error}
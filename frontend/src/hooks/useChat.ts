@@ -5,6 +5,7 @@ import { useCallback, useEffect, useMemo, useState } from "react";
 import { toast } from "sonner";
 import { sendChatMessage } from "@/lib/api/chat";
 import { getConversationMessages } from "@/lib/api/conversations";
+import { MESSAGE_PAGE_SIZE } from "@/lib/constants";
 import type { ChatMessage, ChatResponse, ConversationMessage } from "@/types";
 
 const createMessage = (role: ChatMessage["role"], content: string, movies?: any[]): ChatMessage => ({
@@ -46,6 +47,7 @@ const normalizeConversationMessage = (message: ConversationMessage): ChatMessage
   id: message.id.toString(),
   role: message.role as ChatMessage["role"],
   content: message.content,
+  movies: message.payload?.movies,
   createdAt: message.created_at
 });
 
@@ -72,7 +74,9 @@ export const useChat = (userId: string, conversationId?: number, options?: UseCh
       setHistoryError(undefined);
 
       try {
-        const history = await getConversationMessages(conversationId);
+        const { items: history } = await getConversationMessages(conversationId, {
+          limit: MESSAGE_PAGE_SIZE
+        });
         if (cancelled) return;
         setMessages(history.length ? history.map(normalizeConversationMessage) : [welcomeMessage(userEmail)]);
       } catch (error) {
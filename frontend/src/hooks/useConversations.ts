@@ -1,13 +1,16 @@
 "use client";
 
-import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQueryClient, type InfiniteData } from "@tanstack/react-query";
 import {
   createConversation,
   deleteConversation,
   getConversationMessages,
-  listUserConversations
+  listUserConversationOverviews
 } from "@/lib/api/conversations";
-import type { ConversationMessage, ConversationSummary } from "@/types";
+import { CONVERSATION_PAGE_SIZE, MESSAGE_PAGE_SIZE } from "@/lib/constants";
+import type { ConversationOverview, CursorPage } from "@/types";
+
+type ConversationPages = InfiniteData<CursorPage<ConversationOverview>, string | undefined>;
 
 const conversationListKey = (userId: string) => ["conversations", userId];
 const conversationMessagesKey = (conversationId?: number) => [
@@ -16,17 +19,25 @@ const conversationMessagesKey = (conversationId?: number) => [
   "messages"
 ];
 
+// Pages are fetched newest first; each cursor continues to older conversations
 export const useConversationList = (userId: string) =>
-  useQuery({
+  useInfiniteQuery({
     queryKey: conversationListKey(userId),
-    queryFn: () => listUserConversations(userId),
+    queryFn: ({ pageParam }) =>
+      listUserConversationOverviews(userId, { limit: CONVERSATION_PAGE_SIZE, before: pageParam }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
     enabled: Boolean(userId)
   });
 
+// The first page is the latest messages; further pages load older history
 export const useConversationMessages = (conversationId?: number) =>
-  useQuery({
+  useInfiniteQuery({
     queryKey: conversationMessagesKey(conversationId),
-    queryFn: () => getConversationMessages(conversationId!),
+    queryFn: ({ pageParam }) =>
+      getConversationMessages(conversationId!, { limit: MESSAGE_PAGE_SIZE, before: pageParam }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
     enabled: Boolean(conversationId)
   });
 
@@ -35,8 +46,17 @@ export const useCreateConversation = (userId: string) => {
   return useMutation({
     mutationFn: () => createConversation(userId),
     onSuccess: (conversation) => {
-      queryClient.setQueryData<ConversationSummary[]>(conversationListKey(userId), (prev) =>
-        prev ? [conversation, ...prev] : [conversation]
+      queryClient.setQueryData<ConversationPages>(conversationListKey(userId), (prev) =>
+        prev
+          ? {
+              ...prev,
+              pages: prev.pages.map((page, index) =>
+                index === 0
+                  ? { ...page, items: [{ ...conversation, message_count: 0 }, ...page.items] }
+                  : page
+              )
+            }
+          : prev
       );
       queryClient.removeQueries({ queryKey: conversationMessagesKey(conversation.id) });
       queryClient.invalidateQueries({ queryKey: conversationListKey(userId) });
@@ -49,8 +69,16 @@ export const useDeleteConversation = (userId: string) => {
   return useMutation({
     mutationFn: (conversationId: number) => deleteConversation(conversationId),
     onSuccess: (_data, conversationId) => {
-      queryClient.setQueryData<ConversationSummary[]>(conversationListKey(userId), (prev) =>
-        prev ? prev.filter((conversation) => conversation.id !== conversationId) : prev
+      queryClient.setQueryData<ConversationPages>(conversationListKey(userId), (prev) =>
+        prev
+          ? {
+              ...prev,
+              pages: prev.pages.map((page) => ({
+                ...page,
+                items: page.items.filter((conversation) => conversation.id !== conversationId)
+              }))
+            }
+          : prev
       );
       queryClient.removeQueries({ queryKey: conversationMessagesKey(conversationId) });
       queryClient.invalidateQueries({ queryKey: conversationListKey(userId) });
@@ -4,12 +4,13 @@ import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 
 import {
   addToWatchlist,
+  bulkUpdateWatchlist,
   getWatchlist,
   rateWatchlistItem,
   removeFromWatchlist,
   toggleWatchlistItem
 } from "@/lib/api/watchlist";
-import type { WatchlistItem, WatchlistRequest } from "@/types";
+import type { WatchlistBulkOperation, WatchlistItem, WatchlistRequest } from "@/types";
 import { useAuth } from "@/providers/auth-provider";
 
 const useWatchlistActionsInternal = () => {
@@ -47,7 +48,12 @@ const useWatchlistActionsInternal = () => {
     onSuccess: invalidate
   });
 
-  return { add, remove, rate, toggle, hasToken: Boolean(token), tokenAccessor: requireToken };
+  const bulk = useMutation({
+    mutationFn: (operations: WatchlistBulkOperation[]) => bulkUpdateWatchlist(requireToken(), operations),
+    onSuccess: invalidate
+  });
+
+  return { add, remove, rate, toggle, bulk, hasToken: Boolean(token), tokenAccessor: requireToken };
 };
 
 export const useWatchlist = () => {
@@ -64,11 +70,12 @@ export const useWatchlist = () => {
     add: actions.add,
     remove: actions.remove,
     rate: actions.rate,
-    toggle: actions.toggle
+    toggle: actions.toggle,
+    bulk: actions.bulk
   };
 };
 
 export const useWatchlistActions = () => {
-  const { add, remove, rate, toggle } = useWatchlistActionsInternal();
-  return { add, remove, rate, toggle };
+  const { add, remove, rate, toggle, bulk } = useWatchlistActionsInternal();
+  return { add, remove, rate, toggle, bulk };
 };
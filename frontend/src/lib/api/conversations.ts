@@ -1,9 +1,33 @@
 import apiClient from "@/lib/api-client";
-import type { ConversationMessage, ConversationSummary } from "@/types";
+import type {
+  ConversationMessage,
+  ConversationOverview,
+  ConversationSummary,
+  CursorPage,
+  PageParams
+} from "@/types";
 
-export const listUserConversations = async (userId: string): Promise<ConversationSummary[]> => {
-  const { data } = await apiClient.get<ConversationSummary[]>(`/conversations/user/${userId}`);
-  return data;
+const NEXT_CURSOR_HEADER = "x-next-cursor";
+
+export const listUserConversations = async (
+  userId: string,
+  params?: Pick<PageParams, "limit" | "before">
+): Promise<CursorPage<ConversationSummary>> => {
+  const { data, headers } = await apiClient.get<ConversationSummary[]>(`/conversations/user/${userId}`, {
+    params
+  });
+  return { items: data, nextCursor: headers[NEXT_CURSOR_HEADER] || undefined };
+};
+
+export const listUserConversationOverviews = async (
+  userId: string,
+  params?: Pick<PageParams, "limit" | "before">
+): Promise<CursorPage<ConversationOverview>> => {
+  const { data, headers } = await apiClient.get<ConversationOverview[]>(
+    `/conversations/user/${userId}/summary`,
+    { params }
+  );
+  return { items: data, nextCursor: headers[NEXT_CURSOR_HEADER] || undefined };
 };
 
 export const getConversation = async (conversationId: number): Promise<ConversationSummary> => {
@@ -23,10 +47,12 @@ export const deleteConversation = async (conversationId: number): Promise<void>
 };
 
 export const getConversationMessages = async (
-  conversationId: number
-): Promise<ConversationMessage[]> => {
-  const { data } = await apiClient.get<ConversationMessage[]>(
-    `/conversations/${conversationId}/messages`
+  conversationId: number,
+  params?: PageParams
+): Promise<CursorPage<ConversationMessage>> => {
+  const { data, headers } = await apiClient.get<ConversationMessage[]>(
+    `/conversations/${conversationId}/messages`,
+    { params }
   );
-  return data;
+  return { items: data, nextCursor: headers[NEXT_CURSOR_HEADER] || undefined };
 };
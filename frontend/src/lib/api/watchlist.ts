@@ -1,8 +1,15 @@
 import apiClient from "@/lib/api-client";
-import type { WatchlistItem, WatchlistRequest } from "@/types";
+import type {
+  WatchlistBulkOperation,
+  WatchlistBulkResponse,
+  WatchlistItem,
+  WatchlistQuery,
+  WatchlistRequest
+} from "@/types";
 
-export const getWatchlist = async (token: string): Promise<WatchlistItem[]> => {
+export const getWatchlist = async (token: string, params?: WatchlistQuery): Promise<WatchlistItem[]> => {
   const { data } = await apiClient.get<WatchlistItem[]>("/watchlist", {
+    params,
     headers: { Authorization: `Bearer ${token}` }
   });
   return data;
@@ -15,6 +22,18 @@ export const addToWatchlist = async (token: string, payload: WatchlistRequest):
   return data;
 };
 
+export const bulkUpdateWatchlist = async (
+  token: string,
+  operations: WatchlistBulkOperation[]
+): Promise<WatchlistBulkResponse> => {
+  const { data } = await apiClient.post<WatchlistBulkResponse>(
+    "/watchlist/bulk",
+    { operations },
+    { headers: { Authorization: `Bearer ${token}` } }
+  );
+  return data;
+};
+
 export const removeFromWatchlist = async (token: string, itemId: number): Promise<void> => {
   await apiClient.delete(`/watchlist/${itemId}`, {
     headers: { Authorization: `Bearer ${token}` }
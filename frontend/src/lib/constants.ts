@@ -7,3 +7,6 @@ export const buildImageUrl = (path?: string | null, size: string = POSTER_SIZE)
   if (!path) return undefined;
   return `${TMDB_IMAGE_BASE_URL}/${size}${path}`;
 };
+
+export const CONVERSATION_PAGE_SIZE = 30;
+export const MESSAGE_PAGE_SIZE = 50;
@@ -43,11 +43,28 @@ export interface ConversationSummary {
   last_message_at: string;
 }
 
+export interface ConversationOverview extends ConversationSummary {
+  message_count: number;
+  last_message_preview?: string | null;
+}
+
+export interface CursorPage<T> {
+  items: T[];
+  nextCursor?: string;
+}
+
+export interface PageParams {
+  limit?: number;
+  before?: string;
+  after?: string;
+}
+
 export interface ConversationMessage {
   id: number;
   conversation_id: number;
   role: ChatRole;
   content: string;
+  payload?: { movies?: MovieRecommendation[] } | null;
   created_at: string;
 }
 
@@ -163,3 +180,30 @@ export interface WatchlistRequest {
   poster_path?: string;
   notes?: string;
 }
+
+export interface WatchlistQuery {
+  watched?: boolean;
+  min_rating?: number;
+  max_rating?: number;
+  sort?: "added" | "rating" | "title";
+  limit?: number;
+  cursor?: string;
+}
+
+export type WatchlistBulkOperation =
+  | ({ op: "add" } & WatchlistRequest)
+  | { op: "remove"; movie_id: number }
+  | { op: "rate"; movie_id: number; rating: number }
+  | { op: "watched"; movie_id: number; watched: boolean };
+
+export interface WatchlistBulkResult {
+  op: WatchlistBulkOperation["op"];
+  movie_id: number;
+  status: "ok" | "not_found";
+  item: WatchlistItem | null;
+}
+
+export interface WatchlistBulkResponse {
+  applied: number;
+  results: WatchlistBulkResult[];
+}